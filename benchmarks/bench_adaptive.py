@@ -0,0 +1,39 @@
+"""Compares the fast loop with and without adaptive quickening.
+
+Every program runs many times on the same interpreter, so adaptive
+instructions warm up during the first runs and stay specialized afterwards.
+"""
+
+import timeit
+
+from corpus import CORPUS, compile_source
+from python.interpreter import Interpreter
+
+
+def time_run(interpreter: Interpreter, repeat: int = 5, number: int = 20) -> float:
+    def rerun() -> None:
+        interpreter.ptr = 0
+        interpreter.run_fast()
+
+    return min(timeit.repeat(rerun, repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    print(f"{'program':<14}{'fast (ms)':>11}{'adaptive (ms)':>20}{'specialized':>13}")
+    for program, code in CORPUS.items():
+        bytecode = compile_source(code)
+        fast = time_run(Interpreter(bytecode, fast=True))
+        interpreter = Interpreter(bytecode, adaptive=True)
+        adaptive = time_run(interpreter)
+
+        stats = interpreter.quickening.values()
+        specialized = sum(s.specialized_for is not None for s in stats)
+        print(
+            f"{program:<14}{fast * 1000:>11.2f}"
+            f"{adaptive * 1000:>12.2f} ({fast / adaptive:.2f}x)"
+            f"{f'{specialized}/{len(stats)}':>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
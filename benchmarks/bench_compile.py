@@ -0,0 +1,66 @@
+"""Checks that compilation time grows linearly with the size of the program.
+
+The trees are built directly so that only the compiler is timed. If compiling
+is linear, the time per node stays roughly constant as the programs grow.
+"""
+
+import sys
+import timeit
+
+from python.compiler import Compiler
+from python.parser import (
+    Assignment,
+    Body,
+    BoolOp,
+    Conditional,
+    Constant,
+    ExprStatement,
+    Program,
+    TreeNode,
+    Variable,
+)
+
+
+def boolean_chain(terms: int) -> Program:
+    values = [Variable(f"x{idx}") for idx in range(terms)]
+    return Program([ExprStatement(BoolOp("and", values))])
+
+
+def nested_conditionals(depth: int) -> Program:
+    statement = Assignment([Variable("a")], Constant(depth))
+    for level in range(depth):
+        statement = Conditional(
+            BoolOp("or", [Variable("x"), Constant(level)]),
+            Body([statement, Assignment([Variable("b")], Constant(level))]),
+            Body([Assignment([Variable("c")], Constant(level))]),
+        )
+    return Program([statement])
+
+
+def bench(tree: TreeNode, repeat: int = 5, number: int = 3) -> float:
+    timings = timeit.repeat(
+        lambda: list(Compiler(tree).compile()), repeat=repeat, number=number
+    )
+    return min(timings) / number
+
+
+def main() -> None:
+    sys.setrecursionlimit(50_000)  # The compiler still recurses on nested blocks.
+
+    print(f"{'program':<24}{'size':>8}{'time (ms)':>12}{'us per node':>14}")
+    for terms in [1_000, 2_500, 5_000, 10_000]:
+        timing = bench(boolean_chain(terms))
+        print(
+            f"{'boolean chain':<24}{terms:>8}{timing * 1000:>12.2f}"
+            f"{timing / terms * 1e6:>14.3f}"
+        )
+    for depth in [250, 500, 1_000, 2_000]:
+        timing = bench(nested_conditionals(depth))
+        print(
+            f"{'nested conditionals':<24}{depth:>8}{timing * 1000:>12.2f}"
+            f"{timing / depth * 1e6:>14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compares the execution backends on the same compiled programs.
+
+`run` is the `getattr`-based dispatch loop, `fast` the table-driven loop,
+`closures` the closure-threaded backend, `packed` the loop over the
+array-backed encoding and `verified` the inline loop over a fixed-size stack.
+Each backend is set up once and the timings only cover running the program,
+which is what repeated runs pay for.
+"""
+
+import timeit
+from functools import partial
+from typing import Callable
+
+from corpus import CORPUS, compile_source
+from python.compiler import Bytecode
+from python.interpreter import Interpreter
+from python.threaded import ClosureInterpreter
+from python.packed import PackedInterpreter, pack
+from python.verifier import VerifiedInterpreter, verify
+
+BACKENDS: dict[str, Callable[[list[Bytecode]], Interpreter]] = {
+    "run": Interpreter,
+    "fast": partial(Interpreter, fast=True),
+    "closures": ClosureInterpreter,
+    "packed": lambda bytecode: PackedInterpreter(pack(bytecode)),
+    "verified": lambda bytecode: VerifiedInterpreter(verify(bytecode)),
+}
+
+
+def bench(
+    backend: Callable[[list[Bytecode]], Interpreter],
+    bytecode: list[Bytecode],
+    repeat: int = 5,
+    number: int = 20,
+) -> float:
+    interpreter = backend(bytecode)
+    run = interpreter.run_fast if interpreter.fast else interpreter.run
+
+    def rerun() -> None:
+        interpreter.ptr = 0
+        run()
+
+    timings = timeit.repeat(rerun, repeat=repeat, number=number)
+    return min(timings) / number
+
+
+def main() -> None:
+    header = f"{'program':<14}{'instructions':>14}"
+    for name in BACKENDS:
+        header += f"{name + ' (ms)':>16}"
+    print(header)
+
+    for program, code in CORPUS.items():
+        bytecode = compile_source(code)
+        timings = [bench(backend, bytecode) for backend in BACKENDS.values()]
+        row = f"{program:<14}{len(bytecode):>14}"
+        for timing in timings:
+            row += f"{timing * 1000:>9.2f} ({timings[0] / timing:.1f}x)"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measures what each optimization level does to the corpus.
+
+For every program and optimization level this reports the number of bytecodes
+emitted, the number of bytecodes executed, how that compares to level 0, and
+the time the fast loop takes.
+
+The corpus assigns constants to all of its variables, so from level 1 on the
+constant folder leaves the peephole optimizer little to do. The `peephole` row
+runs the peephole optimizer on the level 0 bytecode instead, where it finds
+the sequences that it exists to rewrite.
+"""
+
+import timeit
+from typing import Any
+
+from corpus import CORPUS
+from python.compiler import Bytecode, Compiler
+from python.interpreter import Handler, Interpreter
+from python.optimizer import OptimizationReport, PeepholeOptimizer
+from python.parser import Parser
+from python.tokenizer import Tokenizer
+
+LEVELS = [0, 1, 2]
+
+
+def count_executed(bytecode: list[Bytecode]) -> int:
+    """Runs the bytecode and counts how many bytecodes were executed."""
+    interpreter = Interpreter(bytecode, fast=True)
+    executed = 0
+
+    def counting(handler: Handler) -> Handler:
+        def counted(stack: list[Any], value: Any, ptr: int) -> int:
+            nonlocal executed
+            executed += 1
+            return handler(stack, value, ptr)
+
+        return counted
+
+    interpreter.threaded_code = [
+        (counting(handler), value) for handler, value in interpreter.threaded_code
+    ]
+    interpreter.run_fast()
+    return executed
+
+
+def time_fast_run(bytecode: list[Bytecode], repeat: int = 5, number: int = 20) -> float:
+    interpreter = Interpreter(bytecode, fast=True)
+
+    def rerun() -> None:
+        interpreter.ptr = 0
+        interpreter.run_fast()
+
+    return min(timeit.repeat(rerun, repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    print(
+        f"{'program':<14}{'level':>9}{'emitted':>10}{'executed':>10}"
+        f"{'vs 0':>8}{'time (ms)':>11}"
+    )
+    for program, code in CORPUS.items():
+        tree = Parser(list(Tokenizer(code))).parse()
+        variants: dict[str, tuple[list[Bytecode], OptimizationReport | None]] = {}
+        for level in LEVELS:
+            compiler = Compiler(tree, optimization_level=level, count_instructions=True)
+            variants[str(level)] = list(compiler.compile()), compiler.report
+        report = OptimizationReport()
+        peephole = PeepholeOptimizer(variants["0"][0], report).optimize()
+        variants["peephole"] = peephole, report
+
+        baseline = count_executed(variants["0"][0])
+        for variant, (bytecode, report) in variants.items():
+            executed = count_executed(bytecode)
+            timing = time_fast_run(bytecode)
+            print(
+                f"{program:<14}{variant:>9}{len(bytecode):>10}{executed:>10}"
+                f"{executed / baseline - 1:>8.1%}{timing * 1000:>11.2f}"
+            )
+            if report is not None:
+                print(f"{'':<20}{report}")
+
+
+if __name__ == "__main__":
+    main()
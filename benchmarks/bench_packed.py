@@ -0,0 +1,46 @@
+"""Compares the memory footprint of list and packed bytecode.
+
+The size of each representation is measured by walking its containers and
+adding up `sys.getsizeof` of every distinct object it reaches, except for the
+`BytecodeType` members and other objects that every program shares.
+"""
+
+import sys
+from enum import Enum
+from typing import Any
+
+from corpus import CORPUS, compile_source
+from python.packed import pack, unpack
+
+
+def deep_sizeof(obj: Any, seen: set[int] | None = None) -> int:
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, Enum) or obj is None:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(value, seen) for value in obj.values())
+    return size
+
+
+def main() -> None:
+    print(
+        f"{'program':<14}{'instructions':>14}{'list (B/ins)':>16}{'packed (B/ins)':>16}"
+    )
+    for program, code in CORPUS.items():
+        bytecode = compile_source(code)
+        packed = pack(bytecode)
+        assert unpack(packed) == bytecode
+        before = deep_sizeof(bytecode) / len(bytecode)
+        after = deep_sizeof(packed) / len(bytecode)
+        print(f"{program:<14}{len(bytecode):>14}{before:>16.1f}{after:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
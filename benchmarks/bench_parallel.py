@@ -0,0 +1,42 @@
+"""Compares tokenizing large code in one process with tokenizing it in parallel.
+
+Reports the tokens per second of the regular expression tokenizer and of
+`tokenize_in_parallel` with a growing number of workers, and the speedup over
+the tokenizer. Going beyond the number of CPUs only adds overhead.
+
+Usage: python bench_parallel.py [MiB]
+"""
+
+import os
+import sys
+import time
+
+from bench_parser_memory import long_program
+from bench_tokenizer import large_file
+from corpus import CORPUS
+from python.parallel import tokenize_in_parallel
+from python.tokenizer import Tokenizer
+
+
+def main() -> None:
+    mib = float(sys.argv[1]) if len(sys.argv) > 1 else 32
+    size = int(mib * 2**20)
+    code = large_file("\n".join([*CORPUS.values(), long_program(1_000)]), size)
+
+    start = time.perf_counter()
+    tokens = list(Tokenizer(code, regex=True))
+    serial = time.perf_counter() - start
+
+    print(f"{len(code) / 2**20:.1f} MiB, {len(tokens):,} tokens, {os.cpu_count()} CPUs")
+    print(f"{'workers':<10}{'tok/s':>14}{'speedup':>10}")
+    print(f"{'serial':<10}{len(tokens) / serial:>14,.0f}{1:>10.2f}")
+    for workers in [1, 2, 4, 8, 16]:
+        start = time.perf_counter()
+        count = sum(1 for _ in tokenize_in_parallel(code, workers))
+        elapsed = time.perf_counter() - start
+        assert count == len(tokens)
+        print(f"{workers:<10}{count / elapsed:>14,.0f}{serial / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
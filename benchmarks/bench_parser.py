@@ -0,0 +1,64 @@
+"""Compares the recursive descent expression parser with the Pratt parser.
+
+The programs are tokenized up front so that only parsing is timed, and both
+parsers are checked to build the same tree.
+"""
+
+import random
+import timeit
+
+from corpus import CORPUS
+from python.parser import Parser
+from python.tokenizer import Token, Tokenizer
+
+
+def expression_program(statements: int = 2_000, seed: int = 0) -> str:
+    """Assignments of long expressions that mix every operator."""
+    rng = random.Random(seed)
+    names = ["a", "b", "c", "d"]
+
+    def expr(depth: int) -> str:
+        if depth > 4 or rng.random() < 0.25:
+            return rng.choice(names + ["1", "2", "3.5", "True"])
+        left, right = expr(depth + 1), expr(depth + 1)
+        template = rng.choice(
+            [
+                "{l} + {r}",
+                "{l} - {r}",
+                "{l} * {r}",
+                "{l} / {r}",
+                "{l} % {r}",
+                "({l}) ** -{r}",
+                "-({l})",
+                "({l}) and ({r})",
+                "({l}) or not ({r})",
+            ]
+        )
+        return template.format(l=left, r=right)
+
+    return "\n".join(f"{rng.choice(names)} = {expr(0)}" for _ in range(statements))
+
+
+def bench(tokens: list[Token], pratt: bool, repeat: int = 5, number: int = 5) -> float:
+    timings = timeit.repeat(
+        lambda: Parser(tokens, pratt=pratt).parse(), repeat=repeat, number=number
+    )
+    return min(timings) / number
+
+
+def main() -> None:
+    programs = {"expressions": expression_program(), **CORPUS}
+    print(f"{'program':<14}{'tokens':>9}{'descent (tok/s)':>18}{'pratt (tok/s)':>16}")
+    for program, code in programs.items():
+        tokens = list(Tokenizer(code))
+        assert Parser(tokens).parse() == Parser(tokens, pratt=False).parse()
+        descent = bench(tokens, pratt=False)
+        pratt = bench(tokens, pratt=True)
+        print(
+            f"{program:<14}{len(tokens):>9}{len(tokens) / descent:>18,.0f}"
+            f"{len(tokens) / pratt:>16,.0f} ({descent / pratt:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
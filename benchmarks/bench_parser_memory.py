@@ -0,0 +1,59 @@
+"""Compares the peak memory of parsing a token list, a tokenizer, and a token buffer.
+
+The source code exists before measuring starts, so this measures tokenizing and
+parsing only. The resulting `Program` grows with the input either way, so this
+reports both the peak and how far the peak went above the finished tree.
+
+Usage: python bench_parser_memory.py [lines]
+"""
+
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from python.parser import Parser, Program
+from python.tokenizer import TokenBuffer, Tokenizer
+
+
+def long_program(lines: int) -> str:
+    """A long sequence of small statements."""
+    statements = ["a = 1", "b = a * 2 + 1", "c = b and not a", "a = -c ** 2 % 7"]
+    return "\n".join(statements[line % len(statements)] for line in range(lines))
+
+
+def measure(parse: Callable[[], Program]) -> tuple[int, int, float]:
+    """Returns the peak memory, the memory kept by the tree, and the time taken."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    tree = parse()
+    elapsed = time.perf_counter() - start
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tree
+    return peak, kept, elapsed
+
+
+def main() -> None:
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    code = long_program(lines)
+    parsers = {
+        "token list": lambda: Parser(list(Tokenizer(code))).parse(),
+        "streaming": lambda: Parser(Tokenizer(code)).parse(),
+        "token buffer": lambda: Parser(TokenBuffer.tokenize(code)).parse(),
+    }
+
+    print(f"{lines:,} lines, {len(code) / 2**20:.1f} MiB of source code")
+    print(
+        f"{'parser':<14}{'peak (MiB)':>12}{'tree (MiB)':>12}{'over tree':>12}{'s':>8}"
+    )
+    for name, parse in parsers.items():
+        peak, kept, elapsed = measure(parse)
+        print(
+            f"{name:<14}{peak / 2**20:>12.1f}{kept / 2**20:>12.1f}"
+            f"{(peak - kept) / 2**20:>12.1f}{elapsed:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
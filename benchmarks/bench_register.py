@@ -0,0 +1,92 @@
+"""Compares the register VM with the stack VM.
+
+Both VMs run the same program trees. For each program, this reports how many
+instructions each VM executes and how long their inline loops take.
+"""
+
+import timeit
+from typing import Any, Callable
+
+from corpus import CORPUS
+from python.compiler import Bytecode, Compiler
+from python.interpreter import Handler, Interpreter
+from python.parser import Parser
+from python.register import (
+    RegisterBytecode,
+    RegisterCompiler,
+    RegisterInterpreter,
+)
+from python.tokenizer import Tokenizer
+
+
+def count_stack_instructions(bytecode: list[Bytecode]) -> int:
+    """Runs the bytecode on the stack VM and counts the bytecodes executed."""
+    interpreter = Interpreter(bytecode, fast=True)
+    executed = 0
+
+    def counting(handler: Handler) -> Handler:
+        def counted(stack: list[Any], value: Any, ptr: int) -> int:
+            nonlocal executed
+            executed += 1
+            return handler(stack, value, ptr)
+
+        return counted
+
+    interpreter.threaded_code = [
+        (counting(handler), value) for handler, value in interpreter.threaded_code
+    ]
+    interpreter.run_fast()
+    return executed
+
+
+class CountingRegisterInterpreter(RegisterInterpreter):
+    executed = 0
+
+    def execute(self, bc: RegisterBytecode) -> None:
+        self.executed += 1
+        super().execute(bc)
+
+
+def bench(run: Callable[[], Any], reset: Callable[[], None]) -> float:
+    def rerun() -> None:
+        reset()
+        run()
+
+    timings = timeit.repeat(rerun, repeat=5, number=20)
+    return min(timings) / 20
+
+
+def main() -> None:
+    print(
+        f"{'program':<14}{'stack ops':>12}{'register ops':>14}"
+        f"{'stack (ms)':>12}{'register (ms)':>22}"
+    )
+    for program, code in CORPUS.items():
+        tree = Parser(list(Tokenizer(code))).parse()
+        bytecode: list[Bytecode] = list(Compiler(tree).compile())
+        registers = RegisterCompiler(tree).compile()
+
+        stack_executed = count_stack_instructions(bytecode)
+        counting_registers = CountingRegisterInterpreter(registers)
+        counting_registers.run()
+
+        stack_vm = Interpreter(bytecode, fast=True)
+        register_vm = RegisterInterpreter(registers, fast=True)
+
+        def reset_stack_vm() -> None:
+            stack_vm.ptr = 0
+
+        def reset_register_vm() -> None:
+            register_vm.ptr = 0
+
+        stack_time = bench(stack_vm.run_fast, reset_stack_vm)
+        register_time = bench(register_vm.run_fast, reset_register_vm)
+        print(
+            f"{program:<14}{stack_executed:>12}{counting_registers.executed:>14}"
+            f"{stack_time * 1000:>12.2f}{register_time * 1000:>14.2f} "
+            f"({stack_time / register_time:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compares variables looked up by name with variables resolved to slots.
+
+Each program is compiled twice, once with `SAVE`/`LOAD` and once with
+`SAVE_SLOT`/`LOAD_SLOT`, and both are run by the table-driven loop and by the
+closure-threaded backend.
+"""
+
+import timeit
+
+from corpus import CORPUS
+from python.compiler import Compiler
+from python.interpreter import Interpreter
+from python.parser import Parser
+from python.threaded import ClosureInterpreter
+from python.tokenizer import Tokenizer
+
+
+def bench(interpreter: Interpreter, repeat: int = 5, number: int = 20) -> float:
+    run = interpreter.run_fast if interpreter.fast else interpreter.run
+
+    def rerun() -> None:
+        interpreter.ptr = 0
+        run()
+
+    timings = timeit.repeat(rerun, repeat=repeat, number=number)
+    return min(timings) / number
+
+
+def main() -> None:
+    print(f"{'program':<14}{'backend':>10}{'names (ms)':>14}{'slots (ms)':>20}")
+    for program, code in CORPUS.items():
+        tree = Parser(list(Tokenizer(code))).parse()
+        names = list(Compiler(tree).compile())
+        compiler = Compiler(tree, slots=True)
+        slots = list(compiler.compile())
+        slot_names = compiler.slot_names
+
+        backends = {
+            "fast": (
+                Interpreter(names, fast=True),
+                Interpreter(slots, fast=True, slot_names=slot_names),
+            ),
+            "closures": (
+                ClosureInterpreter(names),
+                ClosureInterpreter(slots, slot_names=slot_names),
+            ),
+        }
+        for backend, (by_name, by_slot) in backends.items():
+            before, after = bench(by_name), bench(by_slot)
+            print(
+                f"{program:<14}{backend:>10}{before * 1000:>14.2f}"
+                f"{after * 1000:>13.2f} ({before / after:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Measures which bytecode sequences to fuse and what each fusion gains.
+
+First, the programs in the corpus are compiled and go through the peephole
+optimizer, like with optimization level 3 but without constant folding, which
+turns most of the corpus into constants. Then, they run while recording the
+sequences of two and three bytecodes that execute one after the other, without
+jumps in between. Then, each superinstruction is
+fused on its own, and all of them together, to report how many bytecodes are
+executed and how long the fast loop and the closures take.
+"""
+
+import timeit
+from collections import Counter
+from typing import Any
+
+from corpus import CORPUS, compile_source
+from python.compiler import Bytecode, BytecodeType, JUMP_TYPES
+from python.interpreter import Handler, Interpreter
+from python.optimizer import (
+    PeepholeOptimizer,
+    SUPERINSTRUCTIONS,
+    SuperinstructionFuser,
+)
+from python.threaded import ClosureInterpreter
+
+
+def trace(bytecode: list[Bytecode]) -> list[int]:
+    """Runs the bytecode and returns the positions of the bytecodes executed."""
+    interpreter = Interpreter(bytecode, fast=True)
+    executed: list[int] = []
+
+    def tracing(handler: Handler) -> Handler:
+        def traced(stack: list[Any], value: Any, ptr: int) -> int:
+            executed.append(ptr)
+            return handler(stack, value, ptr)
+
+        return traced
+
+    interpreter.threaded_code = [
+        (tracing(handler), value) for handler, value in interpreter.threaded_code
+    ]
+    interpreter.run_fast()
+    return executed
+
+
+def count_sequences(bytecode: list[Bytecode], length: int) -> Counter:
+    executed = trace(bytecode)
+    sequences: Counter = Counter()
+    for idx in range(len(executed) - length + 1):
+        positions = executed[idx : idx + length]
+        if positions[-1] - positions[0] != length - 1:
+            continue  # A jump was taken inside the sequence.
+        types = tuple(bytecode[ptr].type for ptr in positions)
+        if not any(bct in JUMP_TYPES for bct in types):
+            sequences[types] += 1
+    return sequences
+
+
+def time_run(interpreter: Interpreter, repeat: int = 5, number: int = 20) -> float:
+    run = interpreter.run_fast if interpreter.fast else interpreter.run
+
+    def rerun() -> None:
+        interpreter.ptr = 0
+        run()
+
+    return min(timeit.repeat(rerun, repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    programs = {
+        program: PeepholeOptimizer(compile_source(code)).optimize()
+        for program, code in CORPUS.items()
+    }
+
+    for length in [2, 3]:
+        sequences: Counter = Counter()
+        executed = 0
+        for bytecode in programs.values():
+            sequences += count_sequences(bytecode, length)
+            executed += len(trace(bytecode))
+        print(f"Most frequent sequences of {length} bytecodes without jumps:")
+        for types, count in sequences.most_common(8):
+            names = "; ".join(bct.name for bct in types)
+            print(f"{count / executed:>8.1%}  {names}")
+        print()
+
+    fusions: dict[str, dict[tuple[BytecodeType, ...], BytecodeType]] = {
+        "none": {},
+        **{
+            fused.name: {sequence: fused}
+            for sequence, fused in SUPERINSTRUCTIONS.items()
+        },
+        "all": SUPERINSTRUCTIONS,
+    }
+    print(
+        f"{'program':<14}{'fusion':>17}{'executed':>10}"
+        f"{'fast (ms)':>16}{'closures (ms)':>18}"
+    )
+    for program, bytecode in programs.items():
+        baseline: tuple[float, float] | None = None
+        for name, superinstructions in fusions.items():
+            fused = SuperinstructionFuser(bytecode, superinstructions).fuse()
+            fast = time_run(Interpreter(fused, fast=True))
+            closures = time_run(ClosureInterpreter(fused))
+            baseline = baseline or (fast, closures)
+            print(
+                f"{program:<14}{name:>17}{len(trace(fused)):>10}"
+                f"{fast * 1000:>9.2f} ({baseline[0] / fast:.2f}x)"
+                f"{closures * 1000:>11.2f} ({baseline[1] / closures:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compares the character scanning tokenizer with the regular expression one.
+
+Each program is repeated until it is a large file, both engines are checked to
+produce the same tokens, and this reports how many tokens per second each one
+produces, and how many the regular expression one produces when it reads the
+code from a file in chunks.
+"""
+
+import tempfile
+import timeit
+
+from bench_parser import expression_program
+from bench_parser_memory import long_program
+from corpus import CORPUS
+from python.tokenizer import Token, Tokenizer
+
+
+def large_file(code: str, size: int = 2**20) -> str:
+    """Repeats the code until it is at least `size` characters long."""
+    return "\n".join([code] * (size // (len(code) + 1) + 1))
+
+
+def tokens_per_second(code: str, regex: bool, repeat: int = 3) -> tuple[int, float]:
+    count = len(list(Tokenizer(code, regex=regex)))
+    timings = timeit.repeat(
+        lambda: list(Tokenizer(code, regex=regex)), repeat=repeat, number=1
+    )
+    return count, count / min(timings)
+
+
+def file_tokens_per_second(code: str, repeat: int = 3) -> float:
+    with tempfile.TemporaryFile("w+") as file:
+        file.write(code)
+
+        def tokenize() -> list[Token]:
+            file.seek(0)
+            return list(Tokenizer(file))
+
+        count = len(tokenize())
+        return count / min(timeit.repeat(tokenize, repeat=repeat, number=1))
+
+
+def main() -> None:
+    programs = {name: large_file(code) for name, code in CORPUS.items()}
+    programs["expressions"] = large_file(expression_program())
+    programs["statements"] = large_file(long_program(1_000))
+
+    print(
+        f"{'program':<14}{'tokens':>10}{'scanner (tok/s)':>18}"
+        f"{'regex (tok/s)':>18}{'file (tok/s)':>18}"
+    )
+    for name, code in programs.items():
+        assert list(Tokenizer(code, regex=True)) == list(Tokenizer(code))
+        tokens, scanner = tokens_per_second(code, regex=False)
+        _, regex = tokens_per_second(code, regex=True)
+        file = file_tokens_per_second(code)
+        print(f"{name:<14}{tokens:>10}{scanner:>18,.0f}{regex:>18,.0f}{file:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Tokenizes a multi-GB file read into a `str`, read in chunks, and mapped with mmap.
+
+Each way runs in a fresh process, which reports its throughput, its peak RSS,
+and how much of its RSS is anonymous memory and how much is pages of the file.
+Pages of a mapped file count towards RSS once they're read, but the kernel can
+drop them at any time, unlike anonymous memory.
+
+Usage: python bench_tokenizer_files.py [GiB]
+"""
+
+import mmap
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from bench_parser_memory import long_program
+from python.tokenizer import Tokenizer
+
+
+def write_file(path: Path, size: int) -> None:
+    block = (long_program(10_000) + "\n").encode()
+    with path.open("wb") as file:
+        for _ in range(size // len(block) + 1):
+            file.write(block)
+
+
+def memory() -> dict[str, int]:
+    """The current anonymous and file-backed RSS, in KiB."""
+    status = Path("/proc/self/status").read_text().splitlines()
+    fields = dict(line.split(":", 1) for line in status)
+    return {key: int(fields[key].split()[0]) for key in ["RssAnon", "RssFile"]}
+
+
+def tokenize(path: Path, way: str) -> dict[str, Any]:
+    start = time.perf_counter()
+    with path.open("rb") as file:
+        code: Any = file
+        if way == "str":
+            code = path.read_text()
+        elif way == "mmap":
+            code = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        tokens = sum(1 for _ in Tokenizer(code, regex=True))
+        # Measured while the code is still alive.
+        current = memory()
+        if way == "mmap":
+            code.close()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"tokens": tokens, "seconds": elapsed, "peak": peak, **current}
+
+
+def main() -> None:
+    gib = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "code.py"
+        write_file(path, int(gib * 2**30))
+        print(f"{path.stat().st_size / 2**30:.2f} GiB file")
+        print(
+            f"{'way':<8}{'tokens':>14}{'tok/s':>12}"
+            f"{'peak RSS (MiB)':>16}{'anon (MiB)':>12}{'file (MiB)':>12}"
+        )
+        for way in ["str", "chunks", "mmap"]:
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                result = executor.submit(tokenize, path, way).result()
+            print(
+                f"{way:<8}{result['tokens']:>14,}"
+                f"{result['tokens'] / result['seconds']:>12,.0f}"
+                f"{result['peak'] / 2**10:>16,.0f}"
+                f"{result['RssAnon'] / 2**10:>12,.0f}"
+                f"{result['RssFile'] / 2**10:>12,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
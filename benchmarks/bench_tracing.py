@@ -0,0 +1,66 @@
+"""Compares the fast loop with and without traces.
+
+Each program runs many times on the same interpreter. The variables that a
+program assigns a constant to on its first lines are treated as inputs
+instead: they are removed from the program and given random values on every
+run, so that different runs take different branches.
+"""
+
+import random
+import re
+import time
+from typing import Any
+
+from corpus import CORPUS, compile_source
+from python.interpreter import Interpreter
+from python.tracing import TracingInterpreter
+
+RUNS = 2_000
+INPUT = re.compile(r"(\w+) = \d+")
+
+
+def split_inputs(code: str) -> tuple[list[str], str]:
+    """Splits the leading `name = <int>` lines from the rest of the program."""
+    lines = code.splitlines()
+    names: list[str] = []
+    while lines and (match := INPUT.fullmatch(lines[0])):
+        names.append(match.group(1))
+        lines.pop(0)
+    return names, "\n".join(lines)
+
+
+def time_runs(interpreter: Interpreter, inputs: list[dict[str, Any]]) -> float:
+    started = time.perf_counter()
+    for scope in inputs:
+        interpreter.scope = dict(scope)
+        interpreter.ptr = 0
+        interpreter.run_fast()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    print(
+        f"{'program':<14}{'fast (ms)':>11}{'tracing (ms)':>19}"
+        f"{'traces':>8}{'dropped':>9}{'guard failures':>16}{'saved (ms)':>12}"
+    )
+    rng = random.Random(0)
+    for program, code in CORPUS.items():
+        names, code = split_inputs(code)
+        bytecode = compile_source(code)
+        inputs = [{name: rng.randint(1, 3) for name in names} for _ in range(RUNS)]
+
+        fast = time_runs(Interpreter(bytecode, fast=True), inputs)
+        interpreter = TracingInterpreter(bytecode)
+        tracing = time_runs(interpreter, inputs)
+        stats = interpreter.stats
+        print(
+            f"{program:<14}{fast * 1000:>11.1f}"
+            f"{tracing * 1000:>11.1f} ({fast / tracing:.2f}x)"
+            f"{stats.traces_compiled:>8}{stats.traces_dropped:>9}"
+            f"{stats.guard_failures:>16}"
+            f"{stats.time_saved * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Deterministic, generated programs shared by the benchmark scripts.
+
+Run the benchmarks from the repository root with the package on the path, e.g.:
+
+    PYTHONPATH=src python benchmarks/bench_dispatch.py
+"""
+
+import random
+
+from python.compiler import Bytecode, Compiler
+from python.parser import Parser
+from python.tokenizer import Tokenizer
+
+
+def arithmetic_program(statements: int = 2_000, seed: int = 0) -> str:
+    """Straight-line assignments mixing variables, constants and all operators."""
+    rng = random.Random(seed)
+    names = ["a", "b", "c", "d", "rate", "total", "x", "y"]
+    lines = [f"{name} = {rng.randint(1, 9)}" for name in names]
+    for _ in range(statements):
+        target = rng.choice(names)
+        a, b, c = rng.sample(names, 3)
+        k = rng.randint(2, 9)
+        template = rng.choice(
+            [
+                "{t} = ({a} * {k} + {b}) % 1000",
+                "{t} = ({a} + {b} * {c}) % 997",
+                "{t} = {a} - {b} + {k}",
+                "{t} = ({a} * {b} - {c}) % 1009",
+                "{t} = {a} / {k} + {b} % {k}",
+                "{t} = -{a} + {k} ** 2",
+                "{t} = {u} = ({a} + {k}) % 100",
+            ]
+        )
+        u = rng.choice(names)
+        lines.append(template.format(t=target, u=u, a=a, b=b, c=c, k=k))
+    return "\n".join(lines)
+
+
+def conditional_program(blocks: int = 500, seed: int = 0) -> str:
+    """Conditionals with Boolean operators, `elif` chains and nested blocks."""
+    rng = random.Random(seed)
+    names = ["p", "q", "r", "s"]
+    lines = [f"{name} = {rng.randint(0, 3)}" for name in names]
+    for _ in range(blocks):
+        a, b, c = rng.sample(names, 3)
+        lines.extend(
+            [
+                f"if {a} and not {b} or {c}:",
+                f"    {a} = ({a} + 1) % 4",
+                f"    if {b} or {c} and {a}:",
+                f"        {b} = ({b} + {c}) % 4",
+                f"elif {b} and {c}:",
+                f"    {c} = ({c} * 3) % 4",
+                f"elif not {a}:",
+                f"    {a} = {b} % 4",
+                "else:",
+                f"    {b} = ({a} + {b} + {c}) % 4",
+                f"{a} and {b} or {c}",
+            ]
+        )
+    return "\n".join(lines)
+
+
+def rules_program(rules: int = 500, seed: int = 0) -> str:
+    """Generated rules with constant subexpressions and feature flags."""
+    rng = random.Random(seed)
+    lines = [
+        "seconds_per_day = 60 * 60 * 24",
+        "debug = False",
+        "enabled = True",
+        "level = 2",
+        "total = 0",
+    ]
+    for idx in range(rules):
+        k = rng.randint(2, 9)
+        lines.extend(
+            [
+                f"rate = seconds_per_day * {k} / (3600 * 24)",
+                "if debug:",
+                f"    total = total - rate * {idx}",
+                "elif enabled and level - 2:",
+                "    total = total + 1",
+                "elif enabled:",
+                f"    total = (total + rate * {k} ** 2) % 1000",
+                "else:",
+                "    total = 0",
+                f"{k} * {k} + 1",
+            ]
+        )
+    return "\n".join(lines)
+
+
+CORPUS: dict[str, str] = {
+    "arithmetic": arithmetic_program(),
+    "conditionals": conditional_program(),
+    "rules": rules_program(),
+}
+
+
+def compile_source(code: str) -> list[Bytecode]:
+    """Tokenizes, parses and compiles a program with the default pipeline."""
+    return list(Compiler(Parser(list(Tokenizer(code))).parse()).compile())
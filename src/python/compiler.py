@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import auto, StrEnum
-from typing import Any, Generator
+from typing import Any, Generator, Iterator, TYPE_CHECKING
 
 from .parser import (
     Assignment,
@@ -14,8 +14,12 @@ from .parser import (
     TreeNode,
     UnaryOp,
     Variable,
+    conditional_arms,
 )
 
+if TYPE_CHECKING:
+    from .optimizer import OptimizationReport
+
 
 class BytecodeType(StrEnum):
     BINOP = auto()
@@ -28,11 +32,37 @@ class BytecodeType(StrEnum):
     POP_JUMP_IF_FALSE = auto()
     POP_JUMP_IF_TRUE = auto()
     JUMP_FORWARD = auto()
+    JUMP_IF_FALSE_OR_POP = auto()
+    JUMP_IF_TRUE_OR_POP = auto()
+    SAVE_SLOT = auto()
+    LOAD_SLOT = auto()
+    # Superinstructions, whose value is the tuple of values of the bytecodes they fuse.
+    LOAD_PUSH_BINOP = auto()
+    LOAD_LOAD_BINOP = auto()
+    PUSH_BINOP = auto()
+    BINOP_SAVE = auto()
+    COPY_SAVE = auto()
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}.{self.name}"
 
 
+OPCODES: dict[BytecodeType, int] = {bct: idx for idx, bct in enumerate(BytecodeType)}
+"""Maps each bytecode type to a small integer that can index into tables."""
+
+JUMP_TYPES = {
+    BytecodeType.POP_JUMP_IF_FALSE,
+    BytecodeType.POP_JUMP_IF_TRUE,
+    BytecodeType.JUMP_FORWARD,
+    BytecodeType.JUMP_IF_FALSE_OR_POP,
+    BytecodeType.JUMP_IF_TRUE_OR_POP,
+}
+"""Bytecode types whose value is the offset to the jump target, relative to them."""
+
+SLOT_TYPES = {BytecodeType.SAVE_SLOT, BytecodeType.LOAD_SLOT}
+"""Bytecode types whose value is the index of the slot that holds a variable."""
+
+
 @dataclass
 class Bytecode:
     type: BytecodeType
@@ -48,94 +78,238 @@ class Bytecode:
 type BytecodeGenerator = Generator[Bytecode, None, None]
 
 
+@dataclass
+class Label:
+    """A position in the bytecode that jumps can target before it is known.
+
+    Jumps to a label that isn't bound yet are recorded and back-patched once
+    the label is bound.
+    """
+
+    position: int | None = None
+    jumps: list[int] = field(default_factory=list)
+
+
 class Compiler:
-    def __init__(self, tree: TreeNode) -> None:
+    """Compiles a program tree into bytecode.
+
+    The compiler appends bytecode to a single buffer and uses labels for jump
+    targets, so compiling takes time linear in the size of the program.
+
+    With `optimization_level` 1 or higher, constant subexpressions are folded
+    and constants are propagated through assignments before compiling. With
+    `optimization_level` 2 or higher, the emitted bytecode also goes through
+    the peephole optimizer. With `optimization_level` 3 or higher, frequent
+    sequences of bytecodes are then fused into superinstructions. `report`
+    tells what the optimizations did. Its instruction counts only cover all the
+    optimizations with `count_instructions`, because counting the instructions
+    of the unoptimized program takes compiling it twice. Otherwise, they're
+    those of the last pass over the bytecode, if any.
+
+    With `slots`, every variable is resolved to a fixed slot index and the
+    compiler emits `SAVE_SLOT` and `LOAD_SLOT` instead of `SAVE` and `LOAD`.
+    `slot_names` lists the variables by slot index. A variable that isn't
+    assigned on every path that leads to one of its loads is a compile error,
+    so slot loads never fail at runtime.
+    """
+
+    def __init__(
+        self,
+        tree: TreeNode,
+        optimization_level: int = 0,
+        slots: bool = False,
+        count_instructions: bool = False,
+    ) -> None:
         self.tree = tree
+        self.optimization_level = optimization_level
+        self.slots = slots
+        self.count_instructions = count_instructions
+        self.report: OptimizationReport | None = None
+        self.bytecode: list[Bytecode] = []
+        self.slot_names: list[str] = []
+        self.slot_indices: dict[str, int] = {}
+        self.assigned: set[str] = set()
+        """The variables that are definitely assigned at the current position."""
 
     def compile(self) -> BytecodeGenerator:
-        yield from self._compile(self.tree)
+        if self.optimization_level < 1:
+            yield from self.assemble(self.tree)
+            return
+
+        # Imported here to avoid a circular import, since the optimizer needs the
+        # bytecode definitions above.
+        from .optimizer import ConstantFolder, PeepholeOptimizer, SuperinstructionFuser
+
+        folder = ConstantFolder(self.tree)
+        folded = folder.fold()
+        self.report = folder.report
+        instructions_before = None
+        if self.count_instructions:
+            # Pruned branches can make loads in the folded tree definitely assigned
+            # when they aren't in the original tree, so count those without slots.
+            slots, self.slots = self.slots, False
+            instructions_before = len(self.assemble(self.tree))
+            self.slots = slots
+        bytecode = self.assemble(folded)
+        if self.optimization_level >= 2:
+            bytecode = PeepholeOptimizer(bytecode, self.report).optimize()
+        if self.optimization_level >= 3:
+            bytecode = SuperinstructionFuser(bytecode, report=self.report).fuse()
+        if instructions_before is not None:
+            self.report.instructions_before = instructions_before
+            self.report.instructions_after = len(bytecode)
+        yield from bytecode
 
-    def _compile(self, tree: TreeNode) -> BytecodeGenerator:
-        node_name = tree.__class__.__name__
-        compile_method = getattr(self, f"compile_{node_name}", None)
-        if compile_method is None:
-            raise RuntimeError(f"Can't compile {node_name}.")
-        yield from compile_method(tree)
+    def assemble(self, tree: TreeNode) -> list[Bytecode]:
+        """Compiles the given tree into a fresh bytecode buffer."""
+        self.bytecode = []
+        self.slot_names = []
+        self.slot_indices = {}
+        self.assigned = set()
+        self._compile(tree)
+        return self.bytecode
 
-    def compile_Program(self, program: Program) -> BytecodeGenerator:
+    def emit(self, type: BytecodeType, value: Any = None) -> None:
+        self.bytecode.append(Bytecode(type, value))
+
+    def emit_jump(self, type: BytecodeType, label: Label) -> None:
+        """Emits a jump to the given label, back-patching it later if needed."""
+        if label.position is None:
+            label.jumps.append(len(self.bytecode))
+            self.emit(type)
+        else:
+            self.emit(type, label.position - len(self.bytecode))
+
+    def bind(self, label: Label) -> None:
+        """Binds the label to the next position and patches the jumps to it."""
+        label.position = len(self.bytecode)
+        for jump in label.jumps:
+            self.bytecode[jump].value = label.position - jump
+        label.jumps.clear()
+
+    def slot(self, name: str) -> int:
+        """Returns the slot index of the given variable, allocating it if needed."""
+        if name not in self.slot_indices:
+            self.slot_indices[name] = len(self.slot_names)
+            self.slot_names.append(name)
+        return self.slot_indices[name]
+
+    def emit_save(self, name: str) -> None:
+        if self.slots:
+            self.emit(BytecodeType.SAVE_SLOT, self.slot(name))
+            self.assigned.add(name)
+        else:
+            self.emit(BytecodeType.SAVE, name)
+
+    def _compile(self, tree: TreeNode) -> None:
+        """Compiles the tree without recursing, however deeply it's nested.
+
+        The `compile_` methods of nodes with children are generators that yield
+        each child when it must be compiled, and they are resumed once it is.
+        """
+        pending: list[Iterator[TreeNode]] = [iter([tree])]
+        while pending:
+            child = next(pending[-1], None)
+            if child is None:
+                pending.pop()
+                continue
+            node_name = child.__class__.__name__
+            compile_method = getattr(self, f"compile_{node_name}", None)
+            if compile_method is None:
+                raise RuntimeError(f"Can't compile {node_name}.")
+            children = compile_method(child)
+            if children is not None:
+                pending.append(children)
+
+    def compile_Program(self, program: Program) -> Iterator[TreeNode]:
         for statement in program.statements:
-            yield from self._compile(statement)
-
-    def compile_Conditional(self, conditional: Conditional) -> BytecodeGenerator:
-        condition_bytecode = self._compile(conditional.condition)
-        body_bytecode = list(self._compile(conditional.body))
-        orelse = conditional.orelse
-        orelse_bytecode = [] if orelse is None else list(self._compile(orelse))
-
-        # Add a “jump past the else” at the end of the `if` when needed:
-        if orelse_bytecode:
-            body_bytecode.append(
-                Bytecode(BytecodeType.JUMP_FORWARD, len(orelse_bytecode) + 1)
-            )
-
-        yield from condition_bytecode
-        yield Bytecode(  # If the condition is false, jump past the body of the `if`.
-            BytecodeType.POP_JUMP_IF_FALSE, len(body_bytecode) + 1
-        )
-        yield from body_bytecode
-        yield from orelse_bytecode
+            yield statement
+
+    def compile_Conditional(self, conditional: Conditional) -> Iterator[TreeNode]:
+        arms, orelse = conditional_arms(conditional)
+        if isinstance(orelse, Body) and not orelse.statements:
+            orelse = None
+
+        # A variable is definitely assigned after the conditional if it is
+        # definitely assigned at the end of every arm, including the missing `else`.
+        before = self.assigned
+        assigned_by_arms: list[set[str]] = []
 
-    def compile_Body(self, body: Body) -> BytecodeGenerator:
+        end_label = Label()
+        for idx, arm in enumerate(arms):
+            next_arm_label = Label()
+            yield arm.condition
+            # If the condition is false, jump past the body of this arm.
+            self.emit_jump(BytecodeType.POP_JUMP_IF_FALSE, next_arm_label)
+            self.assigned = set(before)
+            yield arm.body
+            assigned_by_arms.append(self.assigned)
+            self.assigned = before
+            if idx < len(arms) - 1 or orelse is not None:
+                # Jump past the remaining `elif`/`else` arms.
+                self.emit_jump(BytecodeType.JUMP_FORWARD, end_label)
+            self.bind(next_arm_label)
+
+        if orelse is not None:
+            self.assigned = set(before)
+            yield orelse
+        assigned_by_arms.append(self.assigned)
+        self.bind(end_label)
+        self.assigned = set.intersection(*assigned_by_arms)
+
+    def compile_Body(self, body: Body) -> Iterator[TreeNode]:
         for statement in body.statements:
-            yield from self._compile(statement)
+            yield statement
 
-    def compile_Assignment(self, assignment: Assignment) -> BytecodeGenerator:
-        yield from self._compile(assignment.value)
+    def compile_Assignment(self, assignment: Assignment) -> Iterator[TreeNode]:
+        yield assignment.value
         # For all but the last, we create a copy before saving.
         for target in assignment.targets[:-1]:
-            yield Bytecode(BytecodeType.COPY)
-            yield Bytecode(BytecodeType.SAVE, target.name)
+            self.emit(BytecodeType.COPY)
+            self.emit_save(target.name)
         # Last one, we can finally consume the value at the top of the stack.
-        yield Bytecode(BytecodeType.SAVE, assignment.targets[-1].name)
+        self.emit_save(assignment.targets[-1].name)
 
-    def compile_ExprStatement(self, expression: ExprStatement) -> BytecodeGenerator:
-        yield from self._compile(expression.expr)
-        yield Bytecode(BytecodeType.POP)
+    def compile_ExprStatement(self, expression: ExprStatement) -> Iterator[TreeNode]:
+        yield expression.expr
+        self.emit(BytecodeType.POP)
 
-    def compile_BoolOp(self, tree: BoolOp) -> BytecodeGenerator:
-        compiled_values = [list(self._compile(value)) for value in tree.values]
-        compiled_lengths = [len(bytecode) for bytecode in compiled_values]
+    def compile_BoolOp(self, tree: BoolOp) -> Iterator[TreeNode]:
         jump_bytecode = (
             BytecodeType.POP_JUMP_IF_FALSE
             if tree.op == "and"
             else BytecodeType.POP_JUMP_IF_TRUE
         )
 
-        for emitted, compiled_value in enumerate(compiled_values[:-1], start=1):
-            yield from compiled_value
-            jump_segments_missing = len(tree.values) - emitted - 1
-            jump_location = (
-                sum(compiled_lengths[emitted:]) + jump_segments_missing * 3 + 2
-            )
-            yield Bytecode(BytecodeType.COPY)
-            yield Bytecode(jump_bytecode, jump_location)
-            yield Bytecode(BytecodeType.POP)
-        yield from compiled_values[-1]
+        # Short-circuiting jumps past the remaining values with the value on the stack.
+        end_label = Label()
+        for value in tree.values[:-1]:
+            yield value
+            self.emit(BytecodeType.COPY)
+            self.emit_jump(jump_bytecode, end_label)
+            self.emit(BytecodeType.POP)
+        yield tree.values[-1]
+        self.bind(end_label)
 
-    def compile_UnaryOp(self, tree: UnaryOp) -> BytecodeGenerator:
-        yield from self._compile(tree.value)
-        yield Bytecode(BytecodeType.UNARYOP, tree.op)
+    def compile_UnaryOp(self, tree: UnaryOp) -> Iterator[TreeNode]:
+        yield tree.value
+        self.emit(BytecodeType.UNARYOP, tree.op)
 
-    def compile_BinOp(self, tree: BinOp) -> BytecodeGenerator:
-        yield from self._compile(tree.left)
-        yield from self._compile(tree.right)
-        yield Bytecode(BytecodeType.BINOP, tree.op)
+    def compile_BinOp(self, tree: BinOp) -> Iterator[TreeNode]:
+        yield tree.left
+        yield tree.right
+        self.emit(BytecodeType.BINOP, tree.op)
 
-    def compile_Constant(self, constant: Constant) -> BytecodeGenerator:
-        yield Bytecode(BytecodeType.PUSH, constant.value)
+    def compile_Constant(self, constant: Constant) -> None:
+        self.emit(BytecodeType.PUSH, constant.value)
 
-    def compile_Variable(self, var: Variable) -> BytecodeGenerator:
-        yield Bytecode(BytecodeType.LOAD, var.name)
+    def compile_Variable(self, var: Variable) -> None:
+        if not self.slots:
+            self.emit(BytecodeType.LOAD, var.name)
+        elif var.name in self.assigned:
+            self.emit(BytecodeType.LOAD_SLOT, self.slot(var.name))
+        else:
+            raise RuntimeError(f"Variable {var.name} might not be assigned.")
 
 
 if __name__ == "__main__":
@@ -144,6 +318,10 @@ if __name__ == "__main__":
     from .parser import Parser
 
     code = sys.argv[1]
-    compiler = Compiler(Parser(list(Tokenizer(code))).parse())
+    optimization_level = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    tree = Parser(Tokenizer(code)).parse()
+    compiler = Compiler(tree, optimization_level, count_instructions=True)
     for bc in compiler.compile():
         print(bc)
+    if compiler.report is not None:
+        print(f"Removed {compiler.report.instructions_removed} instructions.")
@@ -1,7 +1,10 @@
 import operator
-from typing import Any
+from typing import Any, Callable, TYPE_CHECKING
 
-from .compiler import Bytecode
+from .compiler import Bytecode, BytecodeType, OPCODES
+
+if TYPE_CHECKING:
+    from .quickening import QuickeningStats
 
 
 BINOPS_TO_OPERATOR = {
@@ -14,6 +17,42 @@ BINOPS_TO_OPERATOR = {
 }
 
 
+def resolve_binop(op: Any) -> Callable[[Any, Any], Any]:
+    """Returns the function for the operator, or one that raises if it's unknown."""
+    function = BINOPS_TO_OPERATOR.get(op, None)
+    if function is not None:
+        return function
+
+    def unknown_binop(left: Any, right: Any) -> Any:
+        raise RuntimeError(f"Unknown operator {op}.")
+
+    return unknown_binop
+
+
+FUSED_BINOP_TYPES = {
+    BytecodeType.LOAD_PUSH_BINOP,
+    BytecodeType.LOAD_LOAD_BINOP,
+    BytecodeType.PUSH_BINOP,
+}
+"""Superinstructions whose value ends with a binary operator."""
+
+OPERATOR_TYPES = {BytecodeType.BINOP, BytecodeType.BINOP_SAVE} | FUSED_BINOP_TYPES
+"""Bytecode types whose value has a binary operator."""
+
+
+def resolve_operators(type: BytecodeType, value: Any) -> Any:
+    """Returns the value of a bytecode with its binary operator resolved, if any."""
+    if type == BytecodeType.BINOP:
+        return resolve_binop(value)
+    elif type in FUSED_BINOP_TYPES:
+        *operands, op = value
+        return (*operands, resolve_binop(op))
+    elif type == BytecodeType.BINOP_SAVE:
+        op, name = value
+        return (resolve_binop(op), name)
+    return value
+
+
 class Stack:
     def __init__(self) -> None:
         self.stack: list[int] = []
@@ -31,15 +70,90 @@ class Stack:
         return f"Stack({self.stack})"
 
 
+UNBOUND: Any = object()
+"""Marks the slots of variables that haven't been assigned yet."""
+
+
+type Handler = Callable[[list[Any], Any, int], int]
+"""A fast handler takes the raw stack, the bytecode value, and the pointer,
+and returns the pointer to the next bytecode to execute."""
+
+
 class Interpreter:
-    def __init__(self, bytecode: list[Bytecode]) -> None:
+    """Runs bytecode on a stack.
+
+    Variables saved with `SAVE` live in a dictionary. Variables saved with
+    `SAVE_SLOT` live in the preallocated list `slots`, whose variable names
+    are given in `slot_names`, and only go into `scope` when it's accessed.
+
+    The values in `threaded_code` have their binary operators already resolved
+    with `resolve_operators`. In `adaptive` mode, which implies `fast`,
+    `BINOP` and `UNARYOP` instructions that warm up with numeric operands
+    rewrite their entry in `threaded_code` with a handler that inlines the
+    operation. `quickening` has the counters of each adaptive instruction, by
+    position.
+    """
+
+    def __init__(
+        self,
+        bytecode: list[Bytecode],
+        fast: bool = False,
+        slot_names: list[str] | None = None,
+        adaptive: bool = False,
+    ) -> None:
         self.stack = Stack()
-        self.scope: dict[str, Any] = {}
+        self.slot_names = [] if slot_names is None else slot_names
+        self.slots: list[Any] = [UNBOUND] * len(self.slot_names)
+        self.scope = {}
         self.bytecode = bytecode
         self.ptr: int = 0
         self.last_value_popped: Any = None
+        self.fast = fast or adaptive
+        self.adaptive = adaptive
+
+        # Resolve every bytecode type to its fast handler exactly once.
+        self.handlers: list[Handler] = [
+            getattr(self, f"fast_{bct.value}") for bct in BytecodeType
+        ]
+        self.threaded_code: list[tuple[Handler, Any]] = []
+        if self.fast:
+            self.threaded_code = [
+                (self.handlers[OPCODES[bc.type]], resolve_operators(bc.type, bc.value))
+                for bc in bytecode
+            ]
+
+        self.quickening: dict[int, QuickeningStats] = {}
+        if adaptive:
+            # Imported here to avoid a circular import, like in `Compiler.compile`.
+            from .quickening import quicken
+
+            self.quickening = quicken(self)
+
+    @property
+    def scope(self) -> dict[str, Any]:
+        """The variables by name, including the ones that live in slots."""
+        for name, value in zip(self.slot_names, self.slots):
+            if value is not UNBOUND:
+                self._scope[name] = value
+        return self._scope
+
+    @scope.setter
+    def scope(self, scope: dict[str, Any]) -> None:
+        self._scope = scope
+        self.slots[:] = [scope.get(name, UNBOUND) for name in self.slot_names]
 
     def interpret(self) -> None:
+        if self.fast:
+            self.run_fast()
+        else:
+            self.run()
+
+        print("Done!")
+        print(self.scope)
+        print(self.last_value_popped)
+
+    def run(self) -> None:
+        """Runs the bytecode, looking up the method for each bytecode as it goes."""
         while self.ptr < len(self.bytecode):
             bc = self.bytecode[self.ptr]
             bc_name = bc.type.value
@@ -48,9 +162,18 @@ class Interpreter:
                 raise RuntimeError(f"Can't interpret {bc_name}.")
             interpret_method(bc)
 
-        print("Done!")
-        print(self.scope)
-        print(self.last_value_popped)
+    def run_fast(self) -> None:
+        """Runs the pre-resolved threaded code with the stack and pointer in locals."""
+        code = self.threaded_code
+        stack = self.stack.stack
+        ptr = self.ptr
+        end = len(code)
+        try:
+            while ptr < end:
+                handler, value = code[ptr]
+                ptr = handler(stack, value, ptr)
+        finally:
+            self.ptr = ptr
 
     def interpret_push(self, bc: Bytecode) -> None:
         self.stack.push(bc.value)
@@ -74,6 +197,7 @@ class Interpreter:
     def interpret_unaryop(self, bc: Bytecode) -> None:
         result = self.stack.pop()
         if bc.value == "+":
+            # Unlike in Python, `+` leaves its operand untouched: `+True` is `True`.
             pass
         elif bc.value == "-":
             result = -result
@@ -85,17 +209,64 @@ class Interpreter:
         self.ptr += 1
 
     def interpret_save(self, bc: Bytecode) -> None:
-        self.scope[bc.value] = self.stack.pop()
+        self._scope[bc.value] = self.stack.pop()
         self.ptr += 1
 
     def interpret_load(self, bc: Bytecode) -> None:
-        self.stack.push(self.scope[bc.value])
+        self.stack.push(self._scope[bc.value])
         self.ptr += 1
 
     def interpret_copy(self, _: Bytecode) -> None:
         self.stack.push(self.stack.peek())
         self.ptr += 1
 
+    def interpret_save_slot(self, bc: Bytecode) -> None:
+        self.slots[bc.value] = self.stack.pop()
+        self.ptr += 1
+
+    def interpret_load_slot(self, bc: Bytecode) -> None:
+        self.stack.push(self.slots[bc.value])
+        self.ptr += 1
+
+    def interpret_load_push_binop(self, bc: Bytecode) -> None:
+        name, constant, op = bc.value
+        function = BINOPS_TO_OPERATOR.get(op, None)
+        if function is None:
+            raise RuntimeError(f"Unknown operator {op}.")
+        self.stack.push(function(self._scope[name], constant))
+        self.ptr += 1
+
+    def interpret_load_load_binop(self, bc: Bytecode) -> None:
+        left, right, op = bc.value
+        function = BINOPS_TO_OPERATOR.get(op, None)
+        if function is None:
+            raise RuntimeError(f"Unknown operator {op}.")
+        self.stack.push(function(self._scope[left], self._scope[right]))
+        self.ptr += 1
+
+    def interpret_push_binop(self, bc: Bytecode) -> None:
+        constant, op = bc.value
+        function = BINOPS_TO_OPERATOR.get(op, None)
+        if function is None:
+            raise RuntimeError(f"Unknown operator {op}.")
+        self.stack.push(function(self.stack.pop(), constant))
+        self.ptr += 1
+
+    def interpret_binop_save(self, bc: Bytecode) -> None:
+        op, name = bc.value
+        function = BINOPS_TO_OPERATOR.get(op, None)
+        if function is None:
+            raise RuntimeError(f"Unknown operator {op}.")
+        right = self.stack.pop()
+        left = self.stack.pop()
+        self._scope[name] = function(left, right)
+        self.ptr += 1
+
+    def interpret_copy_save(self, bc: Bytecode) -> None:
+        (name,) = bc.value
+        self._scope[name] = self.stack.peek()
+        self.ptr += 1
+
     def interpret_pop_jump_if_false(self, bc: Bytecode) -> None:
         value = self.stack.pop()
         if not value:
@@ -113,6 +284,109 @@ class Interpreter:
     def interpret_jump_forward(self, bc: Bytecode) -> None:
         self.ptr += bc.value
 
+    def interpret_jump_if_false_or_pop(self, bc: Bytecode) -> None:
+        if not self.stack.peek():
+            self.ptr += bc.value
+        else:
+            self.last_value_popped = self.stack.pop()
+            self.ptr += 1
+
+    def interpret_jump_if_true_or_pop(self, bc: Bytecode) -> None:
+        if self.stack.peek():
+            self.ptr += bc.value
+        else:
+            self.last_value_popped = self.stack.pop()
+            self.ptr += 1
+
+    def fast_push(self, stack: list[Any], value: Any, ptr: int) -> int:
+        stack.append(value)
+        return ptr + 1
+
+    def fast_pop(self, stack: list[Any], _: Any, ptr: int) -> int:
+        self.last_value_popped = stack.pop()
+        return ptr + 1
+
+    def fast_binop(self, stack: list[Any], value: Any, ptr: int) -> int:
+        right = stack.pop()
+        stack[-1] = value(stack[-1], right)
+        return ptr + 1
+
+    def fast_unaryop(self, stack: list[Any], value: Any, ptr: int) -> int:
+        if value == "-":
+            stack[-1] = -stack[-1]
+        elif value == "not":
+            stack[-1] = not stack[-1]
+        elif value != "+":
+            raise RuntimeError(f"Unknown operator {value}.")
+        return ptr + 1
+
+    def fast_save(self, stack: list[Any], value: Any, ptr: int) -> int:
+        self._scope[value] = stack.pop()
+        return ptr + 1
+
+    def fast_load(self, stack: list[Any], value: Any, ptr: int) -> int:
+        stack.append(self._scope[value])
+        return ptr + 1
+
+    def fast_copy(self, stack: list[Any], _: Any, ptr: int) -> int:
+        stack.append(stack[-1])
+        return ptr + 1
+
+    def fast_save_slot(self, stack: list[Any], value: Any, ptr: int) -> int:
+        self.slots[value] = stack.pop()
+        return ptr + 1
+
+    def fast_load_slot(self, stack: list[Any], value: Any, ptr: int) -> int:
+        stack.append(self.slots[value])
+        return ptr + 1
+
+    def fast_load_push_binop(self, stack: list[Any], value: Any, ptr: int) -> int:
+        name, constant, function = value
+        stack.append(function(self._scope[name], constant))
+        return ptr + 1
+
+    def fast_load_load_binop(self, stack: list[Any], value: Any, ptr: int) -> int:
+        left, right, function = value
+        scope = self._scope
+        stack.append(function(scope[left], scope[right]))
+        return ptr + 1
+
+    def fast_push_binop(self, stack: list[Any], value: Any, ptr: int) -> int:
+        constant, function = value
+        stack[-1] = function(stack[-1], constant)
+        return ptr + 1
+
+    def fast_binop_save(self, stack: list[Any], value: Any, ptr: int) -> int:
+        function, name = value
+        right = stack.pop()
+        self._scope[name] = function(stack.pop(), right)
+        return ptr + 1
+
+    def fast_copy_save(self, stack: list[Any], value: Any, ptr: int) -> int:
+        self._scope[value[0]] = stack[-1]
+        return ptr + 1
+
+    def fast_pop_jump_if_false(self, stack: list[Any], value: Any, ptr: int) -> int:
+        return ptr + 1 if stack.pop() else ptr + value
+
+    def fast_pop_jump_if_true(self, stack: list[Any], value: Any, ptr: int) -> int:
+        return ptr + value if stack.pop() else ptr + 1
+
+    def fast_jump_forward(self, _: list[Any], value: Any, ptr: int) -> int:
+        return ptr + value
+
+    def fast_jump_if_false_or_pop(self, stack: list[Any], value: Any, ptr: int) -> int:
+        if not stack[-1]:
+            return ptr + value
+        self.last_value_popped = stack.pop()
+        return ptr + 1
+
+    def fast_jump_if_true_or_pop(self, stack: list[Any], value: Any, ptr: int) -> int:
+        if stack[-1]:
+            return ptr + value
+        self.last_value_popped = stack.pop()
+        return ptr + 1
+
 
 if __name__ == "__main__":
     import sys
@@ -122,7 +396,8 @@ if __name__ == "__main__":
     from .compiler import Compiler
 
     code = sys.argv[1]
-    tokens = list(Tokenizer(code))
-    tree = Parser(tokens).parse()
+    tree = Parser(Tokenizer(code)).parse()
     bytecode = list(Compiler(tree).compile())
-    Interpreter(bytecode).interpret()
+    Interpreter(
+        bytecode, fast="--fast" in sys.argv[2:], adaptive="--adaptive" in sys.argv[2:]
+    ).interpret()
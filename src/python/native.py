@@ -0,0 +1,193 @@
+import ast
+from typing import Any
+
+from .parser import (
+    Assignment,
+    BinOp,
+    Body,
+    BoolOp,
+    Conditional,
+    Constant,
+    ExprStatement,
+    Program,
+    TreeNode,
+    UnaryOp,
+    Variable,
+)
+
+BINOPS_TO_AST: dict[str, type[ast.operator]] = {
+    "**": ast.Pow,
+    "%": ast.Mod,
+    "/": ast.Div,
+    "*": ast.Mult,
+    "+": ast.Add,
+    "-": ast.Sub,
+}
+
+# Internal names start with `$` so they can't clash with names from the source.
+LAST_VALUE = "$last"
+TEMPORARY = "$temp"
+MANGLED_NAMES = {"None", "__debug__", "__builtins__"}
+"""Names that are valid in our language but that CPython won't let us use."""
+
+
+def mangle(name: str) -> str:
+    return f"${name}" if name in MANGLED_NAMES else name
+
+
+class NativeCompiler:
+    """Lowers a program tree into a CPython code object.
+
+    The generated code keeps track of the value that the stack-based interpreter
+    would have popped last, so that `last_value_popped` matches. Expression
+    statements save their value in `$last` and Boolean operators that don't
+    short-circuit record the operand that the stack VM would have popped.
+    """
+
+    def __init__(self, tree: TreeNode) -> None:
+        self.tree = tree
+        self.track_pops = True
+        """Whether the value popped by Boolean operators must be recorded."""
+
+    def compile(self) -> Any:
+        module = ast.Module(body=self.lower_statements([self.tree]), type_ignores=[])
+        ast.fix_missing_locations(module)
+        return compile(module, "<program>", "exec")
+
+    def lower_statements(self, trees: list[TreeNode]) -> list[ast.stmt]:
+        statements: list[ast.stmt] = []
+        for tree in trees:
+            statements.extend(self._lower(tree))
+        return statements or [ast.Pass()]
+
+    def _lower(self, tree: TreeNode) -> Any:
+        node_name = tree.__class__.__name__
+        lower_method = getattr(self, f"lower_{node_name}", None)
+        if lower_method is None:
+            raise RuntimeError(f"Can't compile {node_name}.")
+        return lower_method(tree)
+
+    def lower_Program(self, program: Program) -> list[ast.stmt]:
+        return self.lower_statements(program.statements)
+
+    def lower_Body(self, body: Body) -> list[ast.stmt]:
+        return self.lower_statements(body.statements)
+
+    def lower_Conditional(self, conditional: Conditional) -> list[ast.stmt]:
+        orelse = conditional.orelse
+        return [
+            ast.If(
+                test=self._lower(conditional.condition),
+                body=self._lower(conditional.body),
+                orelse=[] if orelse is None else self._lower(orelse),
+            )
+        ]
+
+    def lower_Assignment(self, assignment: Assignment) -> list[ast.stmt]:
+        targets = [self.name(target.name, ast.Store()) for target in assignment.targets]
+        return [ast.Assign(targets=targets, value=self._lower(assignment.value))]
+
+    def lower_ExprStatement(self, expression: ExprStatement) -> list[ast.stmt]:
+        # The final value overrides whatever the Boolean operators popped.
+        self.track_pops = False
+        value = self._lower(expression.expr)
+        self.track_pops = True
+        return [ast.Assign(targets=[self.name(LAST_VALUE, ast.Store())], value=value)]
+
+    def lower_BoolOp(self, tree: BoolOp) -> ast.expr:
+        op = ast.And() if tree.op == "and" else ast.Or()
+        values = [self._lower(value) for value in tree.values]
+        if not self.track_pops:
+            return ast.BoolOp(op=op, values=values)
+
+        # `a and b and c` becomes
+        # `($temp := a) and ($last := $temp, $temp := b)[1] and ($last := $temp, c)[1]`
+        # so that `$last` holds the operands the stack VM would have popped.
+        tracked = [self.walrus(TEMPORARY, values[0])]
+        for idx, value in enumerate(values[1:], start=2):
+            pop = self.walrus(LAST_VALUE, self.name(TEMPORARY, ast.Load()))
+            if idx < len(values):
+                value = self.walrus(TEMPORARY, value)
+            tracked.append(
+                ast.Subscript(
+                    value=ast.Tuple(elts=[pop, value], ctx=ast.Load()),
+                    slice=ast.Constant(1),
+                    ctx=ast.Load(),
+                )
+            )
+        return ast.BoolOp(op=op, values=tracked)
+
+    def lower_UnaryOp(self, tree: UnaryOp) -> ast.expr:
+        value = self._lower(tree.value)
+        if tree.op == "+":  # See `Interpreter.interpret_unaryop`.
+            return value
+        elif tree.op == "-":
+            return ast.UnaryOp(op=ast.USub(), operand=value)
+        elif tree.op == "not":
+            return ast.UnaryOp(op=ast.Not(), operand=value)
+        else:
+            raise RuntimeError(f"Unknown operator {tree.op}.")
+
+    def lower_BinOp(self, tree: BinOp) -> ast.expr:
+        op = BINOPS_TO_AST.get(tree.op, None)
+        if op is None:
+            raise RuntimeError(f"Unknown operator {tree.op}.")
+        return ast.BinOp(
+            left=self._lower(tree.left), op=op(), right=self._lower(tree.right)
+        )
+
+    def lower_Constant(self, constant: Constant) -> ast.expr:
+        return ast.Constant(constant.value)
+
+    def lower_Variable(self, var: Variable) -> ast.expr:
+        return self.name(var.name, ast.Load())
+
+    @staticmethod
+    def name(name: str, ctx: ast.expr_context) -> ast.Name:
+        return ast.Name(id=mangle(name), ctx=ctx)
+
+    def walrus(self, name: str, value: ast.expr) -> ast.NamedExpr:
+        return ast.NamedExpr(target=self.name(name, ast.Store()), value=value)
+
+
+class NativeInterpreter:
+    """Runs a program tree as native CPython bytecode with `exec`."""
+
+    def __init__(self, tree: TreeNode) -> None:
+        self.code = NativeCompiler(tree).compile()
+        self.scope: dict[str, Any] = {}
+        self.last_value_popped: Any = None
+
+    def interpret(self) -> None:
+        self.run()
+
+        print("Done!")
+        print(self.scope)
+        print(self.last_value_popped)
+
+    def run(self) -> None:
+        namespace = {mangle(name): value for name, value in self.scope.items()}
+        namespace["__builtins__"] = {}
+        namespace[LAST_VALUE] = self.last_value_popped
+        try:
+            exec(self.code, namespace)
+        except NameError as error:  # Match the stack VM, that raises `KeyError`.
+            raise KeyError(error.name.removeprefix("$")) from None
+        finally:
+            self.last_value_popped = namespace.pop(LAST_VALUE)
+            self.scope = {
+                name.removeprefix("$"): value
+                for name, value in namespace.items()
+                if name not in {"__builtins__", TEMPORARY}
+            }
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .tokenizer import Tokenizer
+    from .parser import Parser
+
+    code = sys.argv[1]
+    tree = Parser(Tokenizer(code)).parse()
+    NativeInterpreter(tree).interpret()
@@ -0,0 +1,511 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from .compiler import Bytecode, BytecodeType, JUMP_TYPES
+from .interpreter import BINOPS_TO_OPERATOR
+from .parser import (
+    Assignment,
+    BinOp,
+    Body,
+    BoolOp,
+    Conditional,
+    Constant,
+    Expr,
+    ExprStatement,
+    Program,
+    Statement,
+    TreeNode,
+    UnaryOp,
+    Variable,
+    conditional_arms,
+)
+
+MAX_FOLDED_INT_BITS = 256
+"""Integers larger than this are left for the interpreter to compute at runtime."""
+
+FOLDABLE_TYPES = (bool, int, float)
+
+
+@dataclass
+class OptimizationReport:
+    """Statistics about what the optimization passes did to a program."""
+
+    instructions_before: int = 0
+    instructions_after: int = 0
+    expressions_folded: int = 0
+    variables_propagated: int = 0
+    branches_pruned: int = 0
+    conditional_pops_fused: int = 0
+    jumps_threaded: int = 0
+    jumps_removed: int = 0
+    dead_pushes_removed: int = 0
+    stores_forwarded: int = 0
+    superinstructions_fused: int = 0
+
+    @property
+    def instructions_removed(self) -> int:
+        return self.instructions_before - self.instructions_after
+
+
+type Environment = dict[str, Constant]
+"""Maps the variables whose value is known at compile time to that value."""
+
+
+def same_constant(left: Constant, right: Constant) -> bool:
+    """Checks if two constants are interchangeable, so `1`, `1.0`, and `True` differ."""
+    return type(left.value) is type(right.value) and left.value == right.value
+
+
+class ConstantFolder:
+    """Folds constant subexpressions and propagates constants through assignments.
+
+    Conditionals whose condition folds to a constant are replaced by the body of
+    the branch that runs, so dead branches are never compiled.
+
+    The folder never mutates the tree it is given and it never folds an
+    operation that raises (like `1 / 0`) or that creates a huge integer (like
+    `10 ** 10 ** 10`), leaving those for the interpreter to deal with at runtime.
+
+    Folding Boolean operators removes the intermediate values the stack VM would
+    pop, so `last_value_popped` can change for Boolean operators that aren't
+    expression statements.
+    """
+
+    def __init__(self, tree: TreeNode) -> None:
+        self.tree = tree
+        self.report = OptimizationReport()
+        self.env: Environment = {}
+
+    def fold(self) -> TreeNode:
+        self.env = {}
+        folded = self._fold(self.tree)
+        if isinstance(folded, list):  # A conditional at the root inlines its body.
+            return Body(folded)
+        return folded
+
+    def _fold(self, tree: TreeNode) -> Any:
+        node_name = tree.__class__.__name__
+        fold_method = getattr(self, f"fold_{node_name}", None)
+        if fold_method is None:
+            raise RuntimeError(f"Can't fold {node_name}.")
+        return fold_method(tree)
+
+    def fold_statements(self, statements: list[Statement]) -> list[Statement]:
+        folded: list[Statement] = []
+        for statement in statements:
+            result = self._fold(statement)
+            if isinstance(result, list):  # Pruned conditionals inline their body.
+                folded.extend(result)
+            else:
+                folded.append(result)
+        return folded
+
+    def fold_Program(self, program: Program) -> Program:
+        return Program(self.fold_statements(program.statements))
+
+    def fold_Body(self, body: Body) -> Body:
+        return Body(self.fold_statements(body.statements))
+
+    def fold_Conditional(self, conditional: Conditional) -> list[Statement]:
+        """Folds a conditional, dropping the arms that can never run."""
+        arms, orelse = conditional_arms(conditional)
+        env_before = self.env
+        kept_arms: list[tuple[Expr, Body]] = []
+        branch_envs: list[Environment] = []
+        for arm in arms:
+            condition = self._fold(arm.condition)
+            if isinstance(condition, Constant):
+                self.report.branches_pruned += 1
+                if condition.value:  # This arm always runs if it's reached.
+                    orelse = arm.body
+                    break
+                continue
+
+            self.env = env_before.copy()
+            kept_arms.append((condition, self._fold(arm.body)))
+            branch_envs.append(self.env)
+            self.env = env_before
+
+        if not kept_arms:
+            return [] if orelse is None else self._fold(orelse).statements
+
+        self.env = env_before.copy()
+        folded_orelse = None if orelse is None else self._fold(orelse)
+        branch_envs.append(self.env)
+
+        # After the conditional, we only know the values all branches agree on.
+        self.env = branch_envs[0]
+        for branch_env in branch_envs[1:]:
+            self.env = {
+                name: constant
+                for name, constant in self.env.items()
+                if name in branch_env and same_constant(constant, branch_env[name])
+            }
+
+        if folded_orelse is not None and not folded_orelse.statements:
+            folded_orelse = None
+        for condition, body in reversed(kept_arms):
+            folded = Conditional(condition, body, folded_orelse)
+            folded_orelse = Body([folded])
+        return [folded]
+
+    def fold_Assignment(self, assignment: Assignment) -> Assignment:
+        value = self._fold(assignment.value)
+        for target in assignment.targets:
+            if isinstance(value, Constant):
+                self.env[target.name] = value
+            else:
+                self.env.pop(target.name, None)
+        return Assignment([Variable(t.name) for t in assignment.targets], value)
+
+    def fold_ExprStatement(self, expression: ExprStatement) -> ExprStatement:
+        return ExprStatement(self._fold(expression.expr))
+
+    def fold_BoolOp(self, tree: BoolOp) -> Expr:
+        short_circuits = (lambda v: not v) if tree.op == "and" else bool
+        values: list[Expr] = []
+        for idx, value in enumerate(self._fold(value) for value in tree.values):
+            is_last = idx == len(tree.values) - 1
+            if not isinstance(value, Constant):
+                values.append(value)
+            elif short_circuits(value.value):
+                # Nothing after this constant is ever evaluated.
+                values.append(value)
+                break
+            elif is_last:
+                values.append(value)
+            # A constant that doesn't short-circuit is skipped over, so drop it.
+
+        if len(values) == 1:
+            self.report.expressions_folded += isinstance(values[0], Constant)
+            return values[0]
+        return BoolOp(tree.op, values)
+
+    def fold_UnaryOp(self, tree: UnaryOp) -> Expr:
+        value = self._fold(tree.value)
+        if not isinstance(value, Constant):
+            return UnaryOp(tree.op, value)
+
+        if tree.op == "+":  # See `Interpreter.interpret_unaryop`.
+            result = value.value
+        elif tree.op == "-":
+            result = -value.value
+        elif tree.op == "not":
+            result = not value.value
+        else:
+            return UnaryOp(tree.op, value)
+
+        self.report.expressions_folded += 1
+        return Constant(result)
+
+    def fold_BinOp(self, tree: BinOp) -> Expr:
+        left = self._fold(tree.left)
+        right = self._fold(tree.right)
+        folded = BinOp(tree.op, left, right)
+        op = BINOPS_TO_OPERATOR.get(tree.op, None)
+        if op is None or not isinstance(left, Constant):
+            return folded
+        if not isinstance(right, Constant):
+            return folded
+
+        if tree.op == "**" and isinstance(left.value, int):
+            # Estimate the size of the result before computing it.
+            if isinstance(right.value, int) and right.value > 0:
+                if abs(left.value).bit_length() * right.value > MAX_FOLDED_INT_BITS:
+                    return folded
+
+        try:
+            result = op(left.value, right.value)
+        except (ArithmeticError, ValueError):
+            return folded
+        if not isinstance(result, FOLDABLE_TYPES):
+            return folded
+        if isinstance(result, int) and result.bit_length() > MAX_FOLDED_INT_BITS:
+            return folded
+
+        self.report.expressions_folded += 1
+        return Constant(result)
+
+    def fold_Constant(self, constant: Constant) -> Constant:
+        return Constant(constant.value)
+
+    def fold_Variable(self, var: Variable) -> Expr:
+        known = self.env.get(var.name, None)
+        if known is None:
+            return Variable(var.name)
+        self.report.variables_propagated += 1
+        return Constant(known.value)
+
+
+FUSED_CONDITIONAL_POPS = {
+    BytecodeType.POP_JUMP_IF_FALSE: BytecodeType.JUMP_IF_FALSE_OR_POP,
+    BytecodeType.POP_JUMP_IF_TRUE: BytecodeType.JUMP_IF_TRUE_OR_POP,
+}
+OR_POP_JUMP_TYPES = set(FUSED_CONDITIONAL_POPS.values())
+LOADS_OF_SAVES = {
+    BytecodeType.SAVE: BytecodeType.LOAD,
+    BytecodeType.SAVE_SLOT: BytecodeType.LOAD_SLOT,
+}
+
+
+class PeepholeOptimizer:
+    """Rewrites short bytecode sequences into cheaper, equivalent sequences.
+
+    - `COPY; POP_JUMP_IF_FALSE; POP` becomes `JUMP_IF_FALSE_OR_POP` (and
+      similarly for `POP_JUMP_IF_TRUE`);
+    - jumps that land on a `JUMP_FORWARD`, or on a `JUMP_IF_X_OR_POP` of their
+      own kind, go straight to the final target;
+    - `JUMP_FORWARD`s to the next bytecode are removed;
+    - `PUSH; POP` and `COPY; POP` pairs are removed when a later `POP` in the
+      same basic block overwrites the value they would leave in
+      `last_value_popped`;
+    - `SAVE x; LOAD x` becomes `COPY; SAVE x` (and similarly for slots).
+
+    While rewriting, jumps hold the absolute index of their target and removed
+    bytecodes are set to `None`, so that jumps can be recomputed at the end.
+    """
+
+    def __init__(
+        self, bytecode: list[Bytecode], report: OptimizationReport | None = None
+    ) -> None:
+        self.bytecode = bytecode
+        self.report = OptimizationReport() if report is None else report
+
+    def optimize(self) -> list[Bytecode]:
+        code: list[Bytecode] = [
+            Bytecode(bc.type, ptr + bc.value if bc.type in JUMP_TYPES else bc.value)
+            for ptr, bc in enumerate(self.bytecode)
+        ]
+        passes = [
+            self.fuse_conditional_pops,
+            self.thread_jumps,
+            self.remove_dead_pushes,
+            self.forward_stores,
+        ]
+
+        changed = True
+        while changed:
+            changed = False
+            for peephole_pass in passes:
+                optimized: list[Bytecode | None] = list(code)
+                if peephole_pass(optimized):
+                    changed = True
+                    code = self.compact(optimized)
+
+        self.report.instructions_before = len(self.bytecode)
+        self.report.instructions_after = len(code)
+        return [
+            Bytecode(bc.type, bc.value - ptr if bc.type in JUMP_TYPES else bc.value)
+            for ptr, bc in enumerate(code)
+        ]
+
+    @staticmethod
+    def compact(code: list[Bytecode | None]) -> list[Bytecode]:
+        """Drops removed bytecodes and updates the absolute jump targets."""
+        new_positions: list[int] = []
+        position = 0
+        for bc in code:
+            new_positions.append(position)
+            position += bc is not None
+        new_positions.append(position)  # Jumps to the end of the program.
+
+        return [
+            (
+                Bytecode(bc.type, new_positions[min(bc.value, len(code))])
+                if bc.type in JUMP_TYPES
+                else bc
+            )
+            for bc in code
+            if bc is not None
+        ]
+
+    @staticmethod
+    def jump_targets(code: list[Bytecode | None]) -> set[int]:
+        return {bc.value for bc in code if bc is not None and bc.type in JUMP_TYPES}
+
+    def fuse_conditional_pops(self, code: list[Bytecode | None]) -> int:
+        targets = self.jump_targets(code)
+        fused = 0
+        for ptr in range(len(code) - 2):
+            copy, jump, pop = code[ptr : ptr + 3]
+            if copy is None or jump is None or pop is None:
+                continue
+            if (
+                copy.type == BytecodeType.COPY
+                and jump.type in FUSED_CONDITIONAL_POPS
+                and pop.type == BytecodeType.POP
+                and ptr + 1 not in targets
+                and ptr + 2 not in targets
+            ):
+                code[ptr] = Bytecode(FUSED_CONDITIONAL_POPS[jump.type], jump.value)
+                code[ptr + 1] = code[ptr + 2] = None
+                fused += 1
+        self.report.conditional_pops_fused += fused
+        return fused
+
+    def thread_jumps(self, code: list[Bytecode | None]) -> int:
+        threaded = removed = 0
+        for ptr, bc in enumerate(code):
+            if bc is None or bc.type not in JUMP_TYPES:
+                continue
+
+            target = bc.value
+            while target < len(code) and (landing := code[target]) is not None:
+                # A `JUMP_IF_X_OR_POP` leaves the value on the stack, so landing on
+                # another one of the same kind is certain to jump again.
+                lands_on_jump = landing.type == BytecodeType.JUMP_FORWARD or (
+                    landing.type == bc.type and bc.type in OR_POP_JUMP_TYPES
+                )
+                if not lands_on_jump or landing.value <= target:
+                    break
+                target = landing.value
+
+            if target != bc.value:
+                code[ptr] = bc = Bytecode(bc.type, target)
+                threaded += 1
+            if bc.type == BytecodeType.JUMP_FORWARD and bc.value == ptr + 1:
+                code[ptr] = None
+                removed += 1
+
+        self.report.jumps_threaded += threaded
+        self.report.jumps_removed += removed
+        return threaded + removed
+
+    def remove_dead_pushes(self, code: list[Bytecode | None]) -> int:
+        targets = self.jump_targets(code)
+        removed = 0
+        for ptr in range(len(code) - 1):
+            push, pop = code[ptr], code[ptr + 1]
+            if push is None or pop is None:
+                continue
+            if (
+                push.type in {BytecodeType.PUSH, BytecodeType.COPY}
+                and pop.type == BytecodeType.POP
+                and ptr + 1 not in targets
+                and self.popped_later(code, ptr + 2)
+            ):
+                code[ptr] = code[ptr + 1] = None
+                removed += 1
+        self.report.dead_pushes_removed += removed
+        return removed
+
+    @staticmethod
+    def popped_later(code: list[Bytecode | None], start: int) -> bool:
+        """Checks if a `POP` surely runs after `start`, with no jumps in between."""
+        for bc in code[start:]:
+            if bc is None:
+                continue
+            elif bc.type == BytecodeType.POP:
+                return True
+            elif bc.type in JUMP_TYPES:
+                return False
+        return False
+
+    def forward_stores(self, code: list[Bytecode | None]) -> int:
+        targets = self.jump_targets(code)
+        forwarded = 0
+        for ptr in range(len(code) - 1):
+            save, load = code[ptr], code[ptr + 1]
+            if save is None or load is None:
+                continue
+            if (
+                save.type in LOADS_OF_SAVES
+                and load.type == LOADS_OF_SAVES[save.type]
+                and save.value == load.value
+                and ptr + 1 not in targets
+            ):
+                code[ptr] = Bytecode(BytecodeType.COPY)
+                code[ptr + 1] = Bytecode(save.type, save.value)
+                forwarded += 1
+        self.report.stores_forwarded += forwarded
+        return forwarded
+
+
+SUPERINSTRUCTIONS: dict[tuple[BytecodeType, ...], BytecodeType] = {
+    (BytecodeType.LOAD, BytecodeType.PUSH, BytecodeType.BINOP): (
+        BytecodeType.LOAD_PUSH_BINOP
+    ),
+    (BytecodeType.LOAD, BytecodeType.LOAD, BytecodeType.BINOP): (
+        BytecodeType.LOAD_LOAD_BINOP
+    ),
+    (BytecodeType.PUSH, BytecodeType.BINOP): BytecodeType.PUSH_BINOP,
+    (BytecodeType.BINOP, BytecodeType.SAVE): BytecodeType.BINOP_SAVE,
+    (BytecodeType.COPY, BytecodeType.SAVE): BytecodeType.COPY_SAVE,
+}
+"""The sequences that are fused into superinstructions, longest first.
+
+They are the most frequently executed sequences in the benchmark corpus that
+don't contain jumps, see `benchmarks/bench_superinstructions.py`.
+"""
+
+
+class SuperinstructionFuser:
+    """Fuses sequences of bytecodes into superinstructions.
+
+    The bytecode is scanned from left to right and, at each position, the
+    first sequence of `superinstructions` that matches is fused, unless a jump
+    lands in the middle of it. The value of the superinstruction is the tuple
+    of the values of the bytecodes it replaces, leaving out `COPY`.
+    """
+
+    def __init__(
+        self,
+        bytecode: list[Bytecode],
+        superinstructions: dict[
+            tuple[BytecodeType, ...], BytecodeType
+        ] = SUPERINSTRUCTIONS,
+        report: OptimizationReport | None = None,
+    ) -> None:
+        self.bytecode = bytecode
+        self.superinstructions = superinstructions
+        self.report = OptimizationReport() if report is None else report
+
+    def fuse(self) -> list[Bytecode]:
+        code: list[Bytecode | None] = [
+            Bytecode(bc.type, ptr + bc.value if bc.type in JUMP_TYPES else bc.value)
+            for ptr, bc in enumerate(self.bytecode)
+        ]
+        targets = PeepholeOptimizer.jump_targets(code)
+
+        ptr = 0
+        while ptr < len(code):
+            for sequence, superinstruction in self.superinstructions.items():
+                end = ptr + len(sequence)
+                if self.matches(code, ptr, sequence, targets):
+                    value = tuple(
+                        bc.value
+                        for bc in code[ptr:end]
+                        if bc is not None and bc.type != BytecodeType.COPY
+                    )
+                    code[ptr] = Bytecode(superinstruction, value)
+                    code[ptr + 1 : end] = [None] * (end - ptr - 1)
+                    self.report.superinstructions_fused += 1
+                    ptr = end - 1
+                    break
+            ptr += 1
+
+        fused = PeepholeOptimizer.compact(code)
+        self.report.instructions_before = len(self.bytecode)
+        self.report.instructions_after = len(fused)
+        return [
+            Bytecode(bc.type, bc.value - ptr if bc.type in JUMP_TYPES else bc.value)
+            for ptr, bc in enumerate(fused)
+        ]
+
+    @staticmethod
+    def matches(
+        code: list[Bytecode | None],
+        start: int,
+        sequence: tuple[BytecodeType, ...],
+        targets: set[int],
+    ) -> bool:
+        """Checks if the sequence starts at `start` with no jumps into its middle."""
+        end = start + len(sequence)
+        if end > len(code) or any(ptr in targets for ptr in range(start + 1, end)):
+            return False
+        return all(
+            bc is not None and bc.type == bct
+            for bc, bct in zip(code[start:end], sequence)
+        )
@@ -0,0 +1,138 @@
+from array import array
+from dataclasses import dataclass
+from typing import Any
+
+from .compiler import Bytecode, BytecodeType, JUMP_TYPES, OPCODES, SLOT_TYPES
+from .interpreter import Interpreter, OPERATOR_TYPES, resolve_operators
+
+BYTECODE_TYPES = list(OPCODES)
+"""Maps opcodes back to their bytecode types."""
+
+NAME_TYPES = {BytecodeType.SAVE, BytecodeType.LOAD}
+"""Bytecode types whose values go in the table of names."""
+
+INLINE_TYPES = JUMP_TYPES | SLOT_TYPES
+"""Bytecode types whose integer values are stored directly as operands."""
+
+
+@dataclass
+class PackedBytecode:
+    """A compact representation of a list of bytecodes.
+
+    `opcodes` holds one byte per bytecode and `operands` holds one integer per
+    bytecode. Jumps and slot bytecodes keep their value in `operands`. For
+    `SAVE` and `LOAD` the operand indexes into `names`, and for all other
+    bytecode types it indexes into `constants`.
+    """
+
+    opcodes: bytes
+    operands: array
+    constants: list[Any]
+    names: list[str]
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def pools(self) -> list[list[Any] | None]:
+        """Returns, for each opcode, the table its operand indexes into, if any."""
+        return [
+            (
+                None
+                if bct in INLINE_TYPES
+                else self.names if bct in NAME_TYPES else self.constants
+            )
+            for bct in BYTECODE_TYPES
+        ]
+
+
+def intern(value: Any, pool: list[Any], indices: dict[Any, int]) -> int:
+    """Returns the index of the value in the pool, adding it if needed."""
+    # `1`, `1.0`, and `True` are equal but must not share an entry.
+    key = (type(value), repr(value))
+    if key not in indices:
+        indices[key] = len(pool)
+        pool.append(value)
+    return indices[key]
+
+
+def pack(bytecode: list[Bytecode]) -> PackedBytecode:
+    opcodes = bytearray()
+    operands = array("i")
+    constants: list[Any] = []
+    names: list[str] = []
+    constant_indices: dict[Any, int] = {}
+    name_indices: dict[Any, int] = {}
+
+    for bc in bytecode:
+        opcodes.append(OPCODES[bc.type])
+        if bc.type in INLINE_TYPES:
+            operands.append(bc.value)
+        elif bc.type in NAME_TYPES:
+            operands.append(intern(bc.value, names, name_indices))
+        else:
+            operands.append(intern(bc.value, constants, constant_indices))
+
+    return PackedBytecode(bytes(opcodes), operands, constants, names)
+
+
+def unpack(packed: PackedBytecode) -> list[Bytecode]:
+    pools = packed.pools()
+    bytecode: list[Bytecode] = []
+    for opcode, operand in zip(packed.opcodes, packed.operands):
+        pool = pools[opcode]
+        value = operand if pool is None else pool[operand]
+        bytecode.append(Bytecode(BYTECODE_TYPES[opcode], value))
+    return bytecode
+
+
+class PackedInterpreter(Interpreter):
+    """Runs packed bytecode directly, without unpacking it first.
+
+    The opcodes whose values have binary operators get their own copy of the
+    constants, with the operators resolved as in `threaded_code`.
+    """
+
+    def __init__(
+        self, packed: PackedBytecode, slot_names: list[str] | None = None
+    ) -> None:
+        super().__init__([], slot_names=slot_names)
+        self.packed = packed
+        self.pools = packed.pools()
+        for opcode, operand in zip(packed.opcodes, packed.operands):
+            bct = BYTECODE_TYPES[opcode]
+            if bct in OPERATOR_TYPES:
+                pool = self.pools[opcode]
+                if pool is packed.constants:
+                    pool = self.pools[opcode] = list(pool)
+                pool[operand] = resolve_operators(bct, packed.constants[operand])
+
+    def run(self) -> None:
+        handlers = self.handlers
+        pools = self.pools
+        opcodes = self.packed.opcodes
+        operands = self.packed.operands
+        stack = self.stack.stack
+        ptr = self.ptr
+        end = len(opcodes)
+        try:
+            while ptr < end:
+                opcode = opcodes[ptr]
+                pool = pools[opcode]
+                value = operands[ptr] if pool is None else pool[operands[ptr]]
+                ptr = handlers[opcode](stack, value, ptr)
+        finally:
+            self.ptr = ptr
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .tokenizer import Tokenizer
+    from .parser import Parser
+    from .compiler import Compiler
+
+    code = sys.argv[1]
+    tree = Parser(Tokenizer(code)).parse()
+    packed = pack(list(Compiler(tree).compile()))
+    print(packed)
+    PackedInterpreter(packed).interpret()
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import re
+from collections.abc import Buffer
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, pairwise
+from typing import Generator
+
+from .tokenizer import Token, TokenBuffer, TokenType
+
+SHARD_START_PATTERN = re.compile(r"\n(?=[^ \n])")
+"""Matches the newline before a line that has no indentation and isn't blank."""
+
+BYTES_SHARD_START_PATTERN = re.compile(SHARD_START_PATTERN.pattern.encode())
+
+SHARDS_PER_WORKER = 4
+"""How many shards each worker gets, on average, so that they finish together."""
+
+
+def shard_boundaries(code: str | Buffer, shards: int) -> list[int]:
+    """Returns where to split the code into at most `shards` shards of similar size.
+
+    Every shard but the first starts at a line without indentation, where the
+    tokenizer is always back at indentation level 0. So, tokenized on its own,
+    a shard gives the same tokens as it does as part of the whole code, except
+    for the `EOF`, and the `DEDENT` tokens at its end are the ones that come
+    before the first token of the next shard.
+    """
+    pattern = (
+        SHARD_START_PATTERN if isinstance(code, str) else BYTES_SHARD_START_PATTERN
+    )
+    size = len(code)
+    boundaries = [0]
+    for shard in range(1, shards):
+        match = pattern.search(code, max(shard * size // shards, boundaries[-1]))
+        if match is None:
+            break
+        boundaries.append(match.end())
+    boundaries.append(size)
+    return boundaries
+
+
+def tokenize_shard(shard: str | bytes) -> tuple[TokenBuffer, str | None]:
+    """Tokenizes a shard, returning the tokens and the error that stopped it, if any."""
+    buffer = TokenBuffer()
+    try:
+        buffer.extend(shard)
+    except RuntimeError as error:
+        return buffer, str(error)
+    return buffer, None
+
+
+def tokenize_in_parallel(
+    code: str | Buffer, workers: int | None = None, shards: int | None = None
+) -> Generator[Token, None, None]:
+    """Tokenizes the code in a pool of processes and yields the tokens in order.
+
+    The code is split with `shard_boundaries` and the workers send the tokens
+    of each shard back in a `TokenBuffer`. The tokens, and the error if the
+    code can't be tokenized, are the same as those of `Tokenizer`.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shards or SHARDS_PER_WORKER * workers
+    boundaries = shard_boundaries(code, shards)
+    pieces = [code[start:end] for start, end in pairwise(boundaries)]
+    if not isinstance(code, str):
+        pieces = [bytes(piece) for piece in pieces]
+
+    # Forking a process that runs threads, like the pool's own, isn't safe.
+    # Not every platform can start a fork server, but all of them can spawn.
+    methods = multiprocessing.get_all_start_methods()
+    method = "forkserver" if "forkserver" in methods else "spawn"
+    context = multiprocessing.get_context(method)
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        for buffer, error in executor.map(tokenize_shard, pieces):
+            if error is not None:
+                yield from buffer
+                raise RuntimeError(error)
+            # Every shard ends with its own `EOF`.
+            yield from islice(buffer, len(buffer) - 1)
+
+    yield Token(TokenType.EOF)
+
+
+if __name__ == "__main__":
+    import sys
+
+    code = sys.argv[1]
+    for token in tokenize_in_parallel(code):
+        print(token)
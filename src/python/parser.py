@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 from .tokenizer import Token, TokenType
 
@@ -78,33 +79,93 @@ class Constant(Expr):
     value: bool | float | int
 
 
+OR_POWER, AND_POWER, NOT_POWER, SUM_POWER, PRODUCT_POWER, UNARY_POWER, EXP_POWER = (
+    range(1, 8)
+)
+"""The binding power of each level of precedence, from loosest to tightest."""
+
+INFIX_OPERATORS: dict[TokenType, tuple[str, int]] = {
+    TokenType.OR: ("or", OR_POWER),
+    TokenType.AND: ("and", AND_POWER),
+    TokenType.PLUS: ("+", SUM_POWER),
+    TokenType.MINUS: ("-", SUM_POWER),
+    TokenType.MUL: ("*", PRODUCT_POWER),
+    TokenType.DIV: ("/", PRODUCT_POWER),
+    TokenType.MOD: ("%", PRODUCT_POWER),
+    TokenType.EXP: ("**", EXP_POWER),
+}
+"""The operator and binding power of each token that can follow an operand."""
+
+PREFIX_OPERATORS = {
+    TokenType.NOT: "not",
+    TokenType.PLUS: "+",
+    TokenType.MINUS: "-",
+}
+
+TERM_OPERATORS = {
+    TokenType.MUL: "*",
+    TokenType.DIV: "/",
+    TokenType.MOD: "%",
+}
+
+
+def conditional_arms(conditional: Conditional) -> tuple[list[Conditional], Body | None]:
+    """Flattens an `if`/`elif` chain into its arms and its final `else` body.
+
+    The parser represents `elif` as a conditional nested as the only statement of
+    the `orelse` body of the previous arm. This walks that chain iteratively, so
+    long `elif` chains don't need recursion proportional to the number of arms.
+    """
+    arms = [conditional]
+    orelse = conditional.orelse
+    while (
+        isinstance(orelse, Body)
+        and len(orelse.statements) == 1
+        and isinstance(orelse.statements[0], Conditional)
+    ):
+        arms.append(orelse.statements[0])
+        orelse = orelse.statements[0].orelse
+    return arms, orelse
+
+
 def print_ast(
     obj: TreeNode | list[Any] | Any, depth: int = 0, prefix: str = ""
 ) -> None:
-    indent = "    " * depth
-    obj_name = obj.__class__.__name__
-    if isinstance(obj, TreeNode):
-        items = list(vars(obj).items())
-        if not items:
-            print(f"{indent}{prefix}{obj_name}()", end="")
-        elif len(items) == 1 and not isinstance(items[0][1], (TreeNode, list)):
-            print(f"{indent}{prefix}{obj_name}({items[0][1]!r})", end="")
+    # Nodes wait in `pending` as `(obj, depth, prefix)` and text as strings, so
+    # printing deeply nested trees doesn't recurse.
+    top_depth = depth
+    pending: list[tuple[Any, int, str] | str] = [(obj, depth, prefix)]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            print(item, end="")
+            continue
+
+        obj, depth, prefix = item
+        indent = "    " * depth
+        obj_name = obj.__class__.__name__
+        if isinstance(obj, TreeNode):
+            items = list(vars(obj).items())
+            if not items:
+                print(f"{indent}{prefix}{obj_name}()", end="")
+            elif len(items) == 1 and not isinstance(items[0][1], (TreeNode, list)):
+                print(f"{indent}{prefix}{obj_name}({items[0][1]!r})", end="")
+            else:
+                print(f"{indent}{prefix}{obj_name}(")
+                pending.append(f"{indent})")
+                for key, value in reversed(items):
+                    pending.append(",\n")
+                    pending.append((value, depth + 1, f"{key}="))
+        elif isinstance(obj, list) and obj and isinstance(obj[0], TreeNode):
+            print(f"{indent}{prefix}[")
+            pending.append(f"{indent}]")
+            for value in reversed(obj):
+                pending.append(",\n")
+                pending.append((value, depth + 1, ""))
         else:
-            print(f"{indent}{prefix}{obj_name}(")
-            for key, value in items:
-                print_ast(value, depth + 1, f"{key}=")
-                print(",")
-            print(f"{indent})", end="")
-    elif isinstance(obj, list) and obj and isinstance(obj[0], TreeNode):
-        print(f"{indent}{prefix}[")
-        for value in obj:
-            print_ast(value, depth + 1)
-            print(",")
-        print(f"{indent}]", end="")
-    else:
-        print(f"{indent}{prefix}{obj!r}", end="")
-
-    if not depth:
+            print(f"{indent}{prefix}{obj!r}", end="")
+
+    if not top_depth:
         print()
 
 
@@ -136,26 +197,41 @@ class Parser:
     value := NAME | INT | FLOAT | TRUE | FALSE
     """
 
-    def __init__(self, tokens: list[Token]) -> None:
-        self.tokens = tokens
-        self.next_token_index: int = 0
-        """Points to the next token to be consumed."""
+    def __init__(self, tokens: Iterable[Token], pratt: bool = True) -> None:
+        self.tokens: Iterator[Token] = iter(tokens)
+        """The tokens not looked at yet, which may still be being tokenized."""
+        self.lookahead: deque[Token] = deque()
+        """Tokens that were peeked at but not consumed yet.
+
+        The grammar never looks more than two tokens ahead, so the parser holds at
+        most two tokens at a time and a `Tokenizer` can be parsed as it goes.
+        """
+        self.pratt = pratt
+        """Whether expressions are parsed by `parse_pratt` instead of by descent.
+
+        Only `parse_pratt` handles expressions nested deeper than the recursion limit.
+        """
 
     def eat(self, expected_token_type: TokenType) -> Token:
         """Returns the next token if it is of the expected type.
 
         If the next token is not of the expected type, this raises an error.
         """
-        next_token = self.tokens[self.next_token_index]
-        self.next_token_index += 1
-        if next_token.type != expected_token_type:
+        if self.lookahead:
+            next_token = self.lookahead.popleft()
+        else:
+            next_token = next(self.tokens, None)
+        if next_token is None or next_token.type != expected_token_type:
             raise RuntimeError(f"Expected {expected_token_type}, ate {next_token!r}.")
         return next_token
 
     def peek(self, skip: int = 0) -> TokenType | None:
         """Checks the type of an upcoming token without consuming it."""
-        peek_at = self.next_token_index + skip
-        return self.tokens[peek_at].type if peek_at < len(self.tokens) else None
+        while len(self.lookahead) <= skip:
+            if (next_token := next(self.tokens, None)) is None:
+                return None
+            self.lookahead.append(next_token)
+        return self.lookahead[skip].type
 
     def parse_value(self) -> Variable | Constant:
         """Parses an integer or a float."""
@@ -203,13 +279,8 @@ class Parser:
         result: Expr
         result = self.parse_unary()
 
-        TYPES_TO_OPS = {
-            TokenType.MUL: "*",
-            TokenType.DIV: "/",
-            TokenType.MOD: "%",
-        }
-        while (next_token_type := self.peek()) in TYPES_TO_OPS:
-            op = TYPES_TO_OPS[next_token_type]
+        while (next_token_type := self.peek()) in TERM_OPERATORS:
+            op = TERM_OPERATORS[next_token_type]
             self.eat(next_token_type)
             right = self.parse_unary()
             result = BinOp(op, result, right)
@@ -257,8 +328,82 @@ class Parser:
 
         return values[0] if len(values) == 1 else BoolOp("or", values)
 
+    def parse_pratt(self, min_power: int = 0) -> Expr:
+        """Parses an expression whose operators bind at least as tightly as `min_power`.
+
+        This builds the same trees as `parse_alternative` but, instead of going
+        through one method per level of precedence, it parses an operand and
+        then loops over the operators that follow, using `INFIX_OPERATORS`.
+        Operators and parentheses whose operands are still being parsed wait in
+        `pending`, together with the binding power to restore once they are
+        complete, so nesting doesn't recurse.
+        """
+        pending: list[tuple[str, TokenType, list[Expr], int]] = []
+        while True:
+            # Prefix operators and parentheses wait for the operand that follows.
+            next_token_type = self.peek()
+            if next_token_type == TokenType.LPAREN:
+                self.lookahead.popleft()
+                pending.append(("parens", next_token_type, [], min_power))
+                min_power = 0
+                continue
+            elif next_token_type == TokenType.NOT and min_power <= NOT_POWER:
+                self.lookahead.popleft()
+                pending.append(("prefix", next_token_type, [], min_power))
+                min_power = NOT_POWER
+                continue
+            elif next_token_type in {TokenType.PLUS, TokenType.MINUS}:
+                self.lookahead.popleft()
+                pending.append(("prefix", next_token_type, [], min_power))
+                min_power = UNARY_POWER
+                continue
+
+            left: Expr
+            if next_token_type == TokenType.NAME:
+                left = Variable(self.lookahead.popleft().value)
+            elif next_token_type in {TokenType.INT, TokenType.FLOAT}:
+                left = Constant(self.lookahead.popleft().value)
+            else:
+                left = self.parse_value()
+
+            # Either the operator that follows waits for its right operand, or the
+            # operand completes the innermost operator that is waiting.
+            while True:
+                next_token_type = self.peek()
+                if (
+                    next_token_type in INFIX_OPERATORS
+                    and INFIX_OPERATORS[next_token_type][1] >= min_power
+                ):
+                    self.lookahead.popleft()
+                    power = INFIX_OPERATORS[next_token_type][1]
+                    kind = "boolop" if power <= AND_POWER else "binop"
+                    pending.append((kind, next_token_type, [left], min_power))
+                    # The exponent can have unary operators.
+                    min_power = UNARY_POWER if power == EXP_POWER else power + 1
+                    break
+
+                if not pending:
+                    return left
+                kind, token_type, operands, min_power = pending.pop()
+                if kind == "parens":
+                    self.eat(TokenType.RPAREN)
+                elif kind == "prefix":
+                    left = UnaryOp(PREFIX_OPERATORS[token_type], left)
+                elif kind == "binop":
+                    left = BinOp(INFIX_OPERATORS[token_type][0], operands[0], left)
+                else:  # Boolean operators take all their operands at once.
+                    operands.append(left)
+                    if self.peek() == token_type:
+                        self.lookahead.popleft()
+                        pending.append((kind, token_type, operands, min_power))
+                        min_power = INFIX_OPERATORS[token_type][1] + 1
+                        break
+                    left = BoolOp(INFIX_OPERATORS[token_type][0], operands)
+
     def parse_expr(self) -> Expr:
         """Parses a full expression."""
+        if self.pratt:
+            return self.parse_pratt()
         return self.parse_alternative()
 
     def parse_expr_statement(self) -> ExprStatement:
@@ -284,37 +429,41 @@ class Parser:
     def parse_body(self) -> Body:
         """Parses the body of a compound statement."""
         self.eat(TokenType.INDENT)
-        body = Body([])
-        while self.peek() != TokenType.DEDENT:
-            body.statements.append(self.parse_statement())
+        body = Body(list(self.parse_statements(TokenType.DEDENT)))
         self.eat(TokenType.DEDENT)
         return body
 
-    def parse_else_statement(self) -> Body:
-        """Parses an `else` statement and returns its body."""
+    def parse_else_header(self) -> None:
+        """Parses the line that starts an `else` block."""
         self.eat(TokenType.ELSE)
         self.eat(TokenType.COLON)
         self.eat(TokenType.NEWLINE)
-        body = self.parse_body()
-        return body
 
-    def parse_elif_statement(self) -> Conditional:
-        """Parses an `elif` conditional and returns it."""
-        self.eat(TokenType.ELIF)
+    def parse_conditional_header(self, keyword: TokenType) -> Conditional:
+        """Parses the line that starts an `if` or `elif` block, with an empty body."""
+        self.eat(keyword)
         condition = self.parse_expr()
         self.eat(TokenType.COLON)
         self.eat(TokenType.NEWLINE)
+        return Conditional(condition, Body([]))
+
+    def parse_else_statement(self) -> Body:
+        """Parses an `else` statement and returns its body."""
+        self.parse_else_header()
         body = self.parse_body()
-        return Conditional(condition, body)
+        return body
+
+    def parse_elif_statement(self) -> Conditional:
+        """Parses an `elif` conditional and returns it."""
+        conditional = self.parse_conditional_header(TokenType.ELIF)
+        conditional.body = self.parse_body()
+        return conditional
 
     def parse_if_statement(self) -> Conditional:
         """Parses an `if` conditional and returns it."""
-        self.eat(TokenType.IF)
-        condition = self.parse_expr()
-        self.eat(TokenType.COLON)
-        self.eat(TokenType.NEWLINE)
-        body = self.parse_body()
-        return Conditional(condition, body)
+        conditional = self.parse_conditional_header(TokenType.IF)
+        conditional.body = self.parse_body()
+        return conditional
 
     def parse_conditional(self) -> Conditional:
         """Parses a conditional block."""
@@ -340,13 +489,60 @@ class Parser:
         else:
             return self.parse_expr_statement()
 
+    def parse_statements(self, end: TokenType) -> Iterator[Statement]:
+        """Parses statements until the `end` token, yielding each one once it's over.
+
+        Instead of recursing into the bodies of nested conditionals, the bodies
+        that are still open wait in `blocks`, each with the `if` or `elif` arm
+        that an `elif` or an `else` may continue once the body is over. An outer
+        statement is only yielded when no `elif` or `else` can continue it.
+        """
+        outer: list[Statement] = []
+        blocks: list[tuple[list[Statement], Conditional | None]] = [(outer, None)]
+        while True:
+            if len(blocks) == 1 and outer:
+                yield outer.pop()
+            next_token_type = self.peek()
+            if len(blocks) == 1 and next_token_type == end:
+                return
+            elif len(blocks) > 1 and next_token_type == TokenType.DEDENT:
+                self.eat(TokenType.DEDENT)
+                _, arm = blocks.pop()
+                if arm is None:
+                    continue
+                elif self.peek() == TokenType.ELIF:
+                    elif_statement = self.parse_conditional_header(TokenType.ELIF)
+                    arm.orelse = Body([elif_statement])
+                    self.eat(TokenType.INDENT)
+                    blocks.append((elif_statement.body.statements, elif_statement))
+                elif self.peek() == TokenType.ELSE:
+                    self.parse_else_header()
+                    orelse = arm.orelse = Body([])
+                    self.eat(TokenType.INDENT)
+                    blocks.append((orelse.statements, None))
+            elif (
+                next_token_type == TokenType.IF
+                and self.peek(skip=1) != TokenType.ASSIGN
+            ):
+                conditional = self.parse_conditional_header(TokenType.IF)
+                blocks[-1][0].append(conditional)
+                self.eat(TokenType.INDENT)
+                blocks.append((conditional.body.statements, conditional))
+            else:
+                blocks[-1][0].append(self.parse_statement())
+
+    def parse_lazily(self) -> Iterator[Statement]:
+        """Parses the program one top-level statement at a time.
+
+        Each statement is yielded as soon as it is over, before the tokens of the
+        statements that follow it are even read.
+        """
+        yield from self.parse_statements(TokenType.EOF)
+        self.eat(TokenType.EOF)
+
     def parse(self) -> Program:
         """Parses the program."""
-        program = Program([])
-        while self.peek() != TokenType.EOF:
-            program.statements.append(self.parse_statement())
-        self.eat(TokenType.EOF)
-        return program
+        return Program(list(self.parse_lazily()))
 
 
 if __name__ == "__main__":
@@ -354,6 +550,6 @@ if __name__ == "__main__":
     from .tokenizer import Tokenizer
 
     code = sys.argv[1]
-    parser = Parser(list(Tokenizer(code)))
+    parser = Parser(Tokenizer(code))
     tree = parser.parse()
     print_ast(tree)
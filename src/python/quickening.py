@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from typing import Any
+
+from .compiler import BytecodeType
+from .interpreter import Handler, Interpreter
+
+QUICKENING_WARMUP = 8
+"""How many times an adaptive instruction runs before it tries to specialize."""
+
+MAX_QUICKENING_BACKOFF = 1024
+"""The longest an adaptive instruction waits before trying to specialize again."""
+
+SPECIALIZABLE_TYPES = {int, float, bool}
+"""The operand types that adaptive instructions specialize for."""
+
+SPECIALIZABLE_BINOPS = {"+", "-", "*"}
+"""The binary operators that adaptive instructions specialize.
+
+Specialized handlers only pay off when they inline the operation and have no
+type guard, because checking the types of the operands costs more than the
+call to an `operator` function that the generic handler makes.
+"""
+
+SPECIALIZABLE_UNARYOPS = {"-", "not"}
+
+
+@dataclass(slots=True)
+class QuickeningStats:
+    """What happened to one adaptive `BINOP` or `UNARYOP` instruction.
+
+    `specialized_for` has the operand types the instruction saw when it was
+    specialized. When an instruction sees operands it can't specialize for, it
+    waits for `backoff` runs before trying again and the wait doubles every time.
+    """
+
+    specialized_for: tuple[type, ...] | None = None
+    warmup: int = QUICKENING_WARMUP
+    backoff: int = QUICKENING_WARMUP
+
+    def back_off(self) -> None:
+        self.warmup = self.backoff
+        self.backoff = min(2 * self.backoff, MAX_QUICKENING_BACKOFF)
+
+
+def quicken(interpreter: Interpreter) -> dict[int, QuickeningStats]:
+    """Makes the specializable `BINOP` and `UNARYOP` instructions adaptive.
+
+    Returns the counters of each adaptive instruction, by position.
+    """
+    quickening: dict[int, QuickeningStats] = {}
+    for ptr, bc in enumerate(interpreter.bytecode):
+        if bc.type == BytecodeType.BINOP and bc.value in SPECIALIZABLE_BINOPS:
+            stats = quickening[ptr] = QuickeningStats()
+            handler = adaptive_binop(interpreter, stats, bc.value)
+        elif bc.type == BytecodeType.UNARYOP and bc.value in SPECIALIZABLE_UNARYOPS:
+            stats = quickening[ptr] = QuickeningStats()
+            handler = adaptive_unaryop(interpreter, stats, bc.value)
+        else:
+            continue
+        _, value = interpreter.threaded_code[ptr]
+        interpreter.threaded_code[ptr] = (handler, value)
+    return quickening
+
+
+def adaptive_binop(
+    interpreter: Interpreter, stats: QuickeningStats, op: str
+) -> Handler:
+    """Builds the handler that runs a generic `BINOP` until it can specialize it."""
+    code = interpreter.threaded_code
+    generic = interpreter.fast_binop
+
+    def binop(stack: list[Any], value: Any, ptr: int) -> int:
+        stats.warmup -= 1
+        if stats.warmup > 0:
+            return generic(stack, value, ptr)
+
+        kinds = (type(stack[-2]), type(stack[-1]))
+        if not SPECIALIZABLE_TYPES.issuperset(kinds):
+            stats.back_off()
+            return generic(stack, value, ptr)
+
+        code[ptr] = (SPECIALIZED_BINOPS[op], value)
+        stats.specialized_for = kinds
+        return generic(stack, value, ptr)
+
+    return binop
+
+
+def adaptive_unaryop(
+    interpreter: Interpreter, stats: QuickeningStats, op: str
+) -> Handler:
+    """Builds the handler that runs a generic `UNARYOP` until it can specialize it."""
+    code = interpreter.threaded_code
+    generic = interpreter.fast_unaryop
+
+    def unaryop(stack: list[Any], value: Any, ptr: int) -> int:
+        stats.warmup -= 1
+        if stats.warmup > 0:
+            return generic(stack, value, ptr)
+
+        kind = type(stack[-1])
+        if kind not in SPECIALIZABLE_TYPES:
+            stats.back_off()
+            return generic(stack, value, ptr)
+
+        code[ptr] = (SPECIALIZED_UNARYOPS[op], value)
+        stats.specialized_for = (kind,)
+        return generic(stack, value, ptr)
+
+    return unaryop
+
+
+def specialized_add(stack: list[Any], value: Any, ptr: int) -> int:
+    right = stack.pop()
+    stack[-1] = stack[-1] + right
+    return ptr + 1
+
+
+def specialized_sub(stack: list[Any], value: Any, ptr: int) -> int:
+    right = stack.pop()
+    stack[-1] = stack[-1] - right
+    return ptr + 1
+
+
+def specialized_mul(stack: list[Any], value: Any, ptr: int) -> int:
+    right = stack.pop()
+    stack[-1] = stack[-1] * right
+    return ptr + 1
+
+
+def specialized_neg(stack: list[Any], value: Any, ptr: int) -> int:
+    stack[-1] = -stack[-1]
+    return ptr + 1
+
+
+def specialized_not(stack: list[Any], value: Any, ptr: int) -> int:
+    stack[-1] = not stack[-1]
+    return ptr + 1
+
+
+SPECIALIZED_BINOPS: dict[str, Handler] = {
+    "+": specialized_add,
+    "-": specialized_sub,
+    "*": specialized_mul,
+}
+"""The handlers of specialized `BINOP` instructions, by operator.
+
+They run the same operation as the generic handler, which is right for operands
+of any type, so an instruction stays specialized once it is.
+"""
+
+SPECIALIZED_UNARYOPS: dict[str, Handler] = {
+    "-": specialized_neg,
+    "not": specialized_not,
+}
+"""The handlers of specialized `UNARYOP` instructions, by operator."""
@@ -0,0 +1,535 @@
+import operator
+from dataclasses import dataclass
+from enum import auto, StrEnum
+from typing import Any
+
+from .compiler import Label
+from .interpreter import UNBOUND
+from .packed import intern
+from .parser import (
+    Assignment,
+    BinOp,
+    Body,
+    BoolOp,
+    Conditional,
+    Constant,
+    Expr,
+    ExprStatement,
+    Program,
+    TreeNode,
+    UnaryOp,
+    Variable,
+    conditional_arms,
+)
+
+
+class RegisterBytecodeType(StrEnum):
+    MOVE = auto()
+    ADD = auto()
+    SUB = auto()
+    MUL = auto()
+    DIV = auto()
+    MOD = auto()
+    POW = auto()
+    NEG = auto()
+    NOT = auto()
+    POP = auto()
+    JUMP = auto()
+    JUMP_IF_FALSE = auto()
+    JUMP_IF_TRUE = auto()
+    JUMP_IF_FALSE_OR_POP = auto()
+    JUMP_IF_TRUE_OR_POP = auto()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}.{self.name}"
+
+
+REGISTER_OPCODES: dict[RegisterBytecodeType, int] = {
+    bct: idx for idx, bct in enumerate(RegisterBytecodeType)
+}
+"""Maps each register bytecode type to the small integer `run_fast` dispatches on."""
+
+BINOPS_TO_REGISTER_TYPES = {
+    "**": RegisterBytecodeType.POW,
+    "%": RegisterBytecodeType.MOD,
+    "/": RegisterBytecodeType.DIV,
+    "*": RegisterBytecodeType.MUL,
+    "+": RegisterBytecodeType.ADD,
+    "-": RegisterBytecodeType.SUB,
+}
+
+REGISTER_BINOPS = {
+    RegisterBytecodeType.POW: operator.pow,
+    RegisterBytecodeType.MOD: operator.mod,
+    RegisterBytecodeType.DIV: operator.truediv,
+    RegisterBytecodeType.MUL: operator.mul,
+    RegisterBytecodeType.ADD: operator.add,
+    RegisterBytecodeType.SUB: operator.sub,
+}
+
+REGISTER_JUMP_TYPES = {
+    RegisterBytecodeType.JUMP,
+    RegisterBytecodeType.JUMP_IF_FALSE,
+    RegisterBytecodeType.JUMP_IF_TRUE,
+    RegisterBytecodeType.JUMP_IF_FALSE_OR_POP,
+    RegisterBytecodeType.JUMP_IF_TRUE_OR_POP,
+}
+"""Register bytecode types whose last argument is the offset to the jump target."""
+
+
+@dataclass
+class RegisterBytecode:
+    """A three-address instruction.
+
+    - `MOVE dst, src` copies a register;
+    - `ADD dst, left, right` (and the other binary operators) compute into `dst`;
+    - `NEG dst, src` and `NOT dst, src` compute into `dst`;
+    - `POP src` sets `last_value_popped`, like the stack VM's `POP`;
+    - `JUMP offset` and `JUMP_IF_X src, offset` jump relative to themselves;
+    - `JUMP_IF_X_OR_POP src, offset` jumps or sets `last_value_popped`.
+    """
+
+    type: RegisterBytecodeType
+    args: tuple[int, ...]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.type!r}, {self.args!r})"
+
+
+@dataclass
+class RegisterProgram:
+    """Register bytecode and the layout of the register file it runs on.
+
+    `variables` and `constants` map registers to the variables they hold and
+    to the constants they are initialised with. All other registers hold
+    temporary values.
+    """
+
+    bytecode: list[RegisterBytecode]
+    variables: dict[int, str]
+    constants: dict[int, Any]
+    size: int
+
+
+class RegisterCompiler:
+    """Compiles a program tree into register bytecode.
+
+    Every variable and every constant gets its own register, so instructions
+    read them directly instead of loading them first. Intermediate results go
+    in temporary registers that are reused across statements. Like with
+    `Compiler(tree, slots=True)`, a variable that might be read before it is
+    assigned is a compile error.
+    """
+
+    def __init__(self, tree: TreeNode) -> None:
+        self.tree = tree
+        self.bytecode: list[RegisterBytecode] = []
+        self.size = 0
+        self.variables: dict[str, int] = {}
+        self.constants: list[Any] = []
+        self.constant_registers: list[int] = []
+        self.constant_indices: dict[Any, int] = {}
+        self.free_temporaries: list[int] = []
+        self.temporaries: list[int] = []
+        """The temporary registers in use by the current statement."""
+        self.assigned: set[str] = set()
+
+    def compile(self) -> RegisterProgram:
+        self._compile(self.tree)
+        return RegisterProgram(
+            self.bytecode,
+            {register: name for name, register in self.variables.items()},
+            dict(zip(self.constant_registers, self.constants)),
+            self.size,
+        )
+
+    def emit(self, type: RegisterBytecodeType, *args: int) -> None:
+        self.bytecode.append(RegisterBytecode(type, args))
+
+    def emit_jump(self, type: RegisterBytecodeType, label: Label, *args: int) -> None:
+        """Like `Compiler.emit_jump`, with the offset as the last argument."""
+        if label.position is None:
+            label.jumps.append(len(self.bytecode))
+            self.emit(type, *args, 0)
+        else:
+            self.emit(type, *args, label.position - len(self.bytecode))
+
+    def bind(self, label: Label) -> None:
+        """Like `Compiler.bind`."""
+        label.position = len(self.bytecode)
+        for jump in label.jumps:
+            bc = self.bytecode[jump]
+            bc.args = (*bc.args[:-1], label.position - jump)
+        label.jumps.clear()
+
+    def new_register(self) -> int:
+        self.size += 1
+        return self.size - 1
+
+    def temporary(self) -> int:
+        register = (
+            self.free_temporaries.pop()
+            if self.free_temporaries
+            else self.new_register()
+        )
+        self.temporaries.append(register)
+        return register
+
+    def variable(self, name: str) -> int:
+        if name not in self.variables:
+            self.variables[name] = self.new_register()
+        return self.variables[name]
+
+    def constant(self, value: Any) -> int:
+        index = intern(value, self.constants, self.constant_indices)
+        if index == len(self.constant_registers):
+            self.constant_registers.append(self.new_register())
+        return self.constant_registers[index]
+
+    def _compile(self, tree: TreeNode) -> None:
+        node_name = tree.__class__.__name__
+        compile_method = getattr(self, f"compile_{node_name}", None)
+        if compile_method is None:
+            raise RuntimeError(f"Can't compile {node_name}.")
+        compile_method(tree)
+        # Statements don't leave values behind, so their temporaries can be reused.
+        self.free_temporaries.extend(self.temporaries)
+        self.temporaries.clear()
+
+    def compile_Program(self, program: Program) -> None:
+        for statement in program.statements:
+            self._compile(statement)
+
+    def compile_Body(self, body: Body) -> None:
+        for statement in body.statements:
+            self._compile(statement)
+
+    def compile_Conditional(self, conditional: Conditional) -> None:
+        arms, orelse = conditional_arms(conditional)
+        if isinstance(orelse, Body) and not orelse.statements:
+            orelse = None
+
+        before = self.assigned
+        assigned_by_arms: list[set[str]] = []
+
+        end_label = Label()
+        for idx, arm in enumerate(arms):
+            next_arm_label = Label()
+            condition = self.compile_expr(arm.condition)
+            self.emit_jump(
+                RegisterBytecodeType.JUMP_IF_FALSE, next_arm_label, condition
+            )
+            self.assigned = set(before)
+            self._compile(arm.body)
+            assigned_by_arms.append(self.assigned)
+            self.assigned = before
+            if idx < len(arms) - 1 or orelse is not None:
+                self.emit_jump(RegisterBytecodeType.JUMP, end_label)
+            self.bind(next_arm_label)
+
+        if orelse is not None:
+            self.assigned = set(before)
+            self._compile(orelse)
+        assigned_by_arms.append(self.assigned)
+        self.bind(end_label)
+        self.assigned = set.intersection(*assigned_by_arms)
+
+    def compile_Assignment(self, assignment: Assignment) -> None:
+        # The value is computed straight into the first target, unless that
+        # target is read while computing a Boolean operator.
+        first, *others = [self.variable(target.name) for target in assignment.targets]
+        value = assignment.value
+        while isinstance(value, UnaryOp) and value.op == "+":
+            value = value.value  # `+` computes into the register of its operand.
+        if isinstance(value, BoolOp) and assignment.targets[0].name in variables_read(
+            value
+        ):
+            result = self.compile_expr(value)
+            self.emit(RegisterBytecodeType.MOVE, first, result)
+        else:
+            result = self.compile_expr(value, first)
+            if result != first:
+                self.emit(RegisterBytecodeType.MOVE, first, result)
+        for target in others:
+            self.emit(RegisterBytecodeType.MOVE, target, result)
+        self.assigned.update(target.name for target in assignment.targets)
+
+    def compile_ExprStatement(self, expression: ExprStatement) -> None:
+        self.emit(RegisterBytecodeType.POP, self.compile_expr(expression.expr))
+
+    def compile_expr(self, expr: Expr, dst: int | None = None) -> int:
+        """Compiles the expression and returns the register that holds its value.
+
+        Operators compute into `dst` when it is given. Variables and constants
+        return their own register, and it's up to the caller to move them.
+        """
+        node_name = expr.__class__.__name__
+        compile_method = getattr(self, f"compile_{node_name}", None)
+        if compile_method is None:
+            raise RuntimeError(f"Can't compile {node_name}.")
+        return compile_method(expr, dst)
+
+    def compile_BoolOp(self, tree: BoolOp, dst: int | None) -> int:
+        jump_type = (
+            RegisterBytecodeType.JUMP_IF_FALSE_OR_POP
+            if tree.op == "and"
+            else RegisterBytecodeType.JUMP_IF_TRUE_OR_POP
+        )
+        result = self.temporary() if dst is None else dst
+
+        end_label = Label()
+        for value in tree.values:
+            register = self.compile_expr(value, result)
+            if register != result:
+                self.emit(RegisterBytecodeType.MOVE, result, register)
+            if value is not tree.values[-1]:
+                self.emit_jump(jump_type, end_label, result)
+        self.bind(end_label)
+        return result
+
+    def compile_UnaryOp(self, tree: UnaryOp, dst: int | None) -> int:
+        if tree.op == "+":  # See `Interpreter.interpret_unaryop`.
+            return self.compile_expr(tree.value, dst)
+        elif tree.op == "-":
+            unary_type = RegisterBytecodeType.NEG
+        elif tree.op == "not":
+            unary_type = RegisterBytecodeType.NOT
+        else:
+            raise RuntimeError(f"Unknown operator {tree.op}.")
+
+        operand = self.compile_expr(tree.value)
+        result = self.temporary() if dst is None else dst
+        self.emit(unary_type, result, operand)
+        return result
+
+    def compile_BinOp(self, tree: BinOp, dst: int | None) -> int:
+        binop_type = BINOPS_TO_REGISTER_TYPES.get(tree.op, None)
+        if binop_type is None:
+            raise RuntimeError(f"Unknown operator {tree.op}.")
+
+        left = self.compile_expr(tree.left)
+        right = self.compile_expr(tree.right)
+        result = self.temporary() if dst is None else dst
+        self.emit(binop_type, result, left, right)
+        return result
+
+    def compile_Constant(self, constant: Constant, dst: int | None) -> int:
+        return self.constant(constant.value)
+
+    def compile_Variable(self, var: Variable, dst: int | None) -> int:
+        if var.name not in self.assigned:
+            raise RuntimeError(f"Variable {var.name} might not be assigned.")
+        return self.variable(var.name)
+
+
+def variables_read(expr: Expr) -> set[str]:
+    """Returns the names of the variables that the expression reads."""
+    names: set[str] = set()
+    pending: list[Expr] = [expr]
+    while pending:
+        expr = pending.pop()
+        if isinstance(expr, Variable):
+            names.add(expr.name)
+        elif isinstance(expr, BoolOp):
+            pending.extend(expr.values)
+        elif isinstance(expr, UnaryOp):
+            pending.append(expr.value)
+        elif isinstance(expr, BinOp):
+            pending.extend([expr.left, expr.right])
+    return names
+
+
+class RegisterInterpreter:
+    """Runs register bytecode on a register file that also holds the variables.
+
+    `run` dispatches each instruction to its `execute_` method. `run_fast`
+    runs all instructions inline, in a single loop.
+    """
+
+    def __init__(self, program: RegisterProgram, fast: bool = False) -> None:
+        self.program = program
+        self.fast = fast
+        self.registers: list[Any] = [UNBOUND] * program.size
+        for register, value in program.constants.items():
+            self.registers[register] = value
+        self.ptr: int = 0
+        self.last_value_popped: Any = None
+
+        # For `run_fast`, pad every instruction to three arguments and make
+        # jump targets absolute.
+        self.code: list[tuple[int, int, int, int]] = []
+        for ptr, bc in enumerate(program.bytecode):
+            args = list(bc.args)
+            if bc.type in REGISTER_JUMP_TYPES:
+                args[-1] += ptr
+            a, b, c = args + [0] * (3 - len(args))
+            self.code.append((REGISTER_OPCODES[bc.type], a, b, c))
+
+    @property
+    def scope(self) -> dict[str, Any]:
+        return {
+            name: self.registers[register]
+            for register, name in self.program.variables.items()
+            if self.registers[register] is not UNBOUND
+        }
+
+    def interpret(self) -> None:
+        if self.fast:
+            self.run_fast()
+        else:
+            self.run()
+
+        print("Done!")
+        print(self.scope)
+        print(self.last_value_popped)
+
+    def run(self) -> None:
+        bytecode = self.program.bytecode
+        while self.ptr < len(bytecode):
+            self.execute(bytecode[self.ptr])
+
+    def execute(self, bc: RegisterBytecode) -> None:
+        execute_method = getattr(self, f"execute_{bc.type.value}", None)
+        if execute_method is None:
+            raise RuntimeError(f"Can't interpret {bc.type.value}.")
+        execute_method(bc)
+
+    def execute_move(self, bc: RegisterBytecode) -> None:
+        dst, src = bc.args
+        self.registers[dst] = self.registers[src]
+        self.ptr += 1
+
+    def execute_binop(self, bc: RegisterBytecode) -> None:
+        dst, left, right = bc.args
+        op = REGISTER_BINOPS[bc.type]
+        self.registers[dst] = op(self.registers[left], self.registers[right])
+        self.ptr += 1
+
+    execute_add = execute_sub = execute_mul = execute_binop
+    execute_div = execute_mod = execute_pow = execute_binop
+
+    def execute_neg(self, bc: RegisterBytecode) -> None:
+        dst, src = bc.args
+        self.registers[dst] = -self.registers[src]
+        self.ptr += 1
+
+    def execute_not(self, bc: RegisterBytecode) -> None:
+        dst, src = bc.args
+        self.registers[dst] = not self.registers[src]
+        self.ptr += 1
+
+    def execute_pop(self, bc: RegisterBytecode) -> None:
+        (src,) = bc.args
+        self.last_value_popped = self.registers[src]
+        self.ptr += 1
+
+    def execute_jump(self, bc: RegisterBytecode) -> None:
+        (offset,) = bc.args
+        self.ptr += offset
+
+    def execute_jump_if_false(self, bc: RegisterBytecode) -> None:
+        src, offset = bc.args
+        self.ptr += 1 if self.registers[src] else offset
+
+    def execute_jump_if_true(self, bc: RegisterBytecode) -> None:
+        src, offset = bc.args
+        self.ptr += offset if self.registers[src] else 1
+
+    def execute_jump_if_false_or_pop(self, bc: RegisterBytecode) -> None:
+        src, offset = bc.args
+        if not self.registers[src]:
+            self.ptr += offset
+        else:
+            self.last_value_popped = self.registers[src]
+            self.ptr += 1
+
+    def execute_jump_if_true_or_pop(self, bc: RegisterBytecode) -> None:
+        src, offset = bc.args
+        if self.registers[src]:
+            self.ptr += offset
+        else:
+            self.last_value_popped = self.registers[src]
+            self.ptr += 1
+
+    def run_fast(self) -> None:
+        MOVE = REGISTER_OPCODES[RegisterBytecodeType.MOVE]
+        ADD = REGISTER_OPCODES[RegisterBytecodeType.ADD]
+        SUB = REGISTER_OPCODES[RegisterBytecodeType.SUB]
+        MUL = REGISTER_OPCODES[RegisterBytecodeType.MUL]
+        DIV = REGISTER_OPCODES[RegisterBytecodeType.DIV]
+        MOD = REGISTER_OPCODES[RegisterBytecodeType.MOD]
+        POW = REGISTER_OPCODES[RegisterBytecodeType.POW]
+        NEG = REGISTER_OPCODES[RegisterBytecodeType.NEG]
+        NOT = REGISTER_OPCODES[RegisterBytecodeType.NOT]
+        POP = REGISTER_OPCODES[RegisterBytecodeType.POP]
+        JUMP = REGISTER_OPCODES[RegisterBytecodeType.JUMP]
+        JUMP_IF_FALSE = REGISTER_OPCODES[RegisterBytecodeType.JUMP_IF_FALSE]
+        JUMP_IF_TRUE = REGISTER_OPCODES[RegisterBytecodeType.JUMP_IF_TRUE]
+        JUMP_IF_FALSE_OR_POP = REGISTER_OPCODES[
+            RegisterBytecodeType.JUMP_IF_FALSE_OR_POP
+        ]
+        JUMP_IF_TRUE_OR_POP = REGISTER_OPCODES[RegisterBytecodeType.JUMP_IF_TRUE_OR_POP]
+
+        code = self.code
+        r = self.registers
+        ptr = self.ptr
+        end = len(code)
+        try:
+            while ptr < end:
+                opcode, a, b, c = code[ptr]
+                ptr += 1
+                if opcode == ADD:
+                    r[a] = r[b] + r[c]
+                elif opcode == MUL:
+                    r[a] = r[b] * r[c]
+                elif opcode == SUB:
+                    r[a] = r[b] - r[c]
+                elif opcode == MOVE:
+                    r[a] = r[b]
+                elif opcode == JUMP_IF_FALSE:
+                    if not r[a]:
+                        ptr = b
+                elif opcode == POP:
+                    self.last_value_popped = r[a]
+                elif opcode == JUMP:
+                    ptr = a
+                elif opcode == JUMP_IF_FALSE_OR_POP:
+                    if not r[a]:
+                        ptr = b
+                    else:
+                        self.last_value_popped = r[a]
+                elif opcode == JUMP_IF_TRUE_OR_POP:
+                    if r[a]:
+                        ptr = b
+                    else:
+                        self.last_value_popped = r[a]
+                elif opcode == MOD:
+                    r[a] = r[b] % r[c]
+                elif opcode == DIV:
+                    r[a] = r[b] / r[c]
+                elif opcode == NEG:
+                    r[a] = -r[b]
+                elif opcode == NOT:
+                    r[a] = not r[b]
+                elif opcode == POW:
+                    r[a] = r[b] ** r[c]
+                elif opcode == JUMP_IF_TRUE:
+                    if r[a]:
+                        ptr = b
+                else:
+                    raise RuntimeError(f"Can't interpret opcode {opcode}.")
+        finally:
+            self.ptr = ptr
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .tokenizer import Tokenizer
+    from .parser import Parser
+
+    code = sys.argv[1]
+    program = RegisterCompiler(Parser(Tokenizer(code)).parse()).compile()
+    for bc in program.bytecode:
+        print(bc)
+    RegisterInterpreter(program, fast="--fast" in sys.argv[2:]).interpret()
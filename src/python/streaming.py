@@ -0,0 +1,64 @@
+from typing import Any, Iterable, Iterator
+
+from .compiler import Compiler
+from .interpreter import Interpreter
+from .parser import Parser, Program, Statement
+from .tokenizer import Token
+
+
+class StreamingInterpreter:
+    """Runs a program one top-level statement at a time.
+
+    Each top-level statement is compiled and run as soon as the parser is done
+    with it, before the tokens of the statements that follow are read, and the
+    variables carry over from one statement to the next. Only one statement's
+    tree and bytecode are alive at a time, so memory is bounded by the largest
+    statement instead of by the length of the program.
+
+    Since each statement is compiled on its own, constants aren't propagated
+    from one statement to the next with `optimization_level` 1 or higher.
+    """
+
+    def __init__(self, fast: bool = False, optimization_level: int = 0) -> None:
+        self.fast = fast
+        self.optimization_level = optimization_level
+        self.scope: dict[str, Any] = {}
+        self.last_value_popped: Any = None
+        self.statements_run: int = 0
+
+    def run_statement(self, statement: Statement) -> None:
+        """Compiles and runs a single top-level statement."""
+        tree = Program([statement])
+        bytecode = list(Compiler(tree, self.optimization_level).compile())
+        interpreter = Interpreter(bytecode, fast=self.fast)
+        interpreter.scope = self.scope
+        interpreter.last_value_popped = self.last_value_popped
+        if self.fast:
+            interpreter.run_fast()
+        else:
+            interpreter.run()
+        self.last_value_popped = interpreter.last_value_popped
+        self.statements_run += 1
+
+    def run(self, tokens: Iterable[Token]) -> Iterator[Statement]:
+        """Runs the statements as they are parsed, yielding each one after it runs."""
+        for statement in Parser(tokens).parse_lazily():
+            self.run_statement(statement)
+            yield statement
+
+    def interpret(self, tokens: Iterable[Token]) -> None:
+        for _ in self.run(tokens):
+            pass
+
+        print("Done!")
+        print(self.scope)
+        print(self.last_value_popped)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .tokenizer import Tokenizer
+
+    code = sys.argv[1]
+    StreamingInterpreter(fast="--fast" in sys.argv[2:]).interpret(Tokenizer(code))
@@ -0,0 +1,280 @@
+from typing import Any, Callable
+
+from .compiler import Bytecode, BytecodeType, JUMP_TYPES
+from .interpreter import Interpreter, resolve_binop
+
+type Operation = Callable[[], None]
+type Block = Callable[[], Block | None]
+
+
+class ClosureInterpreter(Interpreter):
+    """Runs bytecode that was pre-compiled into a chain of Python closures.
+
+    The bytecode is split into basic blocks. Each block becomes a closure that
+    runs the pre-bound operations of its straight-line instructions and then
+    returns the next block to run, or `None` when the program is over.
+    """
+
+    def __init__(
+        self, bytecode: list[Bytecode], slot_names: list[str] | None = None
+    ) -> None:
+        super().__init__(bytecode, slot_names=slot_names)
+        self.blocks: list[Block | None] = [None] * (len(bytecode) + 1)
+        self.entry = self.build_blocks()
+
+    def run(self) -> None:
+        block = self.entry
+        while block is not None:
+            block = block()
+        self.ptr = len(self.bytecode)
+
+    def build_blocks(self) -> Block | None:
+        """Builds the closure for every basic block and returns the first one."""
+        bytecode = self.bytecode
+        leaders = {0}
+        for ptr, bc in enumerate(bytecode):
+            if bc.type in JUMP_TYPES:
+                leaders.add(ptr + 1)
+                leaders.add(ptr + bc.value)
+
+        starts = sorted(leader for leader in leaders if leader < len(bytecode))
+        for start, end in zip(starts, starts[1:] + [len(bytecode)]):
+            self.blocks[start] = self.build_block(start, end)
+        return self.blocks[0]
+
+    def build_block(self, start: int, end: int) -> Block:
+        """Builds the closure for the basic block `bytecode[start:end]`."""
+        last = self.bytecode[end - 1]
+        if last.type in JUMP_TYPES:
+            terminator = self.build_jump(last, end - 1)
+            end -= 1
+        else:
+            terminator = self.build_fallthrough(end)
+
+        build = self.build_operation
+        operations = tuple(build(bc) for bc in self.bytecode[start:end])
+
+        def block() -> Block | None:
+            for operation in operations:
+                operation()
+            return terminator()
+
+        return block
+
+    def build_fallthrough(self, target: int) -> Block:
+        blocks = self.blocks
+
+        def fallthrough() -> Block | None:
+            return blocks[target]
+
+        return fallthrough
+
+    def build_jump(self, bc: Bytecode, ptr: int) -> Block:
+        """Builds the closure that picks the successor of a block ending in a jump."""
+        blocks = self.blocks
+        pop = self.stack.stack.pop
+        target = min(ptr + bc.value, len(self.bytecode))
+        fallthrough = ptr + 1
+
+        if bc.type == BytecodeType.POP_JUMP_IF_FALSE:
+
+            def pop_jump_if_false() -> Block | None:
+                return blocks[fallthrough] if pop() else blocks[target]
+
+            return pop_jump_if_false
+
+        elif bc.type == BytecodeType.POP_JUMP_IF_TRUE:
+
+            def pop_jump_if_true() -> Block | None:
+                return blocks[target] if pop() else blocks[fallthrough]
+
+            return pop_jump_if_true
+
+        elif bc.type == BytecodeType.JUMP_IF_FALSE_OR_POP:
+            stack = self.stack.stack
+
+            def jump_if_false_or_pop() -> Block | None:
+                if not stack[-1]:
+                    return blocks[target]
+                self.last_value_popped = pop()
+                return blocks[fallthrough]
+
+            return jump_if_false_or_pop
+
+        elif bc.type == BytecodeType.JUMP_IF_TRUE_OR_POP:
+            stack = self.stack.stack
+
+            def jump_if_true_or_pop() -> Block | None:
+                if stack[-1]:
+                    return blocks[target]
+                self.last_value_popped = pop()
+                return blocks[fallthrough]
+
+            return jump_if_true_or_pop
+
+        else:
+
+            def jump_forward() -> Block | None:
+                return blocks[target]
+
+            return jump_forward
+
+    def build_operation(self, bc: Bytecode) -> Operation:
+        bc_name = bc.type.value
+        build_method = getattr(self, f"build_{bc_name}", None)
+        if build_method is None:
+            raise RuntimeError(f"Can't interpret {bc_name}.")
+        return build_method(bc.value)
+
+    def build_push(self, value: Any) -> Operation:
+        append = self.stack.stack.append
+
+        def push() -> None:
+            append(value)
+
+        return push
+
+    def build_pop(self, _: Any) -> Operation:
+        pop_ = self.stack.stack.pop
+
+        def pop() -> None:
+            self.last_value_popped = pop_()
+
+        return pop
+
+    def build_binop(self, value: Any) -> Operation:
+        stack = self.stack.stack
+        pop = stack.pop
+        function = resolve_binop(value)
+
+        def binop() -> None:
+            right = pop()
+            stack[-1] = function(stack[-1], right)
+
+        return binop
+
+    def build_unaryop(self, value: Any) -> Operation:
+        stack = self.stack.stack
+
+        def plus() -> None:
+            pass
+
+        def minus() -> None:
+            stack[-1] = -stack[-1]
+
+        def not_() -> None:
+            stack[-1] = not stack[-1]
+
+        def unknown_unaryop() -> None:
+            raise RuntimeError(f"Unknown operator {value}.")
+
+        return {"+": plus, "-": minus, "not": not_}.get(value, unknown_unaryop)
+
+    def build_save(self, value: Any) -> Operation:
+        # The scope is looked up when the closure runs, unlike the stack and the
+        # slots, because it can be replaced after the program is built.
+        pop = self.stack.stack.pop
+
+        def save() -> None:
+            self._scope[value] = pop()
+
+        return save
+
+    def build_load(self, value: Any) -> Operation:
+        append = self.stack.stack.append
+
+        def load() -> None:
+            append(self._scope[value])
+
+        return load
+
+    def build_save_slot(self, value: Any) -> Operation:
+        slots = self.slots
+        pop = self.stack.stack.pop
+
+        def save_slot() -> None:
+            slots[value] = pop()
+
+        return save_slot
+
+    def build_load_slot(self, value: Any) -> Operation:
+        slots = self.slots
+        append = self.stack.stack.append
+
+        def load_slot() -> None:
+            append(slots[value])
+
+        return load_slot
+
+    def build_load_push_binop(self, value: Any) -> Operation:
+        name, constant, op = value
+        append = self.stack.stack.append
+        function = resolve_binop(op)
+
+        def load_push_binop() -> None:
+            append(function(self._scope[name], constant))
+
+        return load_push_binop
+
+    def build_load_load_binop(self, value: Any) -> Operation:
+        left, right, op = value
+        append = self.stack.stack.append
+        function = resolve_binop(op)
+
+        def load_load_binop() -> None:
+            scope = self._scope
+            append(function(scope[left], scope[right]))
+
+        return load_load_binop
+
+    def build_push_binop(self, value: Any) -> Operation:
+        constant, op = value
+        stack = self.stack.stack
+        function = resolve_binop(op)
+
+        def push_binop() -> None:
+            stack[-1] = function(stack[-1], constant)
+
+        return push_binop
+
+    def build_binop_save(self, value: Any) -> Operation:
+        op, name = value
+        pop = self.stack.stack.pop
+        function = resolve_binop(op)
+
+        def binop_save() -> None:
+            right = pop()
+            self._scope[name] = function(pop(), right)
+
+        return binop_save
+
+    def build_copy_save(self, value: Any) -> Operation:
+        (name,) = value
+        stack = self.stack.stack
+
+        def copy_save() -> None:
+            self._scope[name] = stack[-1]
+
+        return copy_save
+
+    def build_copy(self, _: Any) -> Operation:
+        stack = self.stack.stack
+        append = stack.append
+
+        def copy() -> None:
+            append(stack[-1])
+
+        return copy
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .tokenizer import Tokenizer
+    from .parser import Parser
+    from .compiler import Compiler
+
+    code = sys.argv[1]
+    tree = Parser(Tokenizer(code)).parse()
+    bytecode = list(Compiler(tree).compile())
+    ClosureInterpreter(bytecode).interpret()
@@ -1,8 +1,15 @@
+from __future__ import annotations
+
+import re
+import sys
+from array import array
 from collections import deque
+from collections.abc import Buffer
 from dataclasses import dataclass
 from enum import StrEnum, auto
+from itertools import chain
 from string import digits, ascii_letters
-from typing import Any, Generator
+from typing import IO, Any, Callable, Generator, Iterable
 
 
 class TokenType(StrEnum):
@@ -62,6 +69,35 @@ KEYWORDS_AS_TOKENS: dict[str, TokenType] = {
 LEGAL_NAME_CHARACTERS = ascii_letters + digits + "_"
 LEGAL_NAME_START_CHARACTERS = ascii_letters + "_"
 
+TOKEN_PATTERN = re.compile(
+    r"""
+    [ ]*  # Spaces between tokens are skipped.
+    (?:
+        # Includes blank lines and the indentation of the next line.
+        (?P<NEWLINE>\n(?:[ ]*\n)*(?P<INDENTATION>[ ]*))
+        | (?P<NAME>[A-Za-z_][A-Za-z0-9_]*)
+        | (?P<FLOAT>[0-9]+\.[0-9]*|\.[0-9]+)
+        | (?P<INT>[0-9]+)
+        | (?P<OPERATOR>\*\*|[-+()*/%=:])
+        | (?P<ERROR>.)
+    )
+    """,
+    re.VERBOSE,
+)
+"""Matches the next token and the spaces before it, for `Tokenizer.match_tokens`."""
+
+BLANK_LINES_PATTERN = re.compile(r"(?:[ ]*\n)*(?P<INDENTATION>[ ]*)")
+"""Matches the blank lines at the start of a line and the indentation after them."""
+
+BYTES_TOKEN_PATTERN = re.compile(TOKEN_PATTERN.pattern.encode(), re.VERBOSE)
+BYTES_BLANK_LINES_PATTERN = re.compile(BLANK_LINES_PATTERN.pattern.encode())
+
+CHUNK_SIZE = 2**16
+"""How many characters are read from a file object at a time."""
+
+type Code = str | Buffer | IO[str] | IO[bytes] | Iterable[str] | Iterable[bytes]
+"""Source code, whole or in chunks, as text or as ASCII bytes."""
+
 
 @dataclass
 class Token:
@@ -75,9 +111,49 @@ class Token:
             return f"{self.__class__.__name__}({self.type!r})"
 
 
+def read_chunks(file: IO[Any], size: int) -> Generator[Any, None, None]:
+    """Reads a text or binary file in chunks of the given size."""
+    while chunk := file.read(size):
+        yield chunk
+
+
 class Tokenizer:
-    def __init__(self, code: str) -> None:
-        self.code = code + "\n"  # Ensure the program ends with a newline.
+    """Turns source code into tokens.
+
+    By default, `next_token` scans the code character by character. With `regex`,
+    `match_tokens` matches each token with `TOKEN_PATTERN` instead, which
+    produces the same tokens and raises the same errors.
+
+    The code can also be a file object, which is read `chunk_size` characters
+    at a time, or any iterable of strings, like the lines of a file. Such code
+    is always matched and is only read as tokens are needed, so it never has to
+    be in memory all at once. Code can be ASCII bytes instead of text, either
+    in chunks or in a buffer like `bytes`, `memoryview`, or `mmap.mmap`, which
+    is matched in place without being copied or decoded.
+    """
+
+    def __init__(
+        self, code: Code, regex: bool = False, chunk_size: int = CHUNK_SIZE
+    ) -> None:
+        self.chunks: Iterable[str | Buffer] = ()
+        """The pieces of code that `match_tokens` reads one after the other."""
+        if isinstance(code, str) and not regex:
+            self.code = code + "\n"  # Ensure the program ends with a newline.
+        else:
+            self.code = ""
+            if isinstance(code, (str, Buffer)):
+                self.chunks = [code]
+            elif hasattr(code, "read"):
+                self.chunks = read_chunks(code, chunk_size)
+            else:
+                self.chunks = code
+        self.regex = regex or not isinstance(code, str)
+        self.token_offset: int = 0
+        """Where the last token from `match_tokens` starts in the code.
+
+        Offsets count the newline that the tokenizer adds at the end of the code,
+        so the `DEDENT` and `EOF` tokens at the end come right after it.
+        """
         self.ptr: int = 0
         self.beginning_of_line = True
         self.current_indentation_level = 0
@@ -110,12 +186,11 @@ class Tokenizer:
             self.ptr += 1
         return self.code[start : self.ptr]
 
-    def consume_indentation(self) -> str:
-        """Consumes indentation and returns it unprocessed."""
-        start = self.ptr
-        while self.ptr < len(self.code) and self.code[self.ptr] == " ":
-            self.ptr += 1
-        return self.code[start : self.ptr]
+    def consume_indentation(self) -> int:
+        """Skips blank lines and returns the indentation of the next line."""
+        match = BLANK_LINES_PATTERN.match(self.code, self.ptr)
+        self.ptr = match.end()
+        return match.end() - match.start("INDENTATION")
 
     def peek(self, length: int = 1) -> str:
         """Returns the substring that will be tokenized next."""
@@ -124,16 +199,12 @@ class Tokenizer:
     def next_token(self) -> Token:
         # If we're at the beginning of a line, handle indentation.
         if self.beginning_of_line:
+            # Lines that only contain indentation are ignored.
             indentation = self.consume_indentation()
-            # If this line only contained indentation, ignore it.
-            if self.peek() == "\n":
-                self.ptr += 1
-                return self.next_token()
-
-            if len(indentation) % 4:
+            if indentation % 4:
                 raise RuntimeError("Indentation must be a multiple of 4.")
 
-            indent_level = len(indentation) // 4
+            indent_level = indentation // 4
             while indent_level > self.current_indentation_level:
                 self.next_tokens.append(Token(TokenType.INDENT))
                 self.current_indentation_level += 1
@@ -154,13 +225,9 @@ class Tokenizer:
         char = self.code[self.ptr]
         if char == "\n":
             self.ptr += 1
-            if not self.beginning_of_line:
-                self.beginning_of_line = True
-                return Token(TokenType.NEWLINE)
-            else:
-                return self.next_token()
+            self.beginning_of_line = True
+            return Token(TokenType.NEWLINE)
 
-        self.beginning_of_line = False
         if self.peek(length=2) == "**":
             self.ptr += 2
             return Token(TokenType.EXP)
@@ -196,12 +263,212 @@ class Tokenizer:
         else:
             raise RuntimeError(f"Can't tokenize {char!r}.")
 
+    def indentation_tokens(self, indentation: int) -> list[Token]:
+        """Moves to the indentation level of a new line and returns its tokens."""
+        if indentation % 4:
+            raise RuntimeError("Indentation must be a multiple of 4.")
+
+        indent_level = indentation // 4
+        tokens: list[Token] = []
+        while indent_level > self.current_indentation_level:
+            tokens.append(Token(TokenType.INDENT))
+            self.current_indentation_level += 1
+        while indent_level < self.current_indentation_level:
+            tokens.append(Token(TokenType.DEDENT))
+            self.current_indentation_level -= 1
+        return tokens
+
+    def match_tokens(self) -> Generator[Token, None, None]:
+        """Tokenizes the chunks of code with one regular expression match per token.
+
+        A match that reaches the end of the code read so far might continue in
+        the next chunk, like a name or the indentation of a line, so it's only
+        matched again once the next chunk is in. Tokens without a value are
+        created once and yielded every time they occur, and so are the tokens
+        of names, which are decoded and interned once.
+        """
+        chunks = iter(self.chunks)
+        first_chunk = next(chunks, "")
+        text = isinstance(first_chunk, str)
+        if text:
+            token_pattern = TOKEN_PATTERN
+            leading_blank_lines_pattern = BLANK_LINES_PATTERN
+            encode: Callable[[str], Any] = str
+            empty, newline_char = "", "\n"
+        else:
+            token_pattern = BYTES_TOKEN_PATTERN
+            leading_blank_lines_pattern = BYTES_BLANK_LINES_PATTERN
+            encode = str.encode
+            empty, newline_char = b"", b"\n"
+        dot, no_decimal = encode("."), encode(".0")
+
+        operators = {
+            encode(char): Token(type) for char, type in CHARS_AS_TOKENS.items()
+        }
+        operators[encode("**")] = Token(TokenType.EXP)
+        names = {encode(name): Token(type) for name, type in KEYWORDS_AS_TOKENS.items()}
+        newline = Token(TokenType.NEWLINE)
+
+        # Buffers are matched in place. Only the end of a chunk where a match
+        # continues into the next chunk is copied, which makes it `bytes`.
+        code: Any = empty
+        # Where `code` starts in the whole code, to track the offsets of tokens,
+        # and where the newline that starts `code` was, if it replaced another.
+        base, resumed_newline = 0, -1
+        beginning_of_file = True
+        for chunk in chain([first_chunk], chunks, [None]):
+            if chunk is None:  # Ensure the program ends with a newline.
+                code, end_of_code = code + newline_char, -1
+            else:
+                code = code + chunk if code else chunk
+                end_of_code = len(code)
+
+            start = 0
+            if beginning_of_file:
+                # Blank lines at the start produce no `NEWLINE`, but the
+                # indentation of the first line that isn't blank counts.
+                match = leading_blank_lines_pattern.match(code)
+                start = match.end()
+                if start == end_of_code:
+                    base += match.start("INDENTATION")
+                    code = empty + code[match.start("INDENTATION") :]
+                    continue
+                beginning_of_file = False
+                indentation = start - match.start("INDENTATION")
+                self.token_offset = base + start
+                yield from self.indentation_tokens(indentation)
+
+            for match in token_pattern.finditer(code, start):
+                kind = match.lastgroup
+                if match.end() == end_of_code:
+                    # Only the newline and the last line matter in blank lines.
+                    if kind == "NEWLINE":
+                        if resumed_newline < 0:
+                            resumed_newline = base + match.start(kind)
+                        base += match.start("INDENTATION") - 1
+                        code = newline_char + code[match.start("INDENTATION") :]
+                    else:
+                        base += match.start(kind)
+                        code = empty + code[match.start(kind) :]
+                    break
+
+                self.token_offset = base + match.start(kind)
+                if kind == "NAME":
+                    name = match.group(kind)
+                    token = names.get(name)
+                    if token is None:
+                        decoded = sys.intern(name if text else name.decode())
+                        token = names[name] = Token(TokenType.NAME, decoded)
+                    yield token
+                elif kind == "OPERATOR":
+                    yield operators[match.group(kind)]
+                elif kind == "NEWLINE":
+                    if resumed_newline >= 0:
+                        self.token_offset, resumed_newline = resumed_newline, -1
+                    yield newline
+                    indentation = match.end() - match.start("INDENTATION")
+                    if indentation != 4 * self.current_indentation_level:
+                        self.token_offset = base + match.end()
+                        yield from self.indentation_tokens(indentation)
+                elif kind == "INT":
+                    yield Token(TokenType.INT, int(match.group(kind)))
+                elif kind == "FLOAT":
+                    integer, _, decimal = match.group(kind).partition(dot)
+                    value = float(dot + decimal if decimal else no_decimal)
+                    yield Token(
+                        TokenType.FLOAT, int(integer) + value if integer else value
+                    )
+                else:
+                    char = match.group(kind)
+                    if not text:
+                        char = char.decode("latin-1")
+                    raise RuntimeError(f"Can't tokenize {char!r}.")
+            else:
+                base, code = base + len(code), empty
+
+        self.token_offset = base
+        yield Token(TokenType.EOF)
+
     def __iter__(self) -> Generator[Token, None, None]:
+        if self.regex:
+            yield from self.match_tokens()
+            return
+
         while (token := self.next_token()).type != TokenType.EOF:
             yield token
         yield token  # Yield the EOF token too.
 
 
+TOKEN_TYPES = list(TokenType)
+"""The token types by the code that `TokenBuffer` stores for them."""
+TOKEN_TYPE_CODES = {type: code for code, type in enumerate(TOKEN_TYPES)}
+
+
+class TokenBuffer:
+    """Tokens stored in parallel arrays instead of as one `Token` object each.
+
+    For each token, `types` has the index of its type in `TOKEN_TYPES`,
+    `offsets` has where it starts in the code, as given by `match_tokens`, and
+    `value_indices` has the index of its value in `values`, which are stored
+    once each and start with the `None` of the tokens without a value.
+
+    Iterating over the buffer, as the `Parser` does, gives `Token` objects,
+    which are created once for each distinct token and then shared.
+    """
+
+    def __init__(self) -> None:
+        self.types = array("B")
+        self.offsets = array("Q")
+        self.value_indices = array("I")
+        self.values: list[Any] = [None]
+        self.value_index: dict[tuple[TokenType, Any], int] = {}
+
+    @classmethod
+    def tokenize(cls, code: Code, chunk_size: int = CHUNK_SIZE) -> TokenBuffer:
+        """Tokenizes the code straight into a new buffer."""
+        buffer = cls()
+        buffer.extend(code, chunk_size)
+        return buffer
+
+    def extend(self, code: Code, chunk_size: int = CHUNK_SIZE) -> None:
+        """Tokenizes the code into the buffer, which keeps the tokens before errors."""
+        tokenizer = Tokenizer(code, regex=True, chunk_size=chunk_size)
+        for token in tokenizer.match_tokens():
+            self.append(token, tokenizer.token_offset)
+
+    def append(self, token: Token, offset: int) -> None:
+        self.types.append(TOKEN_TYPE_CODES[token.type])
+        self.offsets.append(offset)
+        if token.value is None:
+            self.value_indices.append(0)
+            return
+
+        # Keyed by the token type too, like the constants in `packed.intern`.
+        key = (token.type, token.value)
+        value_index = self.value_index.get(key)
+        if value_index is None:
+            value_index = self.value_index[key] = len(self.values)
+            self.values.append(token.value)
+        self.value_indices.append(value_index)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, index: int) -> Token:
+        value = self.values[self.value_indices[index]]
+        return Token(TOKEN_TYPES[self.types[index]], value)
+
+    def __iter__(self) -> Generator[Token, None, None]:
+        values = self.values
+        tokens: dict[tuple[int, int], Token] = {}
+        for key in zip(self.types, self.value_indices):
+            token = tokens.get(key)
+            if token is None:
+                type_code, value_index = key
+                token = tokens[key] = Token(TOKEN_TYPES[type_code], values[value_index])
+            yield token
+
+
 if __name__ == "__main__":
     import sys
 
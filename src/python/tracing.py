@@ -0,0 +1,460 @@
+import ast
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from .compiler import Bytecode
+from .interpreter import Interpreter
+from .native import BINOPS_TO_AST
+
+TRACE_THRESHOLD = 16
+"""How many times a position starts a run in the interpreter before it's traced."""
+
+MAX_GUARD_FAILURES = 8
+"""How often a trace's guards can fail in most of its runs before it's dropped."""
+
+MAX_TRACE_LENGTH = 1_000
+"""How many bytecodes a trace records at most."""
+
+type TraceFunction = Callable[[Interpreter, dict[str, Any], list[Any], list[Any]], int]
+"""A compiled trace takes the interpreter, its scope, its slots, and its stack,
+and returns the pointer to the bytecode to execute next."""
+
+POPPED = "popped"
+
+
+@dataclass
+class Trace:
+    """A compiled trace and its counters."""
+
+    start: int
+    end: int
+    """Where execution continues if no guard fails."""
+    function: TraceFunction
+    length: int
+    guards: int
+    runs: int = 0
+    guard_failures: int = 0
+
+
+@dataclass
+class TracingStats:
+    traces_compiled: int = 0
+    trace_runs: int = 0
+    guard_failures: int = 0
+    traces_dropped: int = 0
+    time_saved: float = 0.0
+    """Estimated seconds saved, compared to the runs that used no traces."""
+
+
+class TraceCompiler:
+    """Compiles the path recorded through the bytecode into a single function.
+
+    The values on the stack become local variables, so the function contains
+    no stack operations and no dispatch. Each conditional jump on the path
+    becomes a guard that checks that the jump goes the same way it went when
+    the path was recorded. If a guard fails, the function puts the values
+    back on the stack and returns the position of the jump, so that the
+    interpreter can take over from there.
+    """
+
+    def __init__(
+        self, bytecode: list[Bytecode], path: list[tuple[int, int]], depth: int
+    ) -> None:
+        self.bytecode = bytecode
+        self.path = path
+        """The positions of the bytecodes executed, each with the next position."""
+        self.depth = depth
+        """How many values are on the stack."""
+        self.entry_depth = depth
+        self.popped = False
+        """Whether the trace has popped a value that `last_value_popped` must see."""
+        self.guards = 0
+
+    def compile(self, start: int) -> Trace:
+        body: list[ast.stmt] = []
+        if self.depth:  # `s0, s1 = stack`.
+            body.append(
+                ast.Assign(
+                    targets=[
+                        ast.Tuple(
+                            elts=[self.store(idx) for idx in range(self.depth)],
+                            ctx=ast.Store(),
+                        )
+                    ],
+                    value=self.name("stack"),
+                )
+            )
+
+        for ptr, next_ptr in self.path:
+            bc = self.bytecode[ptr]
+            lower_method = getattr(self, f"lower_{bc.type.value}", None)
+            if lower_method is None:
+                raise RuntimeError(f"Can't trace {bc.type.value}.")
+            body.extend(lower_method(bc, ptr, next_ptr != ptr + 1))
+
+        end = self.path[-1][1] if self.path else start
+        body.extend(self.exit(end))
+
+        function = ast.FunctionDef(
+            name=f"trace_{start}",
+            args=ast.arguments(
+                posonlyargs=[],
+                args=[
+                    ast.arg(arg=name)
+                    for name in ["interpreter", "scope", "slots", "stack"]
+                ],
+                kwonlyargs=[],
+                kw_defaults=[],
+                defaults=[],
+            ),
+            body=body,
+            decorator_list=[],
+            type_params=[],
+        )
+        module = ast.Module(body=[function], type_ignores=[])
+        ast.fix_missing_locations(module)
+        namespace: dict[str, Any] = {"__builtins__": {}}
+        exec(compile(module, f"<trace {start}>", "exec"), namespace)
+        return Trace(start, end, namespace[function.name], len(self.path), self.guards)
+
+    @staticmethod
+    def name(name: str) -> ast.Name:
+        return ast.Name(id=name, ctx=ast.Load())
+
+    @staticmethod
+    def load(idx: int) -> ast.Name:
+        return ast.Name(id=f"s{idx}", ctx=ast.Load())
+
+    @staticmethod
+    def store(idx: int) -> ast.Name:
+        return ast.Name(id=f"s{idx}", ctx=ast.Store())
+
+    @staticmethod
+    def subscript(container: str, key: Any, ctx: ast.expr_context) -> ast.Subscript:
+        return ast.Subscript(
+            value=ast.Name(id=container, ctx=ast.Load()),
+            slice=ast.Constant(key),
+            ctx=ctx,
+        )
+
+    @staticmethod
+    def call(name: str, method: str, *args: ast.expr) -> ast.Call:
+        return ast.Call(
+            func=ast.Attribute(
+                value=ast.Name(id=name, ctx=ast.Load()), attr=method, ctx=ast.Load()
+            ),
+            args=list(args),
+            keywords=[],
+        )
+
+    @staticmethod
+    def binop(left: ast.expr, op: str, right: ast.expr) -> ast.BinOp:
+        # A recorded path never contains unknown operators, since recording runs them.
+        return ast.BinOp(left=left, op=BINOPS_TO_AST[op](), right=right)
+
+    def push(self, value: ast.expr) -> list[ast.stmt]:
+        self.depth += 1
+        return [ast.Assign(targets=[self.store(self.depth - 1)], value=value)]
+
+    def exit(self, ptr: int) -> list[ast.stmt]:
+        """Makes the interpreter state match the trace, and returns `ptr`."""
+        body: list[ast.stmt] = []
+        if self.popped:
+            body.append(
+                ast.Assign(
+                    targets=[
+                        ast.Attribute(
+                            value=self.name("interpreter"),
+                            attr="last_value_popped",
+                            ctx=ast.Store(),
+                        )
+                    ],
+                    value=self.name(POPPED),
+                )
+            )
+        values = ast.Tuple(
+            elts=[self.load(idx) for idx in range(self.depth)], ctx=ast.Load()
+        )
+        if self.entry_depth:
+            # The stack still holds the values it had when the trace started,
+            # so that it's left as it was if a bytecode in the trace raises.
+            target = ast.Subscript(
+                value=self.name("stack"), slice=ast.Slice(), ctx=ast.Store()
+            )
+            body.append(ast.Assign(targets=[target], value=values))
+        elif self.depth:
+            body.append(ast.Expr(value=self.call("stack", "extend", values)))
+        body.append(ast.Return(value=ast.Constant(ptr)))
+        return body
+
+    def guard(self, test: ast.expr, ptr: int) -> list[ast.stmt]:
+        """Leaves the trace at `ptr` if the test is true."""
+        self.guards += 1
+        return [ast.If(test=test, body=self.exit(ptr), orelse=[])]
+
+    def lower_push(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        return self.push(ast.Constant(bc.value))
+
+    def lower_pop(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        self.depth -= 1
+        self.popped = True
+        return [
+            ast.Assign(
+                targets=[ast.Name(id=POPPED, ctx=ast.Store())],
+                value=self.load(self.depth),
+            )
+        ]
+
+    def lower_binop(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        self.depth -= 1
+        value = self.binop(self.load(self.depth - 1), bc.value, self.load(self.depth))
+        return [ast.Assign(targets=[self.store(self.depth - 1)], value=value)]
+
+    def lower_unaryop(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        if bc.value == "+":
+            return []
+        op = ast.USub() if bc.value == "-" else ast.Not()
+        value = ast.UnaryOp(op=op, operand=self.load(self.depth - 1))
+        return [ast.Assign(targets=[self.store(self.depth - 1)], value=value)]
+
+    def lower_save(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        self.depth -= 1
+        target = self.subscript("scope", bc.value, ast.Store())
+        return [ast.Assign(targets=[target], value=self.load(self.depth))]
+
+    def lower_load(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        return self.push(self.subscript("scope", bc.value, ast.Load()))
+
+    def lower_copy(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        return self.push(self.load(self.depth - 1))
+
+    def lower_save_slot(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        self.depth -= 1
+        target = self.subscript("slots", bc.value, ast.Store())
+        return [ast.Assign(targets=[target], value=self.load(self.depth))]
+
+    def lower_load_slot(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        return self.push(self.subscript("slots", bc.value, ast.Load()))
+
+    def lower_load_push_binop(
+        self, bc: Bytecode, ptr: int, jumped: bool
+    ) -> list[ast.stmt]:
+        name, constant, op = bc.value
+        left = self.subscript("scope", name, ast.Load())
+        return self.push(self.binop(left, op, ast.Constant(constant)))
+
+    def lower_load_load_binop(
+        self, bc: Bytecode, ptr: int, jumped: bool
+    ) -> list[ast.stmt]:
+        left, right, op = bc.value
+        return self.push(
+            self.binop(
+                self.subscript("scope", left, ast.Load()),
+                op,
+                self.subscript("scope", right, ast.Load()),
+            )
+        )
+
+    def lower_push_binop(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        constant, op = bc.value
+        value = self.binop(self.load(self.depth - 1), op, ast.Constant(constant))
+        return [ast.Assign(targets=[self.store(self.depth - 1)], value=value)]
+
+    def lower_binop_save(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        op, name = bc.value
+        self.depth -= 2
+        value = self.binop(self.load(self.depth), op, self.load(self.depth + 1))
+        target = self.subscript("scope", name, ast.Store())
+        return [ast.Assign(targets=[target], value=value)]
+
+    def lower_copy_save(self, bc: Bytecode, ptr: int, jumped: bool) -> list[ast.stmt]:
+        target = self.subscript("scope", bc.value[0], ast.Store())
+        return [ast.Assign(targets=[target], value=self.load(self.depth - 1))]
+
+    def lower_pop_jump_if_false(
+        self, bc: Bytecode, ptr: int, jumped: bool
+    ) -> list[ast.stmt]:
+        # The guard fails if the value doesn't lead to where the trace went.
+        test = self.load(self.depth - 1)
+        guard = self.guard(test if jumped else ast.UnaryOp(ast.Not(), test), ptr)
+        self.depth -= 1
+        return guard
+
+    def lower_pop_jump_if_true(
+        self, bc: Bytecode, ptr: int, jumped: bool
+    ) -> list[ast.stmt]:
+        test = self.load(self.depth - 1)
+        guard = self.guard(ast.UnaryOp(ast.Not(), test) if jumped else test, ptr)
+        self.depth -= 1
+        return guard
+
+    def lower_jump_forward(
+        self, bc: Bytecode, ptr: int, jumped: bool
+    ) -> list[ast.stmt]:
+        return []
+
+    def lower_jump_if_false_or_pop(
+        self, bc: Bytecode, ptr: int, jumped: bool
+    ) -> list[ast.stmt]:
+        test = self.load(self.depth - 1)
+        guard = self.guard(test if jumped else ast.UnaryOp(ast.Not(), test), ptr)
+        return guard if jumped else guard + self.lower_pop(bc, ptr, jumped)
+
+    def lower_jump_if_true_or_pop(
+        self, bc: Bytecode, ptr: int, jumped: bool
+    ) -> list[ast.stmt]:
+        test = self.load(self.depth - 1)
+        guard = self.guard(ast.UnaryOp(ast.Not(), test) if jumped else test, ptr)
+        return guard if jumped else guard + self.lower_pop(bc, ptr, jumped)
+
+
+class TracingInterpreter(Interpreter):
+    """Runs the fast loop, replacing hot paths with compiled traces.
+
+    Every position where `run_fast` starts, or where a trace leaves off, is
+    counted. Once a position has been counted more than `threshold` times,
+    the next run from there records the path that execution takes, for up to
+    `max_trace_length` bytecodes, and compiles it into a trace. From then on,
+    runs from that position call the trace instead. When a guard of the trace
+    fails, the interpreter executes the jump that failed and carries on from
+    there, so the other side of a branch can become hot and get its own trace.
+
+    A trace whose guards have failed more than `max_guard_failures` times, in
+    more than half of its runs, is dropped and its position is never traced
+    again. Leaving the trace and going back to the interpreter costs more than
+    the trace saves, and tracing the position again would cost a compilation
+    without making the guards fail any less.
+
+    A bytecode that raises inside a trace leaves the stack and `ptr` as they
+    were when the trace started.
+    """
+
+    def __init__(
+        self,
+        bytecode: list[Bytecode],
+        slot_names: list[str] | None = None,
+        threshold: int = TRACE_THRESHOLD,
+        max_trace_length: int = MAX_TRACE_LENGTH,
+        max_guard_failures: int = MAX_GUARD_FAILURES,
+    ) -> None:
+        super().__init__(bytecode, fast=True, slot_names=slot_names)
+        self.threshold = threshold
+        self.max_trace_length = max_trace_length
+        self.max_guard_failures = max_guard_failures
+        self.traces: dict[int, Trace] = {}
+        self.counters: dict[int, int] = {}
+        self.dropped: set[int] = set()
+        """The positions whose traces were dropped, which are never traced again."""
+        self.stats = TracingStats()
+        self.untraced_time: dict[int, tuple[float, int]] = {}
+        """Total time and number of runs that used no traces, by starting position."""
+
+    def run_fast(self) -> None:
+        entry = self.ptr
+        started = time.perf_counter()
+        traced = False
+        code = self.threaded_code
+        stack = self.stack.stack
+        while self.ptr < len(code):
+            ptr = self.ptr
+            trace = self.traces.get(ptr, None)
+            if trace is not None:
+                traced = True
+                self.ptr = trace.function(self, self._scope, self.slots, stack)
+                trace.runs += 1
+                self.stats.trace_runs += 1
+                if self.ptr != trace.end:
+                    trace.guard_failures += 1
+                    self.stats.guard_failures += 1
+                    if (
+                        trace.guard_failures > self.max_guard_failures
+                        and 2 * trace.guard_failures > trace.runs
+                    ):
+                        del self.traces[ptr]
+                        self.dropped.add(ptr)
+                        self.stats.traces_dropped += 1
+                    handler, value = code[self.ptr]
+                    self.ptr = handler(stack, value, self.ptr)
+                continue
+
+            self.counters[ptr] = self.counters.get(ptr, 0) + 1
+            if self.counters[ptr] > self.threshold and ptr not in self.dropped:
+                traced = True
+                self.record()
+            elif self.traces:
+                self.run_until_trace()
+            else:
+                super().run_fast()
+        elapsed = time.perf_counter() - started
+
+        # Runs that record traces count too, so that the time saved is net
+        # of the time spent recording and compiling.
+        total, runs = self.untraced_time.get(entry, (0.0, 0))
+        if not traced:
+            self.untraced_time[entry] = (total + elapsed, runs + 1)
+        elif runs:
+            self.stats.time_saved += total / runs - elapsed
+
+    def run_until_trace(self) -> None:
+        """Runs the fast loop until the end or until a position where a trace starts."""
+        code = self.threaded_code
+        stack = self.stack.stack
+        traces = self.traces
+        ptr = self.ptr
+        end = len(code)
+        try:
+            while ptr < end:
+                handler, value = code[ptr]
+                ptr = handler(stack, value, ptr)
+                if ptr in traces:
+                    break
+        finally:
+            self.ptr = ptr
+
+    def record(self) -> None:
+        """Runs the fast loop from `ptr`, recording the path in traces.
+
+        Recording goes on until the end or until a position where a trace
+        starts, and the path is split into traces of up to `max_trace_length`
+        bytecodes, each leading into the next one.
+        """
+        code = self.threaded_code
+        stack = self.stack.stack
+        ptr = self.ptr
+        end = len(code)
+        while ptr < end and ptr not in self.traces:
+            start = ptr
+            depth = len(stack)
+            path: list[tuple[int, int]] = []
+            try:
+                while ptr < end and len(path) < self.max_trace_length:
+                    handler, value = code[ptr]
+                    next_ptr = handler(stack, value, ptr)
+                    path.append((ptr, next_ptr))
+                    ptr = next_ptr
+                    if ptr in self.traces:
+                        break
+            finally:
+                self.ptr = ptr
+
+            compiler = TraceCompiler(self.bytecode, path, depth)
+            self.traces[start] = compiler.compile(start)
+            self.stats.traces_compiled += 1
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .tokenizer import Tokenizer
+    from .parser import Parser
+    from .compiler import Compiler
+
+    code = sys.argv[1]
+    tree = Parser(Tokenizer(code)).parse()
+    bytecode = list(Compiler(tree).compile())
+    interpreter = TracingInterpreter(bytecode, threshold=0)
+    interpreter.run_fast()
+    interpreter.ptr = 0
+    interpreter.interpret()
+    print(interpreter.stats)
@@ -0,0 +1,242 @@
+from dataclasses import dataclass
+from typing import Any
+
+from .compiler import Bytecode, BytecodeType, JUMP_TYPES, OPCODES
+from .interpreter import Interpreter, resolve_operators
+
+type StackEffect = tuple[int, int]
+"""How many values a bytecode pops from the stack and how many it pushes."""
+
+STACK_EFFECTS: dict[BytecodeType, StackEffect] = {
+    BytecodeType.BINOP: (2, 1),
+    BytecodeType.UNARYOP: (1, 1),
+    BytecodeType.PUSH: (0, 1),
+    BytecodeType.POP: (1, 0),
+    BytecodeType.SAVE: (1, 0),
+    BytecodeType.LOAD: (0, 1),
+    BytecodeType.COPY: (1, 2),
+    BytecodeType.POP_JUMP_IF_FALSE: (1, 0),
+    BytecodeType.POP_JUMP_IF_TRUE: (1, 0),
+    BytecodeType.JUMP_FORWARD: (0, 0),
+    BytecodeType.JUMP_IF_FALSE_OR_POP: (1, 0),
+    BytecodeType.JUMP_IF_TRUE_OR_POP: (1, 0),
+    BytecodeType.SAVE_SLOT: (1, 0),
+    BytecodeType.LOAD_SLOT: (0, 1),
+    BytecodeType.LOAD_PUSH_BINOP: (0, 1),
+    BytecodeType.LOAD_LOAD_BINOP: (0, 1),
+    BytecodeType.PUSH_BINOP: (1, 1),
+    BytecodeType.BINOP_SAVE: (2, 0),
+    BytecodeType.COPY_SAVE: (1, 1),
+}
+"""The stack effect of each bytecode when execution moves on to the next one."""
+
+JUMP_STACK_EFFECTS: dict[BytecodeType, StackEffect] = {
+    BytecodeType.POP_JUMP_IF_FALSE: (1, 0),
+    BytecodeType.POP_JUMP_IF_TRUE: (1, 0),
+    BytecodeType.JUMP_FORWARD: (0, 0),
+    BytecodeType.JUMP_IF_FALSE_OR_POP: (1, 1),
+    BytecodeType.JUMP_IF_TRUE_OR_POP: (1, 1),
+}
+"""The stack effect of each jump when it is taken."""
+
+
+@dataclass
+class VerifiedBytecode:
+    """Bytecode that passed verification, together with its maximum stack depth."""
+
+    bytecode: list[Bytecode]
+    max_stack_depth: int
+
+
+def verify(bytecode: list[Bytecode]) -> VerifiedBytecode:
+    """Checks that the bytecode is well-formed and computes its maximum stack depth.
+
+    Every path through the bytecode is followed, including both sides of each
+    conditional jump. The bytecode is rejected if a jump goes out of range, if
+    a bytecode pops from a stack that is too shallow, if two paths reach the
+    same bytecode with different stack depths, or if the program can end with
+    values left on the stack.
+    """
+    end = len(bytecode)
+    depths: list[int | None] = [None] * (end + 1)
+    depths[0] = 0
+    max_stack_depth = 0
+    worklist = [0]
+
+    while worklist:
+        ptr = worklist.pop()
+        if ptr == end:
+            continue
+        depth = depths[ptr]
+        assert depth is not None
+        bc = bytecode[ptr]
+        if bc.type not in STACK_EFFECTS:
+            raise RuntimeError(f"Can't verify {bc.type.value}.")
+
+        successors: list[tuple[int, StackEffect]] = []
+        if bc.type in JUMP_TYPES:
+            target = ptr + bc.value if isinstance(bc.value, int) else -1
+            if not 0 <= target <= end:
+                raise RuntimeError(f"Jump at {ptr} goes out of range.")
+            successors.append((target, JUMP_STACK_EFFECTS[bc.type]))
+        if bc.type != BytecodeType.JUMP_FORWARD:
+            successors.append((ptr + 1, STACK_EFFECTS[bc.type]))
+
+        for successor, (pops, pushes) in successors:
+            if depth < pops:
+                raise RuntimeError(f"Stack underflow at {ptr}.")
+            new_depth = depth - pops + pushes
+            max_stack_depth = max(max_stack_depth, new_depth)
+            if depths[successor] is None:
+                depths[successor] = new_depth
+                worklist.append(successor)
+            elif depths[successor] != new_depth:
+                raise RuntimeError(f"Inconsistent stack depth at {successor}.")
+
+    if depths[end] not in {None, 0}:
+        raise RuntimeError(f"Program ends with {depths[end]} values on the stack.")
+    return VerifiedBytecode(bytecode, max_stack_depth)
+
+
+class VerifiedInterpreter(Interpreter):
+    """Runs verified bytecode on a preallocated stack.
+
+    Because verification guarantees that the stack never overflows its maximum
+    depth nor underflows, the stack is a fixed-size list indexed by an integer
+    stack pointer and the bytecodes are executed inline, in a single loop.
+    Binary operators and jump targets are resolved before running.
+    """
+
+    def __init__(
+        self, verified: VerifiedBytecode, slot_names: list[str] | None = None
+    ) -> None:
+        super().__init__(verified.bytecode, slot_names=slot_names)
+        self.max_stack_depth = verified.max_stack_depth
+        self.code: list[tuple[int, Any]] = []
+        for ptr, bc in enumerate(verified.bytecode):
+            value = resolve_operators(bc.type, bc.value)
+            if bc.type in JUMP_TYPES:
+                value = ptr + value
+            self.code.append((OPCODES[bc.type], value))
+
+    def run(self) -> None:
+        BINOP = OPCODES[BytecodeType.BINOP]
+        UNARYOP = OPCODES[BytecodeType.UNARYOP]
+        PUSH = OPCODES[BytecodeType.PUSH]
+        POP = OPCODES[BytecodeType.POP]
+        SAVE = OPCODES[BytecodeType.SAVE]
+        LOAD = OPCODES[BytecodeType.LOAD]
+        COPY = OPCODES[BytecodeType.COPY]
+        POP_JUMP_IF_FALSE = OPCODES[BytecodeType.POP_JUMP_IF_FALSE]
+        POP_JUMP_IF_TRUE = OPCODES[BytecodeType.POP_JUMP_IF_TRUE]
+        JUMP_FORWARD = OPCODES[BytecodeType.JUMP_FORWARD]
+        JUMP_IF_FALSE_OR_POP = OPCODES[BytecodeType.JUMP_IF_FALSE_OR_POP]
+        JUMP_IF_TRUE_OR_POP = OPCODES[BytecodeType.JUMP_IF_TRUE_OR_POP]
+        SAVE_SLOT = OPCODES[BytecodeType.SAVE_SLOT]
+        LOAD_SLOT = OPCODES[BytecodeType.LOAD_SLOT]
+        LOAD_PUSH_BINOP = OPCODES[BytecodeType.LOAD_PUSH_BINOP]
+        LOAD_LOAD_BINOP = OPCODES[BytecodeType.LOAD_LOAD_BINOP]
+        PUSH_BINOP = OPCODES[BytecodeType.PUSH_BINOP]
+        BINOP_SAVE = OPCODES[BytecodeType.BINOP_SAVE]
+        COPY_SAVE = OPCODES[BytecodeType.COPY_SAVE]
+
+        code = self.code
+        scope = self._scope
+        slots = self.slots
+        stack: list[Any] = [None] * self.max_stack_depth
+        sp = 0
+        ptr = self.ptr
+        end = len(code)
+        try:
+            while ptr < end:
+                opcode, value = code[ptr]
+                ptr += 1
+                if opcode == LOAD_SLOT:
+                    stack[sp] = slots[value]
+                    sp += 1
+                elif opcode == LOAD:
+                    stack[sp] = scope[value]
+                    sp += 1
+                elif opcode == PUSH:
+                    stack[sp] = value
+                    sp += 1
+                elif opcode == BINOP:
+                    sp -= 1
+                    stack[sp - 1] = value(stack[sp - 1], stack[sp])
+                elif opcode == SAVE_SLOT:
+                    sp -= 1
+                    slots[value] = stack[sp]
+                elif opcode == SAVE:
+                    sp -= 1
+                    scope[value] = stack[sp]
+                elif opcode == POP:
+                    sp -= 1
+                    self.last_value_popped = stack[sp]
+                elif opcode == COPY:
+                    stack[sp] = stack[sp - 1]
+                    sp += 1
+                elif opcode == POP_JUMP_IF_FALSE:
+                    sp -= 1
+                    if not stack[sp]:
+                        ptr = value
+                elif opcode == POP_JUMP_IF_TRUE:
+                    sp -= 1
+                    if stack[sp]:
+                        ptr = value
+                elif opcode == JUMP_FORWARD:
+                    ptr = value
+                elif opcode == JUMP_IF_FALSE_OR_POP:
+                    if not stack[sp - 1]:
+                        ptr = value
+                    else:
+                        sp -= 1
+                        self.last_value_popped = stack[sp]
+                elif opcode == JUMP_IF_TRUE_OR_POP:
+                    if stack[sp - 1]:
+                        ptr = value
+                    else:
+                        sp -= 1
+                        self.last_value_popped = stack[sp]
+                elif opcode == UNARYOP:
+                    if value == "-":
+                        stack[sp - 1] = -stack[sp - 1]
+                    elif value == "not":
+                        stack[sp - 1] = not stack[sp - 1]
+                    elif value != "+":
+                        raise RuntimeError(f"Unknown operator {value}.")
+                elif opcode == LOAD_PUSH_BINOP:
+                    name, constant, function = value
+                    stack[sp] = function(scope[name], constant)
+                    sp += 1
+                elif opcode == LOAD_LOAD_BINOP:
+                    left, right, function = value
+                    stack[sp] = function(scope[left], scope[right])
+                    sp += 1
+                elif opcode == PUSH_BINOP:
+                    constant, function = value
+                    stack[sp - 1] = function(stack[sp - 1], constant)
+                elif opcode == BINOP_SAVE:
+                    function, name = value
+                    sp -= 2
+                    scope[name] = function(stack[sp], stack[sp + 1])
+                elif opcode == COPY_SAVE:
+                    scope[value[0]] = stack[sp - 1]
+                else:
+                    raise RuntimeError(f"Can't interpret {list(OPCODES)[opcode]}.")
+        finally:
+            self.ptr = ptr
+            self.stack.stack[:] = stack[:sp]
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .tokenizer import Tokenizer
+    from .parser import Parser
+    from .compiler import Compiler
+
+    code = sys.argv[1]
+    tree = Parser(Tokenizer(code)).parse()
+    verified = verify(list(Compiler(tree).compile()))
+    print(f"Maximum stack depth: {verified.max_stack_depth}")
+    VerifiedInterpreter(verified).interpret()
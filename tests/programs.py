@@ -0,0 +1,111 @@
+"""Random programs, and helpers to run and compare the backends, for the tests."""
+
+import random
+from typing import Any, Iterable
+
+from python.tokenizer import Token, Tokenizer
+from python.parser import Parser
+from python.compiler import Bytecode, Compiler
+from python.interpreter import Interpreter
+
+NAMES = ["a", "b", "c"]
+CONSTANTS = ["0", "1", "2", "3.5", "True", "False"]
+OPERATORS = ["+", "-", "*"]
+"""The arithmetic operators that can't fail on the constants and their results."""
+
+
+def random_expr(
+    rng: random.Random,
+    operators: list[str] = OPERATORS,
+    parenthesize: bool = True,
+    depth: int = 0,
+) -> str:
+    """A random expression with the names, the constants, and the operators.
+
+    Every operation is in parentheses, so the expression can't be parsed with
+    the wrong precedence, unless `parenthesize` is false, which leaves out most
+    of them and can give code that doesn't parse.
+    """
+    if depth > 3 or rng.random() < 0.3:
+        return rng.choice(NAMES + CONSTANTS)
+    left = random_expr(rng, operators, parenthesize, depth + 1)
+    right = random_expr(rng, operators, parenthesize, depth + 1)
+    kind = rng.choice(["binop", "binop", "unary", "not", "and", "or"])
+    if kind == "binop":
+        expr = f"{left} {rng.choice(operators)} {right}"
+    elif kind == "unary":
+        expr = f"{rng.choice(['+', '-'])}{left}"
+    elif kind == "not":
+        expr = f"not {left}"
+    else:
+        expr = f"{left} {kind} {right}"
+    return f"({expr})" if parenthesize or rng.random() < 0.2 else expr
+
+
+def random_block(rng: random.Random, statements: int, depth: int = 0) -> list[str]:
+    """The lines of random statements, including nested conditionals."""
+    indent = "    " * depth
+    lines = []
+    for _ in range(statements):
+        kind = rng.random()
+        if kind < 0.35:
+            targets = " = ".join(rng.sample(NAMES, rng.randint(1, 3)))
+            lines.append(f"{indent}{targets} = {random_expr(rng)}")
+        elif kind < 0.6 or depth > 2:
+            lines.append(f"{indent}{random_expr(rng)}")
+        else:
+            lines.append(f"{indent}if {random_expr(rng)}:")
+            lines.extend(random_block(rng, rng.randint(1, 3), depth + 1))
+            if rng.random() < 0.5:
+                lines.append(f"{indent}elif {random_expr(rng)}:")
+                lines.extend(random_block(rng, rng.randint(1, 3), depth + 1))
+            if rng.random() < 0.5:
+                lines.append(f"{indent}else:")
+                lines.extend(random_block(rng, rng.randint(1, 3), depth + 1))
+    return lines
+
+
+def random_program(rng: random.Random, statements: int) -> str:
+    """A random program that assigns every name before the random statements."""
+    lines = [f"{name} = {rng.randint(0, 2)}" for name in NAMES]
+    return "\n".join(lines + random_block(rng, statements))
+
+
+def tokenize_or_fail(tokens: Iterable[Token]) -> tuple[list[Token], str | None]:
+    """Returns the tokens produced before an error, and the error message if any."""
+    produced: list[Token] = []
+    try:
+        for token in tokens:
+            produced.append(token)
+    except RuntimeError as error:
+        return produced, str(error)
+    return produced, None
+
+
+def run(interpreter: Interpreter) -> Interpreter:
+    """Runs the interpreter with the loop it was set up for."""
+    if interpreter.fast:
+        interpreter.run_fast()
+    else:
+        interpreter.run()
+    return interpreter
+
+
+def compile_code(code: str, optimization_level: int = 0) -> list[Bytecode]:
+    """Compiles the code to bytecode for the stack VM."""
+    tree = Parser(Tokenizer(code)).parse()
+    return list(Compiler(tree, optimization_level).compile())
+
+
+def run_code(code: str, optimization_level: int = 0) -> Interpreter:
+    """Runs the code on the stack VM, which the other backends are compared with."""
+    return run(Interpreter(compile_code(code, optimization_level)))
+
+
+def assert_same_results(actual: Any, expected: Interpreter) -> None:
+    """Checks that a backend ends with the same scope and last value and types."""
+    assert actual.scope == expected.scope
+    assert actual.last_value_popped == expected.last_value_popped
+    assert type(actual.last_value_popped) is type(expected.last_value_popped)
+    for name, value in expected.scope.items():
+        assert type(actual.scope[name]) is type(value)
@@ -1,5 +1,6 @@
 import pytest
 
+from python.tokenizer import Tokenizer
 from python.compiler import Bytecode, BytecodeType, Compiler
 from python.parser import (
     Assignment,
@@ -11,6 +12,7 @@ from python.parser import (
     ExprStatement,
     Program,
     UnaryOp,
+    Parser,
     Variable,
 )
 
@@ -804,3 +806,100 @@ def test_compile_if_elif_elif_elif_else():
         Bytecode(BytecodeType.LOAD, "f"),
         Bytecode(BytecodeType.POP),
     ]
+
+
+def test_compile_long_boolean_chain():
+    terms = 10_000
+    tree = BoolOp("or", [Variable(f"x{idx}") for idx in range(terms)])
+    bytecode = list(Compiler(tree).compile())
+    assert len(bytecode) == 4 * terms - 3
+    for ptr, bc in enumerate(bytecode):
+        if bc.type == BytecodeType.POP_JUMP_IF_TRUE:
+            assert ptr + bc.value == len(bytecode)
+
+
+def test_compile_long_elif_chain():
+    arms = 5_000
+    tree: Conditional | Body | None = None
+    for idx in reversed(range(arms)):
+        orelse = None if tree is None else Body([tree])
+        tree = Conditional(
+            Variable(f"x{idx}"),
+            Body([Assignment([Variable("a")], Constant(idx))]),
+            orelse,
+        )
+    assert tree is not None
+    bytecode = list(Compiler(tree).compile())
+    assert len(bytecode) == 5 * arms - 1
+    for ptr, bc in enumerate(bytecode):
+        if bc.type == BytecodeType.JUMP_FORWARD:
+            assert ptr + bc.value == len(bytecode)
+        elif bc.type == BytecodeType.POP_JUMP_IF_FALSE:
+            next_arm = ptr + bc.value
+            assert (
+                next_arm == len(bytecode)
+                or bytecode[next_arm].type == BytecodeType.LOAD
+            )
+
+
+def test_compile_with_slots():
+    tree = Program(
+        [
+            Assignment([Variable("a"), Variable("b")], Constant(3)),
+            Assignment([Variable("c")], BinOp("+", Variable("b"), Variable("a"))),
+        ]
+    )
+    compiler = Compiler(tree, slots=True)
+    assert list(compiler.compile()) == [
+        Bytecode(BytecodeType.PUSH, 3),
+        Bytecode(BytecodeType.COPY),
+        Bytecode(BytecodeType.SAVE_SLOT, 0),
+        Bytecode(BytecodeType.SAVE_SLOT, 1),
+        Bytecode(BytecodeType.LOAD_SLOT, 1),
+        Bytecode(BytecodeType.LOAD_SLOT, 0),
+        Bytecode(BytecodeType.BINOP, "+"),
+        Bytecode(BytecodeType.SAVE_SLOT, 2),
+    ]
+    assert compiler.slot_names == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "a",
+        "a = a",
+        "a = 1\nb = a + c\nc = 2",
+        "if a:\n    b = 1\nb",
+        "a = 1\nif a:\n    b = 1\nelif a:\n    c = 1\nelse:\n    b = 1\nb",
+        "a = 1\nif a:\n    b = 1\nelse:\n    c = 1\nc",
+    ],
+)
+def test_compile_with_slots_rejects_unassigned_variables(code: str):
+    tree = Parser(list(Tokenizer(code))).parse()
+    with pytest.raises(RuntimeError):
+        list(Compiler(tree, slots=True).compile())
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "a = 1\nif a:\n    b = 1\nelse:\n    b = 2\nb",
+        "a = 1\nif a:\n    b = 1\nelif a:\n    b = 2\nelse:\n    b = 3\nb",
+        "a = 1\nif a:\n    b = 1\n    c = b\nelse:\n    b = 1\n"
+        "    if a:\n        c = b\n    else:\n        c = 2\nc",
+    ],
+)
+def test_compile_with_slots_accepts_definitely_assigned_variables(code: str):
+    tree = Parser(list(Tokenizer(code))).parse()
+    list(Compiler(tree, slots=True).compile())
+
+
+def test_compile_with_slots_after_pruning_branches():
+    tree = Parser(list(Tokenizer("if True:\n    a = 1\na"))).parse()
+    compiler = Compiler(tree, optimization_level=1, slots=True)
+    assert list(compiler.compile()) == [
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.SAVE_SLOT, 0),
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.POP),
+    ]
@@ -0,0 +1,174 @@
+import io
+import sys
+from contextlib import redirect_stdout
+from typing import Callable
+
+from python.tokenizer import Token, Tokenizer, TokenType
+from python.parser import (
+    BinOp,
+    BoolOp,
+    Conditional,
+    Constant,
+    Expr,
+    Parser,
+    UnaryOp,
+    print_ast,
+)
+from python.compiler import Bytecode, BytecodeType, Compiler
+from python.interpreter import Interpreter
+
+import pytest
+
+DEPTH = 100_000
+
+
+def nested_ifs(depth: int) -> list[Token]:
+    """Tokens for `depth` nested `if x:` blocks, whose code is quadratic in size."""
+    tokens: list[Token] = []
+    for _ in range(depth):
+        tokens.extend(
+            [
+                Token(TokenType.IF),
+                Token(TokenType.NAME, "x"),
+                Token(TokenType.COLON),
+                Token(TokenType.NEWLINE),
+                Token(TokenType.INDENT),
+            ]
+        )
+    tokens.extend(
+        [
+            Token(TokenType.NAME, "a"),
+            Token(TokenType.ASSIGN),
+            Token(TokenType.INT, depth),
+            Token(TokenType.NEWLINE),
+        ]
+    )
+    tokens.extend(Token(TokenType.DEDENT) for _ in range(depth))
+    tokens.append(Token(TokenType.EOF))
+    return tokens
+
+
+def expression_depth(expr: Expr) -> int:
+    """How many operators are nested on the longest path down the expression."""
+    depth = 0
+    pending = [(expr, 0)]
+    while pending:
+        expr, level = pending.pop()
+        depth = max(depth, level)
+        if isinstance(expr, UnaryOp):
+            pending.append((expr.value, level + 1))
+        elif isinstance(expr, BinOp):
+            pending.extend([(expr.left, level + 1), (expr.right, level + 1)])
+        elif isinstance(expr, BoolOp):
+            pending.extend((value, level + 1) for value in expr.values)
+    return depth
+
+
+def run(bytecode: list[Bytecode], **scope: object) -> Interpreter:
+    interpreter = Interpreter(bytecode, fast=True)
+    interpreter.scope = scope
+    interpreter.run_fast()
+    return interpreter
+
+
+@pytest.mark.parametrize(
+    ["code", "depth", "result"],
+    [
+        ("(" * DEPTH + "1" + ")" * DEPTH, 0, 1),
+        ("-" * DEPTH + "1", DEPTH, 1),
+        ("- " * (DEPTH + 1) + "1", DEPTH + 1, -1),
+        ("not " * DEPTH + "0", DEPTH, False),
+        (" ** ".join(["1"] * (DEPTH + 1)), DEPTH, 1),
+        (" - ".join(["1"] * (DEPTH + 1)), DEPTH, 1 - DEPTH),
+        ("(" * DEPTH + "1" + " + 1)" * DEPTH, DEPTH, DEPTH + 1),
+        ("-(" * DEPTH + "1" + ")" * DEPTH, DEPTH, 1),
+        ("(not " * DEPTH + "1" + ")" * DEPTH, DEPTH, True),
+        ("(1 and " * DEPTH + "2" + ")" * DEPTH, DEPTH, 2),
+    ],
+    ids=[
+        "parentheses",
+        "negations",
+        "spaced negations",
+        "nots",
+        "powers",
+        "subtractions",
+        "left additions",
+        "negated parentheses",
+        "parenthesised nots",
+        "ands",
+    ],
+)
+def test_deeply_nested_expressions(code: str, depth: int, result: object):
+    tree = Parser(list(Tokenizer(code))).parse()
+    assert expression_depth(tree.statements[0].expr) == depth
+    assert run(list(Compiler(tree).compile())).last_value_popped == result
+
+
+def test_deeply_nested_conditionals():
+    tree = Parser(nested_ifs(DEPTH)).parse()
+    conditional = tree.statements[0]
+    for _ in range(DEPTH - 1):
+        assert isinstance(conditional, Conditional)
+        conditional = conditional.body.statements[0]
+
+    bytecode = list(Compiler(tree).compile())
+    assert len(bytecode) == 2 * DEPTH + 2
+    assert bytecode[-1].type == BytecodeType.SAVE
+    assert run(bytecode, x=1).scope == {"x": 1, "a": DEPTH}
+    assert run(bytecode, x=0).scope == {"x": 0}
+
+
+def test_long_elif_chains():
+    code = "if x:\n    a = 0\n" + "elif x:\n    a = 1\n" * DEPTH + "else:\n    a = 2\n"
+    bytecode = list(Compiler(Parser(list(Tokenizer(code))).parse()).compile())
+    assert run(bytecode, x=1).scope["a"] == 0
+    assert run(bytecode, x=0).scope["a"] == 2
+
+
+def test_print_ast_deeper_than_the_recursion_limit():
+    depth = 2 * sys.getrecursionlimit()
+    tree = Parser(list(Tokenizer("-" * depth + "1"))).parse()
+    output = io.StringIO()
+    with redirect_stdout(output):
+        print_ast(tree)
+    lines = output.getvalue().splitlines()
+    # `UnaryOp(`, `op='-',`, and `)` per level, plus the statement and the program.
+    assert len(lines) == 3 * depth + 7
+    assert lines[-1] == ")"
+    assert lines[3 + 2 * depth].strip() == "value=Constant(1),"
+
+
+def count_calls_to_parse_and_compile(
+    make_tokens: Callable[[int], list[Token]], depth: int
+) -> int:
+    """How many functions, Python or built-in, parsing and compiling calls."""
+    tokens = make_tokens(depth)
+    calls = 0
+
+    def profile(frame: object, event: str, arg: object) -> None:
+        nonlocal calls
+        if event in ("call", "c_call"):
+            calls += 1
+
+    sys.setprofile(profile)
+    try:
+        list(Compiler(Parser(tokens).parse()).compile())
+    finally:
+        sys.setprofile(None)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "make_tokens",
+    [
+        lambda depth: list(Tokenizer("(" * depth + "1" + " * 2)" * depth)),
+        lambda depth: list(Tokenizer("-(not " * depth + "1" + ")" * depth)),
+        nested_ifs,
+    ],
+    ids=["products", "negated nots", "conditionals"],
+)
+def test_nesting_takes_linear_time(make_tokens: Callable[[int], list[Token]]):
+    small = count_calls_to_parse_and_compile(make_tokens, 1_000)
+    large = count_calls_to_parse_and_compile(make_tokens, 4_000)
+    # Linear time would make 4 times as many calls and quadratic time 16 times.
+    assert large < 5 * small
@@ -1,35 +1,67 @@
+from functools import partial
 from itertools import product
-from typing import Any
+from typing import Any, Callable
 
 from python.tokenizer import Tokenizer
 from python.parser import Parser
-from python.compiler import BytecodeType, Compiler
-from python.interpreter import Interpreter
+from python.compiler import Bytecode, BytecodeType, Compiler, JUMP_TYPES
+from python.interpreter import Interpreter, UNBOUND
+from python.threaded import ClosureInterpreter
+from python.packed import PackedInterpreter, pack
+from python.verifier import VerifiedInterpreter, verify
 
 import pytest
 
+from programs import run
+
+type MakeInterpreter = Callable[..., Interpreter]
+
+BACKENDS: dict[str, MakeInterpreter] = {
+    "interpreter": Interpreter,
+    "fast": partial(Interpreter, fast=True),
+    "adaptive": partial(Interpreter, adaptive=True),
+    "closures": ClosureInterpreter,
+    "packed": lambda bytecode, **kwargs: PackedInterpreter(pack(bytecode), **kwargs),
+    "verified": lambda bytecode, **kwargs: VerifiedInterpreter(
+        verify(bytecode), **kwargs
+    ),
+}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def make_interpreter(request: pytest.FixtureRequest) -> MakeInterpreter:
+    """Runs the tests that use it against every execution backend."""
+    return BACKENDS[request.param]
+
 
 def test_all_bytecode_types_can_be_interpreted():
     for bct in BytecodeType:
         name = bct.value
         assert hasattr(Interpreter, f"interpret_{name}")
+        assert hasattr(Interpreter, f"fast_{name}")
+
+
+def test_all_bytecode_types_can_be_threaded():
+    for bct in BytecodeType:
+        name = bct.value
+        assert bct in JUMP_TYPES or hasattr(ClosureInterpreter, f"build_{name}")
 
 
-def _run(code: str) -> Interpreter:
+def _run(code: str, make_interpreter: MakeInterpreter) -> Interpreter:
     tokens = list(Tokenizer(code))
     tree = Parser(tokens).parse()
     bytecode = list(Compiler(tree).compile())
-    interpreter = Interpreter(bytecode)
+    interpreter = make_interpreter(bytecode)
     interpreter.interpret()
     return interpreter
 
 
-def run_expr(code: str) -> Any:
-    return _run(code).last_value_popped
+def run_expr(code: str, make_interpreter: MakeInterpreter) -> Any:
+    return _run(code, make_interpreter).last_value_popped
 
 
-def run_get_scope(code: str) -> dict[str, Any]:
-    return _run(code).scope
+def run_get_scope(code: str, make_interpreter: MakeInterpreter) -> dict[str, Any]:
+    return _run(code, make_interpreter).scope
 
 
 @pytest.mark.parametrize(
@@ -41,8 +73,8 @@ def run_get_scope(code: str) -> dict[str, Any]:
         ("1 - 9", -8),
     ],
 )
-def test_simple_arithmetic(code: str, result: int):
-    assert run_expr(code) == result
+def test_simple_arithmetic(code: str, result: int, make_interpreter: MakeInterpreter):
+    assert run_expr(code, make_interpreter) == result
 
 
 @pytest.mark.parametrize(
@@ -54,8 +86,10 @@ def test_simple_arithmetic(code: str, result: int):
         ("100.0625 - 9.5", 90.5625),
     ],
 )
-def test_arithmetic_with_floats(code: str, result: int):
-    assert run_expr(code) == result
+def test_arithmetic_with_floats(
+    code: str, result: int, make_interpreter: MakeInterpreter
+):
+    assert run_expr(code, make_interpreter) == result
 
 
 @pytest.mark.parametrize(
@@ -66,8 +100,10 @@ def test_arithmetic_with_floats(code: str, result: int):
         ("1 - 2 + 3 - 4 + 5 - 6", -3),
     ],
 )
-def test_sequences_of_additions_and_subtractions(code: str, result: int):
-    assert run_expr(code) == result
+def test_sequences_of_additions_and_subtractions(
+    code: str, result: int, make_interpreter: MakeInterpreter
+):
+    assert run_expr(code, make_interpreter) == result
 
 
 @pytest.mark.parametrize(
@@ -82,8 +118,8 @@ def test_sequences_of_additions_and_subtractions(code: str, result: int):
         ("--3 + --3", 6),
     ],
 )
-def test_unary_operators(code: str, result: int):
-    assert run_expr(code) == result
+def test_unary_operators(code: str, result: int, make_interpreter: MakeInterpreter):
+    assert run_expr(code, make_interpreter) == result
 
 
 @pytest.mark.parametrize(
@@ -95,8 +131,10 @@ def test_unary_operators(code: str, result: int):
         ("(2 - 3) - (5 - 6)", 0),
     ],
 )
-def test_parenthesised_expressions(code: str, result: int):
-    assert run_expr(code) == result
+def test_parenthesised_expressions(
+    code: str, result: int, make_interpreter: MakeInterpreter
+):
+    assert run_expr(code, make_interpreter) == result
 
 
 @pytest.mark.parametrize(
@@ -112,8 +150,12 @@ def test_parenthesised_expressions(code: str, result: int):
         ("5 + 4 % 9", "5 + (4 % 9)"),
     ],
 )
-def test_arithmetic_operator_precedence(code: str, correct_precedence: str):
-    assert run_expr(code) == run_expr(correct_precedence)
+def test_arithmetic_operator_precedence(
+    code: str, correct_precedence: str, make_interpreter: MakeInterpreter
+):
+    assert run_expr(code, make_interpreter) == run_expr(
+        correct_precedence, make_interpreter
+    )
 
 
 @pytest.mark.parametrize(
@@ -126,27 +168,29 @@ def test_arithmetic_operator_precedence(code: str, correct_precedence: str):
         ("2 + 3 * 4 ** 5 - 6 % 7 / 8", 3073.25),
     ],
 )
-def test_all_arithmetic_operators(code: str, result: int | float):
-    assert run_expr(code) == result
+def test_all_arithmetic_operators(
+    code: str, result: int | float, make_interpreter: MakeInterpreter
+):
+    assert run_expr(code, make_interpreter) == result
 
 
-def test_simple_assignment():
+def test_simple_assignment(make_interpreter: MakeInterpreter):
     code = "a = 3"
-    scope = run_get_scope(code)
+    scope = run_get_scope(code, make_interpreter)
     assert len(scope) == 1
     assert scope["a"] == 3
 
 
-def test_overriding_assignment():
+def test_overriding_assignment(make_interpreter: MakeInterpreter):
     code = "a = 3\na = 4\na = 5"
-    scope = run_get_scope(code)
+    scope = run_get_scope(code, make_interpreter)
     assert len(scope) == 1
     assert scope["a"] == 5
 
 
-def test_multiple_assignment_statements():
+def test_multiple_assignment_statements(make_interpreter: MakeInterpreter):
     code = "a = 1\nb = 2\na = 3\nc = 4\na = 5"
-    scope = run_get_scope(code)
+    scope = run_get_scope(code, make_interpreter)
     assert len(scope) == 3
     assert scope["a"] == 5
     assert scope["b"] == 2
@@ -161,11 +205,13 @@ def test_multiple_assignment_statements():
         ("a = b = c = 3", {"a": 3, "b": 3, "c": 3}),
     ],
 )
-def test_assignments_and_references(code: str, scope: dict[str, Any]):
-    assert scope == run_get_scope(code)
+def test_assignments_and_references(
+    code: str, scope: dict[str, Any], make_interpreter: MakeInterpreter
+):
+    assert scope == run_get_scope(code, make_interpreter)
 
 
-def test_flat_conditionals():
+def test_flat_conditionals(make_interpreter: MakeInterpreter):
     code = """
 if 1:
     a = 1
@@ -178,10 +224,10 @@ if a:
     c = 11 - 10
 """
 
-    assert run_get_scope(code) == {"a": 1, "b": 1, "c": 1}
+    assert run_get_scope(code, make_interpreter) == {"a": 1, "b": 1, "c": 1}
 
 
-def test_nested_conditionals():
+def test_nested_conditionals(make_interpreter: MakeInterpreter):
     code = """
 if 1:
     if 1:
@@ -197,10 +243,10 @@ if 1:
         c = 1
 """
 
-    assert run_get_scope(code) == {"a": 1, "b": 1}
+    assert run_get_scope(code, make_interpreter) == {"a": 1, "b": 1}
 
 
-def test_booleans():
+def test_booleans(make_interpreter: MakeInterpreter):
     code = """
 if True:
     a = 73
@@ -209,7 +255,7 @@ if False:
     b = 73
 """
 
-    assert run_get_scope(code) == {"a": 73}
+    assert run_get_scope(code, make_interpreter) == {"a": 73}
 
 
 @pytest.mark.parametrize(
@@ -225,8 +271,8 @@ if False:
         ("not not not not False", False),
     ],
 )
-def test_not(code: str, result: bool):
-    assert run_expr(code) == result
+def test_not(code: str, result: bool, make_interpreter: MakeInterpreter):
+    assert run_expr(code, make_interpreter) == result
 
 
 @pytest.mark.parametrize(
@@ -260,8 +306,8 @@ def test_not(code: str, result: bool):
         ("False or False and False", False),
     ],
 )
-def test_boolean_operators(code: str, result: bool):
-    assert run_expr(code) == result
+def test_boolean_operators(code: str, result: bool, make_interpreter: MakeInterpreter):
+    assert run_expr(code, make_interpreter) == result
 
 
 @pytest.mark.parametrize(
@@ -281,12 +327,16 @@ def test_boolean_operators(code: str, result: bool):
         ("0 or 0 or 0", 0),
     ],
 )
-def test_boolean_short_circuiting(code: str, result: int):
-    assert run_expr(code) == result
+def test_boolean_short_circuiting(
+    code: str, result: int, make_interpreter: MakeInterpreter
+):
+    assert run_expr(code, make_interpreter) == result
 
 
 @pytest.mark.parametrize(["a", "b", "c", "d"], list(product(range(2), repeat=4)))
-def test_if_elif_elif_elif_else(a: int, b: int, c: int, d: int):
+def test_if_elif_elif_elif_else(
+    a: int, b: int, c: int, d: int, make_interpreter: MakeInterpreter
+):
     code = f"""
 a = {a}
 b = {b}
@@ -324,7 +374,7 @@ y = 5
 
     values = [a, b, c, d]
     result = 0 if 1 not in values else 4 - values.index(1)
-    assert run_get_scope(code) == {
+    assert run_get_scope(code, make_interpreter) == {
         "a": -a,
         "b": -b,
         "c": -c,
@@ -332,3 +382,84 @@ y = 5
         "result": result,
         "y": 5,
     }
+
+
+@pytest.mark.parametrize("x", [0, 1, 2_500, 4_999, 5_000])
+def test_long_elif_chain(x: int, make_interpreter: MakeInterpreter):
+    arms = 5_000
+    code = f"x = {x}\nif not x:\n    a = 0\n"
+    code += "".join(f"elif not x - {idx}:\n    a = {idx}\n" for idx in range(1, arms))
+    code += "else:\n    a = -1\n"
+    assert run_get_scope(code, make_interpreter) == {"x": x, "a": x if x < arms else -1}
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "a = 3\nb = c = a * 2\na + b + c",
+        "a = 1\nif a - 1:\n    b = 2\nelse:\n    b = 3\n    c = b\nb and a",
+        "a = 0\nif a:\n    b = 1\nelif not a:\n    b = 2\nelse:\n    b = 3\nb or a",
+        "a = 2\nif a:\n    c = 5\na = a * a\na",
+    ],
+)
+def test_slots_match_scope(code: str, make_interpreter: MakeInterpreter):
+    tree = Parser(list(Tokenizer(code))).parse()
+    compiler = Compiler(tree, slots=True)
+    bytecode = list(compiler.compile())
+    interpreter = make_interpreter(bytecode, slot_names=compiler.slot_names)
+    run(interpreter)
+    expected = _run(code, make_interpreter)
+    assert interpreter.scope == expected.scope
+    assert interpreter.last_value_popped == expected.last_value_popped
+
+
+def test_slots_materialize_scope_on_demand(make_interpreter: MakeInterpreter):
+    bytecode = [
+        Bytecode(BytecodeType.PUSH, 3),
+        Bytecode(BytecodeType.SAVE_SLOT, 1),
+    ]
+    interpreter = make_interpreter(bytecode, slot_names=["a", "b"])
+    interpreter.scope = {"a": 1, "c": 2}
+    assert interpreter.slots == [1, UNBOUND]
+    run(interpreter)
+    assert interpreter.slots == [1, 3]
+    assert interpreter.scope == {"a": 1, "b": 3, "c": 2}
+
+
+@pytest.mark.parametrize("optimization_level", [0, 3])
+def test_scope_can_be_replaced_before_running(
+    optimization_level: int, make_interpreter: MakeInterpreter
+):
+    code = "b = a + 1\nc = a * b\nd = c = c - b\ne = -a - (d + c)\ne"
+    tree = Parser(Tokenizer(code)).parse()
+    interpreter = make_interpreter(list(Compiler(tree, optimization_level).compile()))
+    interpreter.scope = scope = {"a": 3}
+    run(interpreter)
+    assert scope == {"a": 3, "b": 4, "c": 8, "d": 8, "e": -19}
+    assert interpreter.scope is scope
+    assert interpreter.last_value_popped == -19
+
+
+@pytest.mark.parametrize(
+    "bytecode",
+    [
+        [Bytecode(BytecodeType.BINOP, "@"), Bytecode(BytecodeType.POP)],
+        [
+            Bytecode(BytecodeType.BINOP_SAVE, ("+", "a")),
+            Bytecode(BytecodeType.LOAD_PUSH_BINOP, ("a", 2, "@")),
+            Bytecode(BytecodeType.POP),
+        ],
+        [Bytecode(BytecodeType.BINOP_SAVE, ("@", "a"))],
+    ],
+)
+def test_unknown_operators_raise_when_run(
+    bytecode: list[Bytecode], make_interpreter: MakeInterpreter
+):
+    bytecode = [
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.PUSH, 3),
+        *bytecode,
+    ]
+    interpreter = make_interpreter(bytecode)
+    with pytest.raises(RuntimeError, match="Unknown operator @"):
+        run(interpreter)
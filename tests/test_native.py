@@ -0,0 +1,56 @@
+import random
+
+from python.tokenizer import Tokenizer
+from python.parser import Parser
+from python.native import NativeInterpreter
+
+import pytest
+
+from programs import assert_same_results, random_program, run_code
+
+
+def assert_same_as_stack_vm(code: str) -> None:
+    native = NativeInterpreter(Parser(Tokenizer(code)).parse())
+    native.run()
+    assert_same_results(native, run_code(code))
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "3 + 5",
+        "2 + 3 * 4 ** 5 - 6 % 7 / 8",
+        "-2 ** -3",
+        "--++-++-+3",
+        "+True",
+        "-True",
+        "not 0",
+        "a = b = c = 3",
+        "a = 1\nb = a\nc = b\na = 3",
+        "a = 1 and 2",
+        "a = 0 or 0 or 0",
+        "a = 5\nb = a and 0 or 3",
+        "a = (1 or 2) and (0 or 3)\n4",
+        "x = 1\nif x and 2:\n    y = 3",
+        "if 0 or 5:\n    a = 1\nelse:\n    a = 2",
+        "None = 3\nNone = None + 1",
+        "__debug__ = 1\n__builtins__ = __debug__",
+        "class = 3",
+        "a = 1\nif a:\n    if 0:\n        b = 1\n"
+        "    elif a:\n        b = 2\n        7\nb",
+    ],
+)
+def test_matches_stack_vm(code: str):
+    assert_same_as_stack_vm(code)
+
+
+def test_undefined_name_raises_key_error():
+    tree = Parser(list(Tokenizer("a = b"))).parse()
+    with pytest.raises(KeyError):
+        NativeInterpreter(tree).run()
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_stack_vm_on_random_programs(seed: int):
+    rng = random.Random(seed)
+    assert_same_as_stack_vm(random_program(rng, statements=20))
@@ -0,0 +1,499 @@
+import random
+from typing import Any
+
+from python.tokenizer import Tokenizer
+from python.parser import (
+    Assignment,
+    BinOp,
+    Body,
+    BoolOp,
+    Conditional,
+    Constant,
+    ExprStatement,
+    Parser,
+    Program,
+    UnaryOp,
+    Variable,
+)
+from python.compiler import Bytecode, BytecodeType, Compiler, JUMP_TYPES
+from python.interpreter import Interpreter
+from python.optimizer import (
+    ConstantFolder,
+    PeepholeOptimizer,
+    SUPERINSTRUCTIONS,
+    SuperinstructionFuser,
+)
+from python.packed import PackedInterpreter, pack
+from python.verifier import VerifiedInterpreter, verify
+from python.threaded import ClosureInterpreter
+
+import pytest
+
+from programs import assert_same_results, random_program, run, run_code
+
+
+def fold(code: str) -> Program:
+    tree = Parser(list(Tokenizer(code))).parse()
+    folded = ConstantFolder(tree).fold()
+    assert isinstance(folded, Program)
+    return folded
+
+
+@pytest.mark.parametrize(
+    ["code", "value"],
+    [
+        ("60 * 60 * 24", 86400),
+        ("2 + 3 * 4 ** 5 - 6 % 7 / 8", 3073.25),
+        ("-2 ** -3", -0.125),
+        ("--++-++-+3", 3),
+        ("+True", True),
+        ("-True", -1),
+        ("not 0", True),
+        ("not not 3", True),
+        ("1 and 2", 2),
+        ("0 and 2", 0),
+        ("0 or 0 or 3", 3),
+        ("1 or 2 or 3", 1),
+        ("2 ** 100", 2**100),
+    ],
+)
+def test_folds_constant_expressions(code: str, value: Any):
+    folded = fold(code)
+    expr = folded.statements[0]
+    assert isinstance(expr, ExprStatement)
+    assert expr.expr == Constant(value)
+    assert type(expr.expr.value) is type(value)
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "1 / 0",
+        "1 % 0",
+        "0 ** -1",
+        "10 ** 10 ** 10",
+        "2 ** 100000",
+        "10.0 ** 400",
+        "(-8) ** 0.5",
+    ],
+)
+def test_does_not_fold_dangerous_expressions(code: str):
+    tree = fold(code)
+    expr = tree.statements[0]
+    assert isinstance(expr, ExprStatement)
+    assert isinstance(expr.expr, BinOp)
+
+
+def test_boolean_operators_keep_non_constant_values():
+    assert fold("1 and x").statements == [ExprStatement(Variable("x"))]
+    assert fold("x and 1 and y").statements == [
+        ExprStatement(BoolOp("and", [Variable("x"), Variable("y")]))
+    ]
+    assert fold("x or 1 or y").statements == [
+        ExprStatement(BoolOp("or", [Variable("x"), Constant(1)]))
+    ]
+    assert fold("x and 1").statements == [
+        ExprStatement(BoolOp("and", [Variable("x"), Constant(1)]))
+    ]
+
+
+def test_propagates_constants_through_assignments():
+    tree = fold("rate = 60 * 60 * 24\nx = rate * 2\ny = x + z")
+    assert tree.statements == [
+        Assignment([Variable("rate")], Constant(86400)),
+        Assignment([Variable("x")], Constant(172800)),
+        Assignment([Variable("y")], BinOp("+", Constant(172800), Variable("z"))),
+    ]
+
+
+def test_reassignment_stops_propagation():
+    tree = fold("a = 1\na = b\nc = a")
+    assert tree.statements[-1] == Assignment([Variable("c")], Variable("a"))
+
+
+def test_conditionals_only_keep_constants_both_branches_agree_on():
+    code = """
+a = 1
+b = 2
+c = 3
+if x:
+    a = 10
+    b = 2
+else:
+    b = 2
+    c = 3.0
+d = a + b + c
+"""
+    tree = fold(code)
+    assert tree.statements[-1] == Assignment(
+        [Variable("d")],
+        BinOp("+", BinOp("+", Variable("a"), Constant(2)), Variable("c")),
+    )
+
+
+def test_propagation_inside_branches():
+    tree = fold("a = 1\nif x:\n    b = a + 1")
+    conditional = tree.statements[-1]
+    assert isinstance(conditional, Conditional)
+    assert conditional.body == Body([Assignment([Variable("b")], Constant(2))])
+
+
+def test_prunes_statically_false_branches():
+    tree = fold("if False:\n    a = 1\nb = 2")
+    assert tree.statements == [Assignment([Variable("b")], Constant(2))]
+
+
+def test_inlines_statically_true_branches():
+    tree = fold("if 1 + 1:\n    a = 1\nelse:\n    a = 2\nb = a")
+    assert tree.statements == [
+        Assignment([Variable("a")], Constant(1)),
+        Assignment([Variable("b")], Constant(1)),
+    ]
+
+
+def test_prunes_unreachable_elif_and_else_arms():
+    code = """
+debug = False
+if x:
+    a = 1
+elif debug:
+    a = 2
+elif not debug:
+    a = 3
+elif y:
+    a = 4
+else:
+    a = 5
+"""
+    tree = fold(code)
+    assert tree.statements == [
+        Assignment([Variable("debug")], Constant(False)),
+        Conditional(
+            Variable("x"),
+            Body([Assignment([Variable("a")], Constant(1))]),
+            Body([Assignment([Variable("a")], Constant(3))]),
+        ),
+    ]
+
+
+def test_drops_else_arms_that_become_empty():
+    tree = fold("if x:\n    a = 1\nelif False:\n    a = 2")
+    assert tree.statements == [
+        Conditional(Variable("x"), Body([Assignment([Variable("a")], Constant(1))]))
+    ]
+
+
+def test_pruned_branches_shrink_the_bytecode():
+    code = "flag = False\nif flag:\n    a = 1\n    b = 2\nelse:\n    a = 3\nc = a"
+    compiler = Compiler(Parser(list(Tokenizer(code))).parse(), optimization_level=1)
+    assert list(compiler.compile()) == [
+        Bytecode(BytecodeType.PUSH, False),
+        Bytecode(BytecodeType.SAVE, "flag"),
+        Bytecode(BytecodeType.PUSH, 3),
+        Bytecode(BytecodeType.SAVE, "a"),
+        Bytecode(BytecodeType.PUSH, 3),
+        Bytecode(BytecodeType.SAVE, "c"),
+    ]
+    assert compiler.report is not None
+    assert compiler.report.branches_pruned == 1
+
+
+@pytest.mark.parametrize("optimization_level", [1, 2, 3])
+@pytest.mark.parametrize(
+    "code",
+    [
+        "if 0:\n    a = 1\nelse:\n    a = 2\n    b = a",
+        "if 0:\n    a = 1",
+        "if a:\n    b = a + 1",
+    ],
+)
+def test_compiles_a_conditional_at_the_root(code: str, optimization_level: int):
+    conditional = Parser(list(Tokenizer(code))).parse().statements[0]
+    assert isinstance(conditional, Conditional)
+    bytecode = list(Compiler(conditional, optimization_level).compile())
+    expected = Interpreter(list(Compiler(conditional).compile()))
+    interpreter = Interpreter(bytecode)
+    expected.scope = {"a": 1}
+    interpreter.scope = {"a": 1}
+    assert run(interpreter).scope == run(expected).scope
+
+
+def test_folds_long_elif_chains():
+    arms = 5_000
+    code = "flag = 0\nif x0:\n    a = 0\n"
+    code += "".join(f"elif x{idx} or flag:\n    a = {idx}\n" for idx in range(1, arms))
+    code += "elif not flag:\n    a = -1\nelif x:\n    a = -2"
+    compiler = Compiler(Parser(list(Tokenizer(code))).parse(), optimization_level=1)
+    bytecode = list(compiler.compile())
+    assert compiler.report is not None
+    assert compiler.report.branches_pruned == 1
+    assert bytecode[-2:] == [
+        Bytecode(BytecodeType.PUSH, -1),
+        Bytecode(BytecodeType.SAVE, "a"),
+    ]
+
+
+def test_folding_does_not_mutate_the_tree():
+    tree = Parser(list(Tokenizer("a = 1 + 2\nb = -a"))).parse()
+    ConstantFolder(tree).fold()
+    assert tree.statements[1] == Assignment(
+        [Variable("b")], UnaryOp("-", Variable("a"))
+    )
+
+
+def test_optimization_level_reports_removed_instructions():
+    tree = Parser(list(Tokenizer("rate = 60 * 60 * 24\nx = rate * 2"))).parse()
+    compiler = Compiler(tree, optimization_level=1, count_instructions=True)
+    bytecode = list(compiler.compile())
+    assert bytecode == [
+        Bytecode(BytecodeType.PUSH, 86400),
+        Bytecode(BytecodeType.SAVE, "rate"),
+        Bytecode(BytecodeType.PUSH, 172800),
+        Bytecode(BytecodeType.SAVE, "x"),
+    ]
+    assert compiler.report is not None
+    assert compiler.report.instructions_before == 10
+    assert compiler.report.instructions_after == 4
+    assert compiler.report.instructions_removed == 6
+
+
+def test_counting_the_unoptimized_instructions_is_opt_in():
+    tree = Parser(list(Tokenizer("rate = 60 * 60 * 24\nx = rate * 2"))).parse()
+    compiler = Compiler(tree, optimization_level=1)
+    assert len(list(compiler.compile())) == 4
+    assert compiler.report is not None
+    assert compiler.report.instructions_before == 0
+    assert compiler.report.instructions_after == 0
+
+
+def test_optimization_is_opt_in():
+    compiler = Compiler(Parser(list(Tokenizer("1 + 2"))).parse())
+    assert len(list(compiler.compile())) == 4
+    assert compiler.report is None
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "a = 1\nb = a * 3 + 2\nc = b % 4 - a / 2",
+        "a = b = c = 2 ** 3\nd = a and b or c\nif d - 8:\n    e = -d",
+        "x = 3\nif x - 3:\n    y = 1\nelif not x:\n    y = 2\n"
+        "else:\n    y = x * 2\nz = y",
+        "a = 0\nb = a or 5\nif b:\n    a = a + 1\nc = a + b\nnot a",
+        "a = 7\nif 0:\n    b = a / 0\nelse:\n    b = a % 0.5",
+    ],
+)
+def test_optimized_programs_compute_the_same_scope(code: str):
+    expected = run_code(code, optimization_level=0)
+    optimized = run_code(code, optimization_level=1)
+    assert optimized.scope == expected.scope
+
+
+def test_optimized_expression_statements_pop_the_same_value():
+    code = "a = 2\nb = a * 3\n(b or a) and b + 1"
+    assert run_code(code, optimization_level=1).last_value_popped == 7
+
+
+def peephole(code: str) -> tuple[list[Bytecode], PeepholeOptimizer]:
+    tree = Parser(list(Tokenizer(code))).parse()
+    optimizer = PeepholeOptimizer(list(Compiler(tree).compile()))
+    return optimizer.optimize(), optimizer
+
+
+def test_peephole_fuses_conditional_pops_and_threads_jumps():
+    code = """
+if a:
+    if b:
+        x = 1
+    else:
+        x = 2
+else:
+    x = 3
+y = a and b and c
+1
+2
+"""
+    bytecode, optimizer = peephole(code)
+    assert bytecode == [
+        Bytecode(BytecodeType.LOAD, "a"),
+        Bytecode(BytecodeType.POP_JUMP_IF_FALSE, 9),
+        Bytecode(BytecodeType.LOAD, "b"),
+        Bytecode(BytecodeType.POP_JUMP_IF_FALSE, 4),
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.SAVE, "x"),
+        Bytecode(BytecodeType.JUMP_FORWARD, 6),  # Threaded past the outer `else`.
+        Bytecode(BytecodeType.PUSH, 2),
+        Bytecode(BytecodeType.SAVE, "x"),
+        Bytecode(BytecodeType.JUMP_FORWARD, 3),
+        Bytecode(BytecodeType.PUSH, 3),
+        Bytecode(BytecodeType.SAVE, "x"),
+        Bytecode(BytecodeType.LOAD, "a"),
+        Bytecode(BytecodeType.JUMP_IF_FALSE_OR_POP, 4),
+        Bytecode(BytecodeType.LOAD, "b"),
+        Bytecode(BytecodeType.JUMP_IF_FALSE_OR_POP, 2),
+        Bytecode(BytecodeType.LOAD, "c"),
+        Bytecode(BytecodeType.SAVE, "y"),
+        Bytecode(BytecodeType.PUSH, 2),
+        Bytecode(BytecodeType.POP),
+    ]
+    assert optimizer.report.instructions_before == 26
+    assert optimizer.report.instructions_after == 20
+    assert optimizer.report.conditional_pops_fused == 2
+    assert optimizer.report.jumps_threaded == 1
+    assert optimizer.report.dead_pushes_removed == 1
+
+
+def test_peephole_threads_or_pop_jumps_of_the_same_kind():
+    bytecode, _ = peephole("(a or b) or c")
+    assert bytecode == [
+        Bytecode(BytecodeType.LOAD, "a"),
+        Bytecode(BytecodeType.JUMP_IF_TRUE_OR_POP, 4),
+        Bytecode(BytecodeType.LOAD, "b"),
+        Bytecode(BytecodeType.JUMP_IF_TRUE_OR_POP, 2),
+        Bytecode(BytecodeType.LOAD, "c"),
+        Bytecode(BytecodeType.POP),
+    ]
+
+
+def test_peephole_keeps_the_last_popped_value():
+    bytecode, _ = peephole("1\nif a:\n    2")
+    assert bytecode[:2] == [
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.POP),
+    ]
+
+
+def test_peephole_forwards_stores_to_loads():
+    bytecode, optimizer = peephole("a = x\nb = a")
+    assert bytecode == [
+        Bytecode(BytecodeType.LOAD, "x"),
+        Bytecode(BytecodeType.COPY),
+        Bytecode(BytecodeType.SAVE, "a"),
+        Bytecode(BytecodeType.SAVE, "b"),
+    ]
+    assert optimizer.report.stores_forwarded == 1
+
+
+def test_peephole_forwards_slot_stores_to_slot_loads():
+    bytecode = [
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.SAVE_SLOT, 0),
+        Bytecode(BytecodeType.LOAD_SLOT, 0),
+        Bytecode(BytecodeType.SAVE_SLOT, 1),
+    ]
+    assert PeepholeOptimizer(bytecode).optimize() == [
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.COPY),
+        Bytecode(BytecodeType.SAVE_SLOT, 0),
+        Bytecode(BytecodeType.SAVE_SLOT, 1),
+    ]
+
+
+def test_optimization_level_two_runs_the_peephole_optimizer():
+    tree = Parser(list(Tokenizer("a = x and y\n1 + 2\nb = a"))).parse()
+    compiler = Compiler(tree, optimization_level=2, count_instructions=True)
+    bytecode = list(compiler.compile())
+    assert bytecode == [
+        Bytecode(BytecodeType.LOAD, "x"),
+        Bytecode(BytecodeType.JUMP_IF_FALSE_OR_POP, 2),
+        Bytecode(BytecodeType.LOAD, "y"),
+        Bytecode(BytecodeType.SAVE, "a"),
+        Bytecode(BytecodeType.PUSH, 3),
+        Bytecode(BytecodeType.POP),
+        Bytecode(BytecodeType.LOAD, "a"),
+        Bytecode(BytecodeType.SAVE, "b"),
+    ]
+    assert compiler.report is not None
+    assert compiler.report.instructions_before == 12
+    assert compiler.report.instructions_after == 8
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_peephole_preserves_results(seed: int):
+    rng = random.Random(seed)
+    code = random_program(rng, 15)
+    bytecode = list(Compiler(Parser(list(Tokenizer(code))).parse()).compile())
+    optimized = PeepholeOptimizer(bytecode).optimize()
+    assert len(optimized) <= len(bytecode)
+
+    expected = run(Interpreter(bytecode))
+    for interpreter in [Interpreter(optimized), ClosureInterpreter(optimized)]:
+        assert_same_results(run(interpreter), expected)
+
+
+def fuse(code: str) -> tuple[list[Bytecode], SuperinstructionFuser]:
+    bytecode = list(Compiler(Parser(list(Tokenizer(code))).parse()).compile())
+    fuser = SuperinstructionFuser(bytecode)
+    return fuser.fuse(), fuser
+
+
+def test_fuse_superinstructions():
+    bytecode, fuser = fuse("a = b = x * 2\nc = a + b\nc = c - 1 + a")
+    assert bytecode == [
+        Bytecode(BytecodeType.LOAD_PUSH_BINOP, ("x", 2, "*")),
+        Bytecode(BytecodeType.COPY_SAVE, ("a",)),
+        Bytecode(BytecodeType.SAVE, "b"),
+        Bytecode(BytecodeType.LOAD_LOAD_BINOP, ("a", "b", "+")),
+        Bytecode(BytecodeType.SAVE, "c"),
+        Bytecode(BytecodeType.LOAD_PUSH_BINOP, ("c", 1, "-")),
+        Bytecode(BytecodeType.LOAD, "a"),
+        Bytecode(BytecodeType.BINOP_SAVE, ("+", "c")),
+    ]
+    assert fuser.report.superinstructions_fused == 5
+    assert fuser.report.instructions_removed == 8
+
+
+def test_fuse_superinstructions_keeps_jump_targets():
+    bytecode, _ = fuse("a = (x or 2) + 1")
+    assert bytecode == [
+        Bytecode(BytecodeType.LOAD, "x"),
+        Bytecode(BytecodeType.COPY),
+        Bytecode(BytecodeType.POP_JUMP_IF_TRUE, 3),
+        Bytecode(BytecodeType.POP),
+        Bytecode(BytecodeType.PUSH, 2),
+        Bytecode(BytecodeType.PUSH_BINOP, (1, "+")),
+        Bytecode(BytecodeType.SAVE, "a"),
+    ]
+
+
+def test_fuse_only_the_given_superinstructions():
+    bytecode = [
+        Bytecode(BytecodeType.LOAD, "a"),
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.BINOP, "+"),
+        Bytecode(BytecodeType.SAVE, "a"),
+    ]
+    superinstructions = {
+        (BytecodeType.BINOP, BytecodeType.SAVE): BytecodeType.BINOP_SAVE
+    }
+    assert SuperinstructionFuser(bytecode, superinstructions).fuse() == [
+        Bytecode(BytecodeType.LOAD, "a"),
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.BINOP_SAVE, ("+", "a")),
+    ]
+
+
+def test_superinstructions_have_no_jumps():
+    for sequence in SUPERINSTRUCTIONS:
+        assert not any(bct in JUMP_TYPES for bct in sequence)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_optimization_level_three_preserves_results(seed: int):
+    rng = random.Random(seed)
+    code = random_program(rng, 15)
+    tree = Parser(list(Tokenizer(code))).parse()
+    # Folding can change `last_value_popped`, so compare with level 2.
+    bytecode = list(Compiler(tree, optimization_level=2).compile())
+    fused = list(Compiler(tree, optimization_level=3).compile())
+    assert len(fused) <= len(bytecode)
+
+    expected = run(Interpreter(bytecode))
+    for interpreter in [
+        Interpreter(fused),
+        Interpreter(fused, fast=True),
+        ClosureInterpreter(fused),
+        VerifiedInterpreter(verify(fused)),
+        PackedInterpreter(pack(fused)),
+    ]:
+        assert_same_results(run(interpreter), expected)
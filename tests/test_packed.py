@@ -0,0 +1,68 @@
+from python.tokenizer import Tokenizer
+from python.parser import Parser
+from python.compiler import Bytecode, BytecodeType, Compiler
+from python.interpreter import Interpreter
+from python.packed import PackedInterpreter, pack, unpack
+
+from programs import compile_code
+
+
+def test_pack_round_trip():
+    bytecode = compile_code(
+        "a = 1\nif a - 1 and b or not c:\n    b = -a ** 2.5\nelse:\n    c = a % 3\na\n"
+    )
+    assert unpack(pack(bytecode)) == bytecode
+
+
+def test_pack_shares_constants_and_names():
+    bytecode = compile_code("a = 3\nb = 3\na = a + b + 3\n")
+    packed = pack(bytecode)
+    assert len(packed) == len(bytecode)
+    assert packed.constants == [3, "+"]
+    assert packed.names == ["a", "b"]
+
+
+def test_pack_keeps_equal_constants_of_different_types_apart():
+    bytecode = [
+        Bytecode(BytecodeType.PUSH, 1),
+        Bytecode(BytecodeType.PUSH, 1.0),
+        Bytecode(BytecodeType.PUSH, True),
+        Bytecode(BytecodeType.PUSH, 0.0),
+        Bytecode(BytecodeType.PUSH, -0.0),
+    ]
+    values = [bc.value for bc in unpack(pack(bytecode))]
+    assert [type(value) for value in values] == [int, float, bool, float, float]
+    assert str(values[-1]) == "-0.0"
+
+
+def test_pack_keeps_jump_offsets_inline():
+    bytecode = compile_code("if a:\n    b = 1\nelse:\n    b = 2\n")
+    packed = pack(bytecode)
+    for bc, operand in zip(bytecode, packed.operands):
+        if bc.type == BytecodeType.JUMP_FORWARD:
+            assert operand == bc.value
+
+
+def test_pack_keeps_slots_inline():
+    tree = Parser(list(Tokenizer("a = 1\nb = a\n"))).parse()
+    compiler = Compiler(tree, slots=True)
+    bytecode = list(compiler.compile())
+    packed = pack(bytecode)
+    assert list(packed.operands) == [0, 0, 0, 1]
+    assert packed.names == []
+    assert unpack(packed) == bytecode
+    interpreter = PackedInterpreter(packed, slot_names=compiler.slot_names)
+    interpreter.run()
+    assert interpreter.scope == {"a": 1, "b": 1}
+
+
+def test_packed_interpreter_matches_interpreter():
+    code = "a = 5\nb = 0\nif a - 5 or b:\n    b = a * 2\nelif a:\n    b = 1\nb - 1\n"
+    bytecode = compile_code(code)
+    interpreter = Interpreter(bytecode)
+    interpreter.run()
+    packed_interpreter = PackedInterpreter(pack(bytecode))
+    packed_interpreter.run()
+    assert packed_interpreter.scope == interpreter.scope == {"a": 5, "b": 1}
+    assert packed_interpreter.last_value_popped == interpreter.last_value_popped == 0
+    assert packed_interpreter.ptr == len(bytecode)
@@ -0,0 +1,74 @@
+import multiprocessing
+
+from python.tokenizer import Tokenizer
+from python.parser import Parser
+from python.parallel import shard_boundaries, tokenize_in_parallel
+
+import pytest
+
+from programs import tokenize_or_fail
+
+PROGRAM = """
+a = 1
+if a:
+    b = 2.5
+
+    if b:
+        c = a ** -b
+    else:
+        c = 0
+
+elif a + 1:
+    b = 3
+else:
+    b = 4
+c = a and not b
+d = (c or 2) * 7 % .5
+"""
+
+
+def test_shards_start_at_lines_without_indentation():
+    code = PROGRAM * 10
+    boundaries = shard_boundaries(code, 8)
+    assert boundaries[0] == 0 and boundaries[-1] == len(code)
+    assert 2 < len(boundaries) <= 9
+    for start in boundaries[1:-1]:
+        assert code[start - 1] == "\n" and code[start] not in " \n"
+
+
+def test_shards_are_never_empty():
+    code = "if a:\n" + "    b = 2\n" * 100 + "c = 3\n"
+    assert shard_boundaries(code, 16) == [0, len(code) - 6, len(code)]
+    assert shard_boundaries("", 4) == [0, 0]
+
+
+@pytest.mark.parametrize("shards", [1, 2, 7, 50])
+@pytest.mark.parametrize(
+    "code",
+    [
+        "",
+        "\n\n",
+        PROGRAM,
+        PROGRAM * 5,
+        PROGRAM + "e = $\n" + PROGRAM,
+        PROGRAM * 3 + "f = 1\n  g = 2\n",
+        "a = 1\n\tb = 2\n" + PROGRAM,
+    ],
+)
+def test_parallel_tokenizer_matches_the_tokenizer(code: str, shards: int):
+    expected = tokenize_or_fail(Tokenizer(code))
+    assert tokenize_or_fail(tokenize_in_parallel(code, 2, shards)) == expected
+    parallel = tokenize_in_parallel(code.encode(), 2, shards)
+    assert tokenize_or_fail(parallel) == expected
+
+
+def test_parsing_tokens_from_parallel_tokenizer():
+    code = PROGRAM * 20
+    tree = Parser(tokenize_in_parallel(code, workers=3)).parse()
+    assert tree == Parser(Tokenizer(code)).parse()
+
+
+def test_spawns_workers_without_a_fork_server(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    code = PROGRAM * 3
+    assert list(tokenize_in_parallel(code, 2, 3)) == list(Tokenizer(code))
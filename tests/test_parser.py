@@ -1,4 +1,8 @@
-from python.parser import Parser
+import random
+import re
+from typing import Iterator
+
+from python.parser import Parser, conditional_arms
 from python.parser import (
     Assignment,
     BinOp,
@@ -15,6 +19,8 @@ from python.tokenizer import Token, Tokenizer, TokenType
 
 import pytest
 
+from programs import random_expr
+
 
 def test_parsing_addition():
     tokens = [
@@ -705,3 +711,137 @@ else:
             ),
         ],
     )
+
+
+def test_conditional_arms():
+    code = """if x:
+    a = 1
+elif y:
+    b = 2
+elif z:
+    c = 3
+else:
+    d = 4"""
+    tree = Parser(list(Tokenizer(code))).parse()
+    conditional = tree.statements[0]
+    assert isinstance(conditional, Conditional)
+    arms, orelse = conditional_arms(conditional)
+    assert [arm.condition for arm in arms] == [Variable(n) for n in "xyz"]
+    assert orelse == Body([Assignment([Variable("d")], Constant(4))])
+
+
+def test_conditional_arms_keeps_nested_else_if():
+    code = """if x:
+    a = 1
+else:
+    if y:
+        b = 2
+    c = 3"""
+    tree = Parser(list(Tokenizer(code))).parse()
+    conditional = tree.statements[0]
+    assert isinstance(conditional, Conditional)
+    arms, orelse = conditional_arms(conditional)
+    assert len(arms) == 1
+    assert orelse is conditional.orelse
+
+
+def test_parsing_long_elif_chain():
+    arms = 5_000
+    code = "if x0:\n    a = 0\n"
+    code += "".join(f"elif x{idx}:\n    a = {idx}\n" for idx in range(1, arms))
+    tree = Parser(list(Tokenizer(code))).parse()
+    conditional = tree.statements[0]
+    assert isinstance(conditional, Conditional)
+    arms_found, orelse = conditional_arms(conditional)
+    assert len(arms_found) == arms
+    assert orelse is None
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "1",
+        "-2 ** -3",
+        "2 ** 3 ** 4",
+        "-2 ** 2 * 3",
+        "1 % -2 ** -3 / 5 * 2 + 2 ** 3",
+        "1 - 2 - 3 + 4",
+        "--++-++-+3",
+        "(1 + 2) * (3 - 4) ** (5 % 6)",
+        "not a + b * c",
+        "not not a and b",
+        "a and b and c or d or not e",
+        "a or b and c or d",
+        "(a or b) or c",
+        "a and (b and c)",
+        "(a and b) and c",
+        "not (a or b) and -(c ** -d)",
+        "True or False and 1.5",
+    ],
+)
+def test_pratt_parser_builds_the_same_trees(code: str):
+    tokens = list(Tokenizer(code))
+    assert Parser(tokens, pratt=True).parse() == Parser(tokens, pratt=False).parse()
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_pratt_parser_matches_on_random_expressions(seed: int):
+    rng = random.Random(seed)
+    for _ in range(20):
+        code = random_expr(rng, ["+", "-", "*", "/", "%", "**"], parenthesize=False)
+        tokens = list(Tokenizer(code))
+        try:
+            expected = Parser(tokens, pratt=False).parse()
+        except RuntimeError as error:
+            with pytest.raises(RuntimeError, match=re.escape(str(error))):
+                Parser(tokens, pratt=True).parse()
+        else:
+            assert Parser(tokens, pratt=True).parse() == expected
+
+
+@pytest.mark.parametrize(
+    "code", ["1 + not 2", "- not a", "a ** not b", "a and", "not", "(a", "a b"]
+)
+def test_pratt_parser_rejects_the_same_code(code: str):
+    tokens = list(Tokenizer(code))
+    with pytest.raises(RuntimeError) as expected:
+        Parser(tokens, pratt=False).parse()
+    with pytest.raises(RuntimeError) as error:
+        Parser(tokens, pratt=True).parse()
+    assert str(error.value) == str(expected.value)
+
+
+STREAMED_CODE = """a = b = 3
+if a and not b:
+    c = a * 2 + b
+elif b:
+    c = -(b ** 2)
+else:
+    c = 0
+c or a
+"""
+
+
+@pytest.mark.parametrize("pratt", [False, True])
+def test_parsing_straight_from_the_tokenizer(pratt: bool):
+    expected = Parser(list(Tokenizer(STREAMED_CODE)), pratt=pratt).parse()
+    assert Parser(Tokenizer(STREAMED_CODE), pratt=pratt).parse() == expected
+
+
+@pytest.mark.parametrize("pratt", [False, True])
+def test_parser_looks_at_most_two_tokens_ahead(pratt: bool):
+    def stream() -> Iterator[Token]:
+        for token in Tokenizer(STREAMED_CODE):
+            assert len(parser.lookahead) < 2
+            yield token
+
+    parser = Parser(stream(), pratt=pratt)
+    parser.parse()
+    assert not parser.lookahead
+
+
+def test_tokens_are_only_read_as_they_are_needed():
+    parser = Parser(Tokenizer("a = 1\nb = a $ 2\n"))
+    assert parser.parse_statement() == Assignment([Variable("a")], Constant(1))
+    with pytest.raises(RuntimeError, match="Can't tokenize"):
+        parser.parse_statement()
@@ -0,0 +1,72 @@
+from typing import Any
+
+from python.tokenizer import Tokenizer
+from python.parser import Parser
+from python.compiler import Compiler
+from python.interpreter import Interpreter
+from python.quickening import (
+    MAX_QUICKENING_BACKOFF,
+    QUICKENING_WARMUP,
+    QuickeningStats,
+    specialized_add,
+    specialized_mul,
+    specialized_neg,
+)
+
+
+def adaptive_interpreter(code: str) -> Interpreter:
+    tree = Parser(list(Tokenizer(code))).parse()
+    return Interpreter(list(Compiler(tree).compile()), adaptive=True)
+
+
+def rerun(interpreter: Interpreter, times: int, **scope: Any) -> None:
+    for _ in range(times):
+        interpreter.scope.update(scope)
+        interpreter.ptr = 0
+        interpreter.run_fast()
+
+
+def test_only_specializable_operations_are_adaptive():
+    interpreter = adaptive_interpreter("a = b + 1\nb = a / 2\nc = -a * 3\nc = not c")
+    assert sorted(interpreter.quickening) == [2, 9, 11, 14]
+    assert interpreter.fast
+
+
+def test_specializes_after_warmup():
+    interpreter = adaptive_interpreter("c = a + b")
+    rerun(interpreter, QUICKENING_WARMUP - 1, a=1, b=2)
+    stats = interpreter.quickening[2]
+    assert stats.specialized_for is None
+
+    rerun(interpreter, 1, a=1, b=2)
+    assert stats.specialized_for == (int, int)
+    assert interpreter.threaded_code[2][0] is specialized_add
+    assert interpreter.scope["c"] == 3
+
+
+def test_specialized_instructions_run_operands_of_other_types():
+    interpreter = adaptive_interpreter("c = a * b\nd = -c")
+    rerun(interpreter, QUICKENING_WARMUP + 5, a=2.0, b=3)
+    assert interpreter.quickening[2] == QuickeningStats(
+        specialized_for=(float, int), warmup=0
+    )
+    assert interpreter.quickening[5].specialized_for == (float,)
+
+    rerun(interpreter, 1, a=2, b=True)
+    assert interpreter.threaded_code[2][0] is specialized_mul
+    assert interpreter.threaded_code[5][0] is specialized_neg
+    assert interpreter.scope == {"a": 2, "b": True, "c": 2, "d": -2}
+    assert type(interpreter.scope["c"]) is int
+
+
+def test_backs_off_when_it_cant_specialize():
+    interpreter = adaptive_interpreter("c = a + b")
+    stats = interpreter.quickening[2]
+    rerun(interpreter, QUICKENING_WARMUP, a="x", b="y")
+    assert stats.specialized_for is None
+    assert stats.warmup == QUICKENING_WARMUP
+    assert stats.backoff == 2 * QUICKENING_WARMUP
+
+    for _ in range(20):
+        stats.back_off()
+    assert stats.backoff == MAX_QUICKENING_BACKOFF
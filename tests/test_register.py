@@ -0,0 +1,110 @@
+import random
+
+from python.tokenizer import Tokenizer
+from python.parser import Parser
+from python.register import (
+    RegisterBytecode,
+    RegisterBytecodeType,
+    RegisterCompiler,
+    RegisterInterpreter,
+    RegisterProgram,
+)
+
+import pytest
+
+from programs import assert_same_results, random_program, run, run_code
+
+
+def compile_register(code: str) -> RegisterProgram:
+    return RegisterCompiler(Parser(list(Tokenizer(code))).parse()).compile()
+
+
+def assert_same_as_stack_vm(code: str) -> None:
+    program = compile_register(code)
+    expected = run_code(code)
+    for fast in [False, True]:
+        assert_same_results(run(RegisterInterpreter(program, fast=fast)), expected)
+
+
+def test_all_register_bytecode_types_can_be_interpreted():
+    for bct in RegisterBytecodeType:
+        assert hasattr(RegisterInterpreter, f"execute_{bct.value}")
+
+
+def test_fast_run_rejects_unknown_opcodes():
+    interpreter = RegisterInterpreter(compile_register("a = 1"), fast=True)
+    interpreter.code[0] = (len(RegisterBytecodeType), 0, 0, 0)
+    with pytest.raises(RuntimeError, match="Can't interpret opcode"):
+        interpreter.run_fast()
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "3 + 5",
+        "2 + 3 * 4 ** 5 - 6 % 7 / 8",
+        "-2 ** -3",
+        "--++-++-+3",
+        "+True",
+        "not 0",
+        "1 + 1.0 + True",
+        "a = b = c = 3",
+        "a = 1\nb = a\nc = b\na = 3",
+        "a = 2\na = a * a + a",
+        "a = 1 and 2",
+        "a = 0 or 0 or 0",
+        "a = 5\nb = a and 0 or 3",
+        "a = 0\na = a or a + 1",
+        "a = 3\na = not a and a",
+        "a = 2\na = +((0 or 0) or a)",
+        "a = (1 or 2) and (0 or 3)\n4",
+        "x = 1\nif x and 2:\n    y = 3",
+        "if 0 or 5:\n    a = 1\nelse:\n    a = 2",
+        "a = 1\nif a:\n    if 0:\n        b = 1\n"
+        "    else:\n        b = 2\n        7\n    b",
+    ],
+)
+def test_matches_stack_vm(code: str):
+    assert_same_as_stack_vm(code)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_stack_vm_on_random_programs(seed: int):
+    rng = random.Random(seed)
+    assert_same_as_stack_vm(random_program(rng, statements=20))
+
+
+def test_three_address_instructions():
+    program = compile_register("a = 1\nb = 2\nc = a + b * 3")
+    a, one, b, two, c, three, temporary = range(7)
+    assert program.variables == {a: "a", b: "b", c: "c"}
+    assert program.constants == {one: 1, two: 2, three: 3}
+    assert program.bytecode == [
+        RegisterBytecode(RegisterBytecodeType.MOVE, (a, one)),
+        RegisterBytecode(RegisterBytecodeType.MOVE, (b, two)),
+        RegisterBytecode(RegisterBytecodeType.MUL, (temporary, b, three)),
+        RegisterBytecode(RegisterBytecodeType.ADD, (c, a, temporary)),
+    ]
+
+
+def test_temporaries_are_reused_across_statements():
+    program = compile_register("1 + 2 * 3\n4 - 5 * 6")
+    assert program.size == len(program.constants) + 2
+
+
+def test_constants_are_deduplicated_by_type():
+    program = compile_register("a = 1\nb = 1\nc = 1.0\nd = True")
+    assert list(program.constants.values()) == [1, 1.0, True]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "a = b",
+        "if 1:\n    a = 1\na",
+        "if 1:\n    a = 1\nelif 2:\n    b = 1\nelse:\n    a = 1\nb",
+    ],
+)
+def test_unassigned_variables_are_rejected(code: str):
+    with pytest.raises(RuntimeError, match="might not be assigned"):
+        compile_register(code)
@@ -0,0 +1,73 @@
+from typing import Iterator
+
+from python.tokenizer import Token, Tokenizer
+from python.parser import Assignment, Conditional, ExprStatement, Parser
+from python.compiler import Compiler
+from python.interpreter import Interpreter
+from python.streaming import StreamingInterpreter
+
+import pytest
+
+PROGRAMS = [
+    "3 + 5",
+    "a = 1\nb = a + 1\nc = a * b\nc",
+    "a = 3\na = a * a\na\n5\na = a - 1",
+    "a = 0\nif a:\n    b = 1\nelif a + 1:\n    b = 2\nelse:\n    b = 3\nb",
+    "a = 1\nif a:\n    if 0:\n        b = 1\n    else:\n        b = 2\n        7\nb",
+    "a = 5 and 0 or 3\nif not a:\n    a = 1\na = (a or 2) ** 2",
+    "if 1:\n    1\nif 0:\n    2\nelse:\n    3\nif 1:\n    4",
+]
+
+
+@pytest.mark.parametrize("code", PROGRAMS)
+@pytest.mark.parametrize("fast", [False, True])
+@pytest.mark.parametrize("optimization_level", [0, 3])
+def test_streaming_matches_the_interpreter(
+    code: str, fast: bool, optimization_level: int
+):
+    tree = Parser(Tokenizer(code)).parse()
+    interpreter = Interpreter(list(Compiler(tree, optimization_level).compile()))
+    interpreter.run()
+
+    streaming = StreamingInterpreter(fast=fast, optimization_level=optimization_level)
+    statements = list(streaming.run(Tokenizer(code)))
+    assert statements == tree.statements
+    assert streaming.statements_run == len(tree.statements)
+    assert streaming.scope == interpreter.scope
+    assert streaming.last_value_popped == interpreter.last_value_popped
+
+
+def test_statements_run_before_the_rest_is_read():
+    code = "a = 1\nif a:\n    b = 2\nelse:\n    b = 3\nc = a + b\na $ b\n"
+    tokens_read = 0
+
+    def stream() -> Iterator[Token]:
+        nonlocal tokens_read
+        for token in Tokenizer(code):
+            tokens_read += 1
+            yield token
+
+    streaming = StreamingInterpreter()
+    statements = streaming.run(stream())
+    assert isinstance(next(statements), Assignment)
+    assert streaming.scope == {"a": 1}
+    assert tokens_read == 4
+
+    # The conditional only ends once it's clear that no `else` follows.
+    assert isinstance(next(statements), Conditional)
+    assert streaming.scope == {"a": 1, "b": 2}
+    assert isinstance(next(statements), Assignment)
+    assert streaming.scope == {"a": 1, "b": 2, "c": 3}
+
+    with pytest.raises(RuntimeError, match="Can't tokenize"):
+        next(statements)
+    assert streaming.statements_run == 3
+
+
+def test_scope_carries_over_between_runs():
+    streaming = StreamingInterpreter(fast=True)
+    list(streaming.run(Tokenizer("a = 2\n")))
+    statements = list(streaming.run(Tokenizer("a = a ** 10\na + 1")))
+    assert all(isinstance(s, (Assignment, ExprStatement)) for s in statements)
+    assert streaming.scope == {"a": 1024}
+    assert streaming.last_value_popped == 1025
@@ -1,6 +1,22 @@
+import io
+import mmap
+import random
+import sys
+from pathlib import Path
+
 import pytest
 
-from python.tokenizer import Token, Tokenizer, TokenType
+from python.parser import Parser
+from python.tokenizer import (
+    CHARS_AS_TOKENS,
+    KEYWORDS_AS_TOKENS,
+    Token,
+    TokenBuffer,
+    Tokenizer,
+    TokenType,
+)
+
+from programs import tokenize_or_fail
 
 
 @pytest.mark.parametrize(
@@ -197,6 +213,34 @@ def test_tokenizer_ignores_extra_newlines(code: str):
     ]
 
 
+BLANK_LINES = 1_000_000
+
+
+@pytest.mark.parametrize("blank_line", ["", "    ", "  ", "            "])
+@pytest.mark.parametrize("regex", [False, True])
+def test_tokenizer_skips_a_million_blank_lines(blank_line: str, regex: bool):
+    blank_lines = (blank_line + "\n") * BLANK_LINES
+    code = blank_lines + "if a:\n" + blank_lines + "    b\n" + blank_lines + "c"
+    assert list(Tokenizer(code, regex=regex)) == [
+        Token(TokenType.IF),
+        Token(TokenType.NAME, "a"),
+        Token(TokenType.COLON),
+        Token(TokenType.NEWLINE),
+        Token(TokenType.INDENT),
+        Token(TokenType.NAME, "b"),
+        Token(TokenType.NEWLINE),
+        Token(TokenType.DEDENT),
+        Token(TokenType.NAME, "c"),
+        Token(TokenType.NEWLINE),
+        Token(TokenType.EOF),
+    ]
+
+
+def test_chunked_tokenizer_skips_a_million_blank_lines():
+    lines = ["a\n", *(["    \n"] * BLANK_LINES), "b"]
+    assert list(Tokenizer(lines)) == list(Tokenizer("".join(lines)))
+
+
 def test_tokenizer_names():
     code = "a + 3 - b c12 __d"
     tokens = list(Tokenizer(code))
@@ -300,3 +344,162 @@ def test_tokenizer_if_elif_else():
         Token(TokenType.NEWLINE),
         Token(TokenType.EOF),
     ]
+
+
+TRICKY_CODE = [
+    "",
+    "\n\n  \n",
+    "    a",
+    "\n\n    a\nb",
+    "a = 1\nif a:\n    b = 2.5\n\n  \n    if b:\n        c = .5\n"
+    "elif 0:\n    d = 3.\nelse:\n    e = 1.2.3\n",
+    "3 ** -2 * (4 % 5) / +6 - 7",
+    "1..5 + 10.25 + 123.456 + 0.1 + 00.7",
+    "True and False or not None_ and if_ and ifx",
+    "_a1 = 2abc = a_b_c",
+    "a   \n   \nb  ",
+    "a\n  b",
+    "a\n\tb",
+    "a\n\t\nb",
+    "a $ b",
+    "  .  ",
+    "1 + é",
+    "if a:\n    if b:\n            c\nd",
+    "a\r\nb",
+]
+
+
+@pytest.mark.parametrize("code", TRICKY_CODE)
+def test_regex_tokenizer_matches_the_scanner(code: str):
+    expected = tokenize_or_fail(Tokenizer(code, regex=False))
+    assert tokenize_or_fail(Tokenizer(code, regex=True)) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_regex_tokenizer_matches_the_scanner_on_random_code(seed: int):
+    rng = random.Random(seed)
+    pieces = ["a", "b1", "_", "if", "else", "1", "23", "4.5", ".6", "7.", "**", "*"]
+    pieces += ["+", "-", "(", ")", "=", ":", " ", " ", "\n", "\n    ", "\n        "]
+    for _ in range(50):
+        code = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+        expected = tokenize_or_fail(Tokenizer(code, regex=False))
+        assert tokenize_or_fail(Tokenizer(code, regex=True)) == expected
+
+
+@pytest.mark.parametrize("code", TRICKY_CODE)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 64])
+def test_chunked_tokenizer_matches_the_scanner(code: str, chunk_size: int):
+    expected = tokenize_or_fail(Tokenizer(code))
+    chunked = Tokenizer(io.StringIO(code), chunk_size=chunk_size)
+    assert tokenize_or_fail(chunked) == expected
+    assert tokenize_or_fail(Tokenizer(io.StringIO(code).readlines())) == expected
+    chunks = [code[i : i + chunk_size] for i in range(0, len(code), chunk_size)]
+    assert tokenize_or_fail(Tokenizer(iter(chunks))) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunked_tokenizer_matches_the_scanner_on_random_splits(seed: int):
+    rng = random.Random(seed)
+    code = "if a1:\n    b = 23.5 ** _c\n\n    \n    d = 7.\nelse:\n    e = .25 and b\n"
+    code = code * 5
+    cuts = sorted(rng.sample(range(len(code)), rng.randint(1, 40)))
+    chunks = [code[i:j] for i, j in zip([0] + cuts, cuts + [len(code)])]
+    assert tokenize_or_fail(Tokenizer(chunks)) == tokenize_or_fail(Tokenizer(code))
+
+
+def test_chunked_tokenizer_reads_as_tokens_are_needed():
+    class CountingFile(io.StringIO):
+        reads = 0
+
+        def read(self, size: int | None = -1) -> str:
+            self.reads += 1
+            return super().read(size)
+
+    file = CountingFile("a = 1\n" * 1_000)
+    tokens = iter(Tokenizer(file, chunk_size=10))
+    assert [next(tokens) for _ in range(4)] == [
+        Token(TokenType.NAME, "a"),
+        Token(TokenType.ASSIGN),
+        Token(TokenType.INT, 1),
+        Token(TokenType.NEWLINE),
+    ]
+    assert file.reads == 1
+    assert sum(1 for _ in tokens) == 4 * 999 + 1
+    # 600 chunks of 10 characters and an empty read at the end of the file.
+    assert file.reads == 601
+
+
+@pytest.mark.parametrize("code", [code for code in TRICKY_CODE if code.isascii()])
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+def test_bytes_tokenizer_matches_the_scanner(code: str, chunk_size: int):
+    expected = tokenize_or_fail(Tokenizer(code))
+    data = code.encode()
+    assert tokenize_or_fail(Tokenizer(data)) == expected
+    assert tokenize_or_fail(Tokenizer(bytearray(data))) == expected
+    assert tokenize_or_fail(Tokenizer(memoryview(data))) == expected
+    chunked = Tokenizer(io.BytesIO(data), chunk_size=chunk_size)
+    assert tokenize_or_fail(chunked) == expected
+
+
+def test_tokenizing_a_mapped_file(tmp_path: Path):
+    code = "a = 1\nif a:\n    bb = a ** 2.5\nelse:\n    bb = .5\nbb * 3\n" * 100
+    path = tmp_path / "code.py"
+    path.write_text(code)
+    with path.open("rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            tokens = list(Tokenizer(mapped))
+    assert tokens == list(Tokenizer(code))
+
+
+def test_names_are_decoded_and_interned_once():
+    name = "".join(["long", "_name"])
+    tokens = list(Tokenizer(f"{name} = 1\n{name} = {name} + 1".encode()))
+    names = [token for token in tokens if token.type == TokenType.NAME]
+    assert len(names) == 3
+    assert all(token is names[0] for token in names)
+    assert names[0].value is sys.intern(name)
+
+
+BUFFERED_CODE = (
+    "\n\n  \nif a1:\n    bb = 23.5 ** a1\n\n    \n    c = 7 + 1.0\nd = True or 1\n"
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 64])
+def test_token_buffer_matches_the_tokenizer(chunk_size: int):
+    buffer = TokenBuffer.tokenize(io.StringIO(BUFFERED_CODE), chunk_size=chunk_size)
+    tokens = list(Tokenizer(BUFFERED_CODE))
+    assert list(buffer) == tokens
+    assert [buffer[index] for index in range(len(buffer))] == tokens
+    assert list(buffer.offsets) == list(TokenBuffer.tokenize(BUFFERED_CODE).offsets)
+
+
+def test_token_buffer_offsets():
+    buffer = TokenBuffer.tokenize(BUFFERED_CODE)
+    code = BUFFERED_CODE + "\n"
+    texts = {type: text for text, type in CHARS_AS_TOKENS.items()}
+    texts |= {type: text for text, type in KEYWORDS_AS_TOKENS.items()}
+    texts |= {TokenType.NEWLINE: "\n", TokenType.EXP: "**"}
+    for token, offset in zip(buffer, buffer.offsets):
+        if token.type == TokenType.EOF:
+            assert offset == len(code)
+        elif token.type in {TokenType.INDENT, TokenType.DEDENT}:
+            # These are where the content of the line starts.
+            assert code[offset - 1] in " \n" and code[offset] != " "
+        elif token.value is not None:
+            assert code[offset:].startswith(str(token.value).rstrip(".0"))
+        else:
+            assert code[offset:].startswith(texts[token.type])
+
+
+def test_token_buffer_stores_each_value_once():
+    buffer = TokenBuffer.tokenize("a = 1\nb = a + 1.0 + True + 1\na\n")
+    assert buffer.values == [None, "a", 1, "b", 1.0]
+    assert len(buffer) == len(buffer.value_indices) == len(buffer.offsets) == 17
+    tokens = list(buffer)
+    assert tokens[0] is tokens[6] and tokens[2] is tokens[12]
+
+
+def test_parser_consumes_a_token_buffer():
+    buffer = TokenBuffer.tokenize(BUFFERED_CODE)
+    assert Parser(buffer).parse() == Parser(Tokenizer(BUFFERED_CODE)).parse()
@@ -0,0 +1,161 @@
+from itertools import product
+from typing import Any
+
+from python.tokenizer import Tokenizer
+from python.parser import Parser
+from python.compiler import Bytecode, Compiler
+from python.interpreter import Interpreter
+from python.tracing import TRACE_THRESHOLD, TracingInterpreter
+
+import pytest
+
+from programs import compile_code, run
+
+PROGRAM = """
+if a and not b:
+    c = a * 2 + b
+    if c - 2:
+        d = c or b
+    else:
+        d = -c
+elif b:
+    d = c = b - 1
+else:
+    c = d = 0
+c + d and a
+"""
+
+
+def run_with(interpreter: Interpreter, **scope: Any) -> Interpreter:
+    interpreter.scope = dict(scope)
+    interpreter.ptr = 0
+    return run(interpreter)
+
+
+def assert_same_runs(
+    bytecode: list[Bytecode], inputs: list[dict[str, Any]], **kwargs: Any
+) -> TracingInterpreter:
+    tracing = TracingInterpreter(bytecode, **kwargs)
+    for scope in inputs:
+        slot_names = kwargs.get("slot_names")
+        expected = Interpreter(bytecode, fast=True, slot_names=slot_names)
+        run_with(expected, **scope)
+        run_with(tracing, **scope)
+        assert tracing.scope == expected.scope
+        assert tracing.last_value_popped == expected.last_value_popped
+        assert tracing.stack.stack == []
+    return tracing
+
+
+INPUTS = [{"a": a, "b": b} for a, b in product([0, 1, 2, 1.5], [0, 1, 3, True])]
+
+
+def test_traces_match_the_interpreter():
+    bytecode = compile_code(PROGRAM)
+    tracing = assert_same_runs(bytecode, INPUTS * 3, threshold=2)
+    assert tracing.stats.traces_compiled > 1
+    assert tracing.stats.trace_runs > 0
+    assert tracing.stats.guard_failures > 0
+
+
+@pytest.mark.parametrize("max_trace_length", [1, 2, 3, 7])
+def test_short_traces_chain_into_each_other(max_trace_length: int):
+    bytecode = compile_code(PROGRAM)
+    tracing = assert_same_runs(
+        bytecode, INPUTS * 3, threshold=1, max_trace_length=max_trace_length
+    )
+    assert all(trace.length <= max_trace_length for trace in tracing.traces.values())
+
+
+@pytest.mark.parametrize("optimization_level", [1, 2, 3])
+def test_traces_of_optimized_bytecode(optimization_level: int):
+    bytecode = compile_code(PROGRAM, optimization_level)
+    assert_same_runs(bytecode, INPUTS * 3, threshold=1)
+
+
+def test_traces_of_slots():
+    code = "a = 3\nb = a * 2\nif a and b:\n    c = a + b\nelse:\n    c = a - b\nc"
+    compiler = Compiler(Parser(list(Tokenizer(code))).parse(), slots=True)
+    bytecode = list(compiler.compile())
+    tracing = assert_same_runs(
+        bytecode, [{}] * 5, threshold=1, slot_names=compiler.slot_names
+    )
+    assert tracing.stats.trace_runs == 3
+    assert tracing.scope == {"a": 3, "b": 6, "c": 9}
+
+
+def test_trace_is_compiled_after_threshold():
+    bytecode = compile_code(PROGRAM)
+    tracing = TracingInterpreter(bytecode)
+    for _ in range(TRACE_THRESHOLD):
+        run_with(tracing, a=1, b=0)
+    assert tracing.traces == {}
+
+    run_with(tracing, a=1, b=0)
+    assert list(tracing.traces) == [0]
+    assert tracing.stats.traces_compiled == 1
+    assert tracing.stats.trace_runs == 0
+
+    run_with(tracing, a=1, b=0)
+    trace = tracing.traces[0]
+    assert trace.end == len(bytecode)
+    assert trace.runs == 1 and trace.guard_failures == 0
+    assert tracing.stats.trace_runs == 1
+
+
+def test_guard_failure_falls_back_to_the_interpreter():
+    bytecode = compile_code(PROGRAM)
+    tracing = TracingInterpreter(bytecode, threshold=0)
+    run_with(tracing, a=1, b=0)
+    run_with(tracing, a=0, b=0)
+    trace = tracing.traces[0]
+    assert trace.guard_failures == 1
+    assert tracing.scope == {"a": 0, "b": 0, "c": 0, "d": 0}
+    assert tracing.last_value_popped == 0
+
+    # The other side of the branch got its own trace.
+    run_with(tracing, a=0, b=0)
+    assert tracing.stats.traces_compiled == 2
+    assert tracing.stats.guard_failures == 2
+
+
+def test_traces_whose_guards_keep_failing_are_dropped():
+    bytecode = compile_code("if a:\n    b = 1\nelse:\n    b = 2\nb")
+    tracing = TracingInterpreter(bytecode, threshold=1, max_guard_failures=2)
+    first_trace = None
+    for a in [0, 1] * 20:
+        run_with(tracing, a=a)
+        assert tracing.last_value_popped == (1 if a else 2)
+        if first_trace is None:
+            first_trace = tracing.traces.get(0, None)
+
+    # Recorded with `a = 1`, the trace failed on every other run until it
+    # failed 3 times in 5 runs, and it never ran again.
+    assert first_trace is not None
+    assert first_trace.guard_failures == 3 and first_trace.runs == 5
+    assert 0 not in tracing.traces
+    assert tracing.dropped == {0}
+    assert tracing.stats.traces_dropped == 1
+
+
+def test_time_saved_is_measured_against_untraced_runs():
+    bytecode = compile_code(PROGRAM)
+    tracing = TracingInterpreter(bytecode, threshold=3)
+    for _ in range(10):
+        run_with(tracing, a=1, b=0)
+    assert tracing.untraced_time[0][1] == 3
+    assert tracing.stats.time_saved != 0
+
+
+def test_raising_in_a_trace_leaves_the_stack_and_ptr():
+    bytecode = compile_code("c = 7 + (x or 5) / y")
+    tracing = TracingInterpreter(bytecode, threshold=0)
+    run_with(tracing, x=1, y=2)
+    # The guard on `x` fails and the path from `x or 5` onwards gets a trace.
+    run_with(tracing, x=0, y=2)
+    assert tracing.traces[4].start == 4
+
+    with pytest.raises(ZeroDivisionError):
+        run_with(tracing, x=0, y=0)
+    assert tracing.ptr == 4
+    assert tracing.stack.stack == [7, 0]
@@ -0,0 +1,80 @@
+from python.compiler import Bytecode, BytecodeType, JUMP_TYPES
+from python.verifier import (
+    JUMP_STACK_EFFECTS,
+    STACK_EFFECTS,
+    VerifiedInterpreter,
+    verify,
+)
+
+import pytest
+
+from programs import compile_code
+
+
+def test_all_bytecode_types_have_stack_effects():
+    for bct in BytecodeType:
+        assert bct in STACK_EFFECTS
+        assert (bct in JUMP_STACK_EFFECTS) == (bct in JUMP_TYPES)
+
+
+@pytest.mark.parametrize(
+    ["code", "depth"],
+    [
+        ("", 0),
+        ("1", 1),
+        ("a = b = 1", 2),
+        ("1 + 2 * 3", 3),
+        ("1 + (2 + (3 + 4))", 4),
+        ("a and b or c", 2),
+        ("if a and b:\n    c = 1 + 2\nelse:\n    c = 1 + (2 + 3)", 3),
+    ],
+)
+def test_verify_computes_max_stack_depth(code: str, depth: int):
+    bytecode = compile_code(code)
+    verified = verify(bytecode)
+    assert verified.bytecode is bytecode
+    assert verified.max_stack_depth == depth
+
+
+@pytest.mark.parametrize(
+    "bytecode",
+    [
+        [Bytecode(BytecodeType.POP)],
+        [Bytecode(BytecodeType.PUSH, 1), Bytecode(BytecodeType.BINOP, "+")],
+        [Bytecode(BytecodeType.PUSH, 1)],
+        [Bytecode(BytecodeType.JUMP_FORWARD, 2)],
+        [Bytecode(BytecodeType.JUMP_FORWARD, -1)],
+        [Bytecode(BytecodeType.JUMP_FORWARD)],
+        [
+            Bytecode(BytecodeType.PUSH, 1),
+            Bytecode(BytecodeType.POP_JUMP_IF_FALSE, 2),
+            Bytecode(BytecodeType.PUSH, 2),
+            Bytecode(BytecodeType.POP),
+        ],
+        [
+            Bytecode(BytecodeType.PUSH, 1),
+            Bytecode(BytecodeType.JUMP_IF_TRUE_OR_POP, 2),
+            Bytecode(BytecodeType.PUSH, 2),
+        ],
+    ],
+)
+def test_verify_rejects_malformed_bytecode(bytecode: list[Bytecode]):
+    with pytest.raises(RuntimeError):
+        verify(bytecode)
+
+
+def test_verify_ignores_unreachable_bytecode():
+    bytecode = [
+        Bytecode(BytecodeType.JUMP_FORWARD, 2),
+        Bytecode(BytecodeType.POP),
+    ]
+    assert verify(bytecode).max_stack_depth == 0
+
+
+def test_verified_interpreter_uses_a_fixed_size_stack():
+    verified = verify(compile_code("a = 2\nb = a * (a + 1) or a\nb - 1"))
+    interpreter = VerifiedInterpreter(verified)
+    interpreter.run()
+    assert interpreter.scope == {"a": 2, "b": 6}
+    assert interpreter.last_value_popped == 5
+    assert interpreter.stack.stack == []